@@ -10,6 +10,7 @@ export interface Movie {
   release_year?: number;
   genres: Genre[];
   poster_url?: string;
+  poster_storage_key?: string | null;
   trailer_url?: string;
   runtime_min?: number;
   country_text?: string;
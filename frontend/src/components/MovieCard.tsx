@@ -11,6 +11,7 @@ export type MovieCardMovie = {
   poster_url?: string | null;
   posterUrl?: string | null;
   poster?: string | null;
+  poster_storage_key?: string | null;
   genres?: Array<string | { name?: string | null } | { genre?: { name?: string | null } | null }> | null;
   runtime_min?: number | string | null;
   durationMin?: number | string | null;
@@ -67,6 +68,17 @@ const pickTitle = (movie: MovieCardMovie): string =>
 const pickPoster = (movie: MovieCardMovie): string | undefined =>
   movie.poster_url ?? movie.posterUrl ?? movie.poster ?? undefined;
 
+// resized WebP/JPEG variants served by the BFF for posters kept in our storage
+const POSTER_WIDTHS = [185, 342, 500, 780];
+
+const posterVariant = (key: string, width: number): string =>
+  `/api/images/${encodeURIComponent(key)}?w=${width}`;
+
+const pickPosterSrcSet = (movie: MovieCardMovie): string | undefined =>
+  movie.poster_storage_key
+    ? POSTER_WIDTHS.map((w) => `${posterVariant(movie.poster_storage_key as string, w)} ${w}w`).join(", ")
+    : undefined;
+
 const pickMovieId = (movie: MovieCardMovie): number | string =>
   movie.movie_id ?? movie.movieId ?? movie.id ?? pickTitle(movie);
 
@@ -92,7 +104,8 @@ const pickIsExclusive = (movie: MovieCardMovie): boolean =>
 
 export function MovieCard({ movie, onClick }: MovieCardProps) {
   const title = pickTitle(movie);
-  const posterUrl = pickPoster(movie);
+  const posterSrcSet = pickPosterSrcSet(movie);
+  const posterUrl = movie.poster_storage_key ? posterVariant(movie.poster_storage_key, 342) : pickPoster(movie);
   const movieKey = pickMovieId(movie);
   const genres = extractGenres(movie.genres);
   const duration = pickDuration(movie);
@@ -125,7 +138,14 @@ export function MovieCard({ movie, onClick }: MovieCardProps) {
           </div>
 
           {posterUrl ? (
-            <img src={posterUrl} alt={`Постер фильма ${title}`} className="w-full h-full object-cover" />
+            <img
+              src={posterUrl}
+              srcSet={posterSrcSet}
+              sizes={posterSrcSet ? "(max-width: 640px) 50vw, 240px" : undefined}
+              loading="lazy"
+              alt={`Постер фильма ${title}`}
+              className="w-full h-full object-cover"
+            />
           ) : (
             <div className="w-full h-full flex items-center justify-center bg-gradient-to-br from-gray-700 to-gray-800">
               <div className="text-center text-gray-300 text-xs">Изображение отсутствует</div>
@@ -62,6 +62,10 @@ export function MovieModal({ movie, open, onClose, isLoading = false }: MovieMod
   const [, setLocation] = useLocation();
 
   const priceLabel = movie?.price_rub ? `${movie.price_rub.toFixed(2)} ₽` : null;
+  // своя копия постера, если админка её уже сделала; иначе исходная ссылка
+  const posterSrc = movie?.poster_storage_key
+    ? `/api/images/${encodeURIComponent(movie.poster_storage_key)}?w=500`
+    : movie?.poster_url;
   
   // Проверяем, есть ли описание для aria-describedby
   const hasDescription = movie?.synopsis || movie?.description_full;
@@ -110,9 +114,9 @@ export function MovieModal({ movie, open, onClose, isLoading = false }: MovieMod
               {/* Left side - Poster */}
               <div className="lg:w-1/3">
                 <div className="aspect-[2/3] bg-gradient-to-br from-gray-700 to-gray-800 rounded-xl overflow-hidden shadow-2xl">
-                  {movie.poster_url ? (
+                  {posterSrc ? (
                     <img 
-                      src={movie.poster_url} 
+                      src={posterSrc} 
                       alt={`Постер фильма ${movie.title_local}`}
                       className="w-full h-full object-cover"
                       onError={(e) => {
@@ -11,7 +11,8 @@ from sqlalchemy.ext.asyncio import create_async_engine
 
 from app.db.session import Base, _build_db_url
 # Import models so Alembic sees metadata
-from app.models.movie_models import Movie, Genre  # noqa
+from app.models.movie_models import Movie, Genre, GenreName  # noqa
+from app.models.import_job import ImportJob  # noqa
 
 # Alembic Config
 config = context.config
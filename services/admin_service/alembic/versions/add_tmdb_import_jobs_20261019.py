@@ -0,0 +1,45 @@
+"""Add movie.tmdb_id and import_job for bulk TMDB imports
+
+Revision ID: add_tmdb_import_jobs_20261019
+Revises: drop_legacy_films_b2c_20250830
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "add_tmdb_import_jobs_20261019"
+down_revision = "drop_legacy_films_b2c_20250830"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Ключ идемпотентного импорта: повторный импорт обновляет фильм, а не создаёт дубль
+    op.add_column("movie", sa.Column("tmdb_id", sa.BigInteger(), nullable=True))
+    op.create_index("ux_movie_tmdb_id", "movie", ["tmdb_id"], unique=True)
+
+    op.create_table(
+        "import_job",
+        sa.Column("job_id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="queued"),
+        sa.Column("params", postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("processed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("failed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("errors", postgresql.JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")),
+        sa.Column("created_by", sa.String(length=64), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_import_job_status", "import_job", ["status"])
+
+def downgrade():
+    op.drop_index("ix_import_job_status", table_name="import_job")
+    op.drop_table("import_job")
+    op.drop_index("ux_movie_tmdb_id", table_name="movie")
+    op.drop_column("movie", "tmdb_id")
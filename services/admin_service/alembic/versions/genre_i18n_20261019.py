@@ -0,0 +1,33 @@
+"""Key genres by TMDB genre id and store localized genre names
+
+Revision ID: genre_i18n_20261019
+Revises: add_tmdb_import_jobs_20261019
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "genre_i18n_20261019"
+down_revision = "add_tmdb_import_jobs_20261019"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("genre", sa.Column("tmdb_id", sa.Integer(), nullable=True))
+    op.create_index("ux_genre_tmdb_id", "genre", ["tmdb_id"], unique=True)
+    # цель ON CONFLICT (lower(name)) при импорте: "Драма" и "драма" — один жанр
+    op.create_index("ux_genre_name_lower", "genre", [sa.text("lower(name)")], unique=True)
+
+    op.create_table(
+        "genre_name",
+        sa.Column("genre_id", sa.SmallInteger(), sa.ForeignKey("genre.genre_id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("language", sa.String(length=8), primary_key=True),
+        sa.Column("name", sa.String(length=64), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table("genre_name")
+    op.drop_index("ux_genre_name_lower", table_name="genre")
+    op.drop_index("ux_genre_tmdb_id", table_name="genre")
+    op.drop_column("genre", "tmdb_id")
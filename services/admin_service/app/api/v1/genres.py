@@ -1,7 +1,9 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.core import genre_cache
+from app.core.redis import publish_catalog_event
 from app.core.security import get_current_user_with_role
 from app.db.session import get_db
 from app.models.movie_models import Genre
@@ -9,13 +11,28 @@ from app.schemas.movie import GenreCreate, GenreUpdate, GenreOut
 
 router = APIRouter()
 
+
+async def _notify_genres_changed() -> None:
+    # своя копия справочника — сразу, остальные процессы перечитают по событию
+    await genre_cache.reload()
+    # Игнорируем ошибки Redis, чтобы не ломать изменение жанров
+    try:
+        await publish_catalog_event(genre_cache.GENRES_CHANGED)
+    except Exception:
+        pass
+
 @router.get("/", response_model=List[GenreOut])
 async def list_genres(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    response: Response,
     _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
 ):
-    res = await db.execute(select(Genre).order_by(Genre.name.asc()))
-    return res.scalars().all()
+    genres = await genre_cache.all_genres()
+    etag = genre_cache.etag()
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return genres
 
 @router.post("/", response_model=GenreOut, status_code=status.HTTP_201_CREATED)
 async def create_genre(
@@ -31,16 +48,15 @@ async def create_genre(
         await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     await db.refresh(genre)
+    await _notify_genres_changed()
     return genre
 
 @router.get("/{genre_id}", response_model=GenreOut)
 async def get_genre(
     genre_id: int,
-    db: AsyncSession = Depends(get_db),
     _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
 ):
-    res = await db.execute(select(Genre).where(Genre.genre_id == genre_id))
-    genre = res.scalar_one_or_none()
+    genre = await genre_cache.get(genre_id)
     if not genre:
         raise HTTPException(status_code=404, detail="Genre not found")
     return genre
@@ -60,6 +76,7 @@ async def update_genre(
         setattr(genre, k, v)
     await db.commit()
     await db.refresh(genre)
+    await _notify_genres_changed()
     return genre
 
 @router.delete("/{genre_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -74,4 +91,5 @@ async def delete_genre(
         raise HTTPException(status_code=404, detail="Genre not found")
     await db.delete(genre)
     await db.commit()
+    await _notify_genres_changed()
     return None
@@ -0,0 +1,53 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_current_user_with_role
+from app.db.session import get_db
+from app.models.import_job import ImportJob
+from app.schemas.import_job import ImportJobOut, TmdbImportRequest
+from app.services.tmdb_import import start_import
+
+router = APIRouter()
+
+@router.post("/tmdb", response_model=ImportJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def import_from_tmdb(
+    payload: TmdbImportRequest,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user_with_role(("admin",)))
+):
+    """Поставить в очередь импорт фильмов из TMDB (список id или discover-запрос); прогресс — GET /admin/imports/{job_id}"""
+    job = ImportJob(
+        kind="tmdb_movies",
+        status="queued",
+        params=payload.model_dump(mode="json"),
+        created_by=str(user.get("user_id")),
+        total=len(payload.tmdb_ids),
+        processed=0, created=0, updated=0, failed=0, errors=[],
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    start_import(job.job_id)
+    return job
+
+@router.get("/", response_model=List[ImportJobOut])
+async def list_imports(
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
+):
+    result = await db.execute(select(ImportJob).order_by(ImportJob.job_id.desc()).limit(limit))
+    return result.scalars().all()
+
+@router.get("/{job_id}", response_model=ImportJobOut)
+async def get_import(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
+):
+    job = await db.get(ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
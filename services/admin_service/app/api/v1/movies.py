@@ -1,15 +1,39 @@
-from typing import List, Optional
+from decimal import Decimal
+from typing import Iterable, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
+from sqlalchemy import BigInteger, any_, bindparam, func, literal_column, select, delete, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.core import genre_cache
 from app.core.security import get_current_user_with_role
 from app.db.session import get_db
-from app.models.movie_models import Movie, Genre
-from app.schemas.movie import MovieCreate, MovieUpdate, MovieOut, GenreOut
+from app.models.movie_models import Movie, Genre, movie_genre
+from app.schemas.movie import (
+    MovieCreate, MovieUpdate, MovieOut, GenreOut, MovieBulkRequest, MovieBulkResult,
+)
+from app.services.posters import schedule_mirror, storage_key_from_url
 
 router = APIRouter()
+# POST /admin/movies:bulk — без слэша перед ":", поэтому отдельный роутер без префикса
+bulk_router = APIRouter()
+
+# явный null в частичном изменении для этих колонок — ошибка клиента, а не повод падать на NOT NULL
+NOT_NULL_FIELDS = {"title_local", "price_rub", "is_new", "is_exclusive"}
+
+
+def _ids_any(column, ids: Iterable[int]):
+    # один параметр-массив вместо IN ($1..$N): один план запроса на любой размер пачки
+    return column == any_(bindparam("ids", list(ids), type_=ARRAY(BigInteger), unique=True))
+
+
+def _patch_values(values: dict) -> dict:
+    values = {k: v for k, v in values.items() if v is not None or k not in NOT_NULL_FIELDS}
+    if "poster_url" in values and not values.get("poster_storage_key"):
+        values["poster_storage_key"] = storage_key_from_url(values["poster_url"])
+    return values
 
 @router.get("/", response_model=List[MovieOut])
 async def list_movies(
@@ -23,7 +47,8 @@ async def list_movies(
     db: AsyncSession = Depends(get_db),
     _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
 ):
-    stmt = select(Movie).options(selectinload(Movie.genres))
+    await genre_cache.ensure_loaded()
+    stmt = select(Movie, genre_cache.genre_ids_column())
     if title:
         stmt = stmt.where(Movie.title_local.ilike(f"%{title}%"))
     if release_year is not None:
@@ -33,10 +58,10 @@ async def list_movies(
     if is_exclusive is not None:
         stmt = stmt.where(Movie.is_exclusive == is_exclusive)
     if genre_id is not None:
-        stmt = stmt.join(Movie.genres).where(Genre.genre_id == genre_id)
+        stmt = stmt.join(movie_genre, movie_genre.c.movie_id == Movie.movie_id).where(movie_genre.c.genre_id == genre_id)
     stmt = stmt.offset(offset).limit(limit)
     result = await db.execute(stmt)
-    return result.scalars().all()
+    return [genre_cache.movie_with_genres(movie, genre_ids) for movie, genre_ids in result.all()]
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_movie(
@@ -45,12 +70,18 @@ async def create_movie(
     _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
 ):
     movie = Movie(**payload.model_dump(exclude={"genre_ids"}))
+    if not movie.poster_storage_key:
+        # постер загружен через /api/upload — запоминаем ключ, чтобы отдавать уменьшенные варианты
+        movie.poster_storage_key = storage_key_from_url(movie.poster_url)
     if payload.genre_ids:
         genres = (await db.execute(select(Genre).where(Genre.genre_id.in_(payload.genre_ids)))).scalars().all()
         movie.genres = genres
     db.add(movie)
     await db.commit()
     await db.refresh(movie)
+    if not movie.poster_storage_key:
+        # внешний постер (TMDB) копируем к себе в фоне
+        schedule_mirror(movie.movie_id, movie.poster_url)
     
     # Публикуем событие о создании фильма
     try:
@@ -78,13 +109,14 @@ async def get_movie(
     db: AsyncSession = Depends(get_db),
     _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
 ):
+    await genre_cache.ensure_loaded()
     result = await db.execute(
-        select(Movie).options(selectinload(Movie.genres)).where(Movie.movie_id == movie_id)
+        select(Movie, genre_cache.genre_ids_column()).where(Movie.movie_id == movie_id)
     )
-    movie = result.scalar_one_or_none()
-    if not movie:
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Movie not found")
-    return movie
+    return genre_cache.movie_with_genres(*row)
 
 @router.put("/{movie_id}", response_model=MovieOut)
 async def update_movie(
@@ -93,46 +125,65 @@ async def update_movie(
     db: AsyncSession = Depends(get_db),
     _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
 ):
-    # Загружаем фильм вместе с жанрами
+    # Один запрос: фильм вместе с текущими жанрами (JOIN), дальше сравниваем в памяти
     result = await db.execute(
-        select(Movie).options(selectinload(Movie.genres)).where(Movie.movie_id == movie_id)
+        select(Movie).options(joinedload(Movie.genres)).where(Movie.movie_id == movie_id)
     )
-    movie = result.scalar_one_or_none()
+    movie = result.unique().scalar_one_or_none()
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
 
-    # Обновляем атрибуты фильма
     update_data = payload.model_dump(exclude_unset=True, exclude={"genre_ids"})
-    
-    for k, v in update_data.items():
-        setattr(movie, k, v)
-    
-    # Принудительно помечаем объект как измененный для SQLAlchemy
-    from sqlalchemy.orm import make_transient_to_detached
-    from sqlalchemy import inspect
-    state = inspect(movie)
-    if update_data:  # Если есть данные для обновления
-        state.modified = True
-
-    # Обновляем жанры, если они указаны в запросе
+    if "poster_url" in update_data and not update_data.get("poster_storage_key"):
+        update_data["poster_storage_key"] = storage_key_from_url(update_data["poster_url"])
+    # пишем только реально изменившиеся колонки
+    changed = {k: v for k, v in update_data.items() if getattr(movie, k) != v}
+
+    current = {g.genre_id: g for g in movie.genres}
+    to_remove: set[int] = set()
+    added: list[Genre] = []
     if payload.genre_ids is not None:
-        # Загружаем новые жанры
-        result = await db.execute(select(Genre).where(Genre.genre_id.in_(payload.genre_ids)))
-        new_genres = result.scalars().all()
-        
-        # Очищаем существующие жанры и добавляем новые
-        movie.genres.clear()
-        for genre in new_genres:
-            movie.genres.append(genre)
+        wanted = set(payload.genre_ids)
+        to_remove = set(current) - wanted
+        to_add = wanted - set(current)
+        if to_add:
+            # заодно отсекаем несуществующие genre_id
+            added = list((await db.execute(select(Genre).where(_ids_any(Genre.genre_id, to_add)))).scalars())
 
-    await db.commit()
-    await db.refresh(movie)
-    
-    # Загружаем обновленный фильм с жанрами для гарантии корректности данных
-    result = await db.execute(
-        select(Movie).options(selectinload(Movie.genres)).where(Movie.movie_id == movie.movie_id)
+    if not changed and not to_remove and not added:
+        # Сохранение без изменений: ни записи в БД, ни события
+        return movie
+
+    if changed:
+        await db.execute(
+            update(Movie)
+            .where(Movie.movie_id == movie_id)
+            .values(**changed, updated_at=func.now())
+            .returning(Movie)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+    if to_remove:
+        await db.execute(
+            delete(movie_genre).where(
+                movie_genre.c.movie_id == movie_id, _ids_any(movie_genre.c.genre_id, to_remove)
+            )
+        )
+    if added:
+        await db.execute(
+            pg_insert(movie_genre)
+            .values([{"movie_id": movie_id, "genre_id": g.genre_id} for g in added])
+            .on_conflict_do_nothing()
+        )
+    # связи уже записаны SQL-запросами выше — коллекцию подменяем без отслеживания изменений ORM
+    set_committed_value(
+        movie, "genres", [g for g in current.values() if g.genre_id not in to_remove] + added
     )
-    updated_movie = result.scalar_one()
+    # ответ собираем до commit: после него атрибуты истекают, а ленивой загрузки в async нет
+    updated_movie = MovieOut.model_validate(movie)
+    await db.commit()
+
+    if "poster_url" in changed and not updated_movie.poster_storage_key:
+        schedule_mirror(updated_movie.movie_id, updated_movie.poster_url)
 
     # Публикуем событие об обновлении фильма
     try:
@@ -145,6 +196,7 @@ async def update_movie(
                 "title_local": updated_movie.title_local,
                 "title_original": updated_movie.title_original,
                 "synopsis": updated_movie.synopsis,
+                "changed": sorted(changed) + (["genres"] if to_remove or added else []),
             }
         )
     except Exception:
@@ -181,10 +233,163 @@ async def get_movie_genres(
     db: AsyncSession = Depends(get_db),
     _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
 ):
-    result = await db.execute(
-        select(Movie).options(selectinload(Movie.genres)).where(Movie.movie_id == movie_id)
-    )
-    movie = result.scalar_one_or_none()
-    if not movie:
+    await genre_cache.ensure_loaded()
+    result = await db.execute(select(Movie.movie_id, genre_cache.genre_ids_column()).where(Movie.movie_id == movie_id))
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Movie not found")
-    return movie.genres
+    return genre_cache.hydrate(row.genre_ids)
+
+
+@bulk_router.post("/admin/movies:bulk", response_model=MovieBulkResult)
+async def bulk_movies(
+    payload: MovieBulkRequest,
+    db: AsyncSession = Depends(get_db),
+    _: dict = Depends(get_current_user_with_role(("admin",)))
+):
+    """Массовые create/update/delete и групповые правки (например, is_new=false или цена -10%) одной транзакцией.
+
+    Каждая группа операций — один SQL-запрос; по итогу публикуется одно событие на все затронутые фильмы.
+    """
+    if not (payload.create or payload.update or payload.delete or payload.patch):
+        raise HTTPException(status_code=400, detail="Nothing to do")
+    result = MovieBulkResult()
+
+    referenced = {u.movie_id for u in payload.update} | set(payload.delete) | {
+        movie_id for p in payload.patch for movie_id in p.movie_ids
+    }
+    existing: set[int] = set()
+    if referenced:
+        existing = set((await db.execute(select(Movie.movie_id).where(_ids_any(Movie.movie_id, referenced)))).scalars())
+        result.not_found = sorted(referenced - existing)
+
+    genre_refs = {g for m in payload.create for g in m.genre_ids} | {
+        g for u in payload.update if u.genre_ids for g in u.genre_ids
+    }
+    known_genres: set[int] = set()
+    if genre_refs:
+        known_genres = set((await db.execute(select(Genre.genre_id).where(_ids_any(Genre.genre_id, genre_refs)))).scalars())
+
+    links: list[dict] = []
+    to_mirror: list[tuple[int, Optional[str]]] = []
+
+    # create: INSERT ... ON CONFLICT (tmdb_id) DO UPDATE — повторная отправка того же фильма из TMDB не плодит дубли
+    if payload.create:
+        rows = [_patch_values(m.model_dump(exclude={"genre_ids"})) for m in payload.create]
+        columns = set().union(*rows)
+        rows = [{c: row.get(c) for c in columns} for row in rows]
+        table = Movie.__table__
+        returning = (table.c.movie_id, table.c.tmdb_id, table.c.poster_storage_key, literal_column("(xmax = 0)").label("inserted"))
+        saved: list = [None] * len(rows)
+
+        # с tmdb_id — один upsert; строки сопоставляем по tmdb_id (при повторе в запросе побеждает последняя)
+        by_tmdb = {row["tmdb_id"]: row for row in rows if row.get("tmdb_id") is not None}
+        if by_tmdb:
+            stmt = pg_insert(table).values(list(by_tmdb.values()))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.tmdb_id],
+                set_={c: stmt.excluded[c] for c in columns if c != "tmdb_id"} | {"updated_at": func.now()},
+            ).returning(*returning)
+            upserted = {r.tmdb_id: r for r in (await db.execute(stmt)).all()}
+            for i, row in enumerate(rows):
+                if row.get("tmdb_id") is not None:
+                    saved[i] = upserted[row["tmdb_id"]]
+
+        # без tmdb_id конфликтовать не с чем — обычный INSERT, id в порядке строк запроса
+        plain = [i for i, row in enumerate(rows) if row.get("tmdb_id") is None]
+        if plain:
+            inserted = (await db.execute(
+                pg_insert(table).returning(*returning, sort_by_parameter_order=True), [rows[i] for i in plain]
+            )).all()
+            for i, r in zip(plain, inserted):
+                saved[i] = r
+
+        # tmdb_id уже был в каталоге — это обновление, а не новый фильм
+        result.created = list(dict.fromkeys(r.movie_id for r in saved if r.inserted))
+        result.updated = list(dict.fromkeys(r.movie_id for r in saved if not r.inserted))
+        for r, m in zip(saved, payload.create):
+            links += [{"movie_id": r.movie_id, "genre_id": g} for g in dict.fromkeys(m.genre_ids) if g in known_genres]
+            if not r.poster_storage_key:
+                to_mirror.append((r.movie_id, m.poster_url))
+        to_mirror = list(dict.fromkeys(to_mirror))
+
+    # update: построчные значения; строки с одинаковым набором полей уходят одним executemany
+    groups: dict[tuple, list[dict]] = {}
+    regenre: list[int] = []
+    for u in payload.update:
+        if u.movie_id not in existing:
+            continue
+        values = _patch_values(u.model_dump(exclude_unset=True, exclude={"movie_id", "genre_ids"}))
+        if values:
+            groups.setdefault(tuple(sorted(values)), []).append({"b_movie_id": u.movie_id, **{f"b_{k}": v for k, v in values.items()}})
+        if u.genre_ids is not None:
+            regenre.append(u.movie_id)
+            links += [{"movie_id": u.movie_id, "genre_id": g} for g in dict.fromkeys(u.genre_ids) if g in known_genres]
+        result.updated.append(u.movie_id)
+    table = Movie.__table__
+    for fields, params in groups.items():
+        stmt = (
+            update(table)
+            .where(table.c.movie_id == bindparam("b_movie_id"))
+            .values({f: bindparam(f"b_{f}") for f in fields} | {"updated_at": func.now()})
+        )
+        await db.execute(stmt, params)
+    if regenre:
+        await db.execute(delete(movie_genre).where(_ids_any(movie_genre.c.movie_id, regenre)))
+    if links:
+        await db.execute(pg_insert(movie_genre).values(links).on_conflict_do_nothing())
+
+    result.updated = list(dict.fromkeys(result.updated))
+
+    # patch: одно UPDATE ... WHERE movie_id = ANY(...) на группу
+    patched: set[int] = set()
+    for p in payload.patch:
+        ids = [i for i in dict.fromkeys(p.movie_ids) if i in existing]
+        values = _patch_values(p.set.model_dump(exclude_unset=True)) if p.set else {}
+        if p.price_change_pct is not None:
+            factor = Decimal(1) + p.price_change_pct / Decimal(100)
+            values["price_rub"] = func.round(Movie.price_rub * factor, 2)
+        if not ids or not values:
+            continue
+        rows = await db.execute(
+            update(Movie)
+            .where(_ids_any(Movie.movie_id, ids))
+            .values(**values, updated_at=func.now())
+            .returning(Movie.movie_id)
+            .execution_options(synchronize_session=False)
+        )
+        patched.update(rows.scalars())
+    result.patched = sorted(patched)
+
+    # delete последним: фильм и изменённый, и удалённый в одном запросе — удаляется
+    if payload.delete:
+        ids = [i for i in dict.fromkeys(payload.delete) if i in existing]
+        if ids:
+            rows = await db.execute(
+                delete(Movie).where(_ids_any(Movie.movie_id, ids)).returning(Movie.movie_id)
+                .execution_options(synchronize_session=False)
+            )
+            result.deleted = sorted(rows.scalars())
+
+    await db.commit()
+
+    touched = sorted(set(result.created) | set(result.updated) | patched | set(result.deleted))
+    if touched:
+        try:
+            from app.core.redis import publish_movies_event
+            await publish_movies_event(
+                "bulk_changed",
+                touched,
+                data={
+                    "created": len(result.created),
+                    "updated": len(result.updated),
+                    "patched": len(result.patched),
+                    "deleted": len(result.deleted),
+                },
+            )
+        except Exception:
+            # Игнорируем ошибки Redis, чтобы не ломать сохранение
+            pass
+        for movie_id, poster_url in to_mirror:
+            schedule_mirror(movie_id, poster_url)
+    return result
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+
+from app.core.security import get_current_user_with_role
+from app.services.posters import backfill_state, start_backfill
+
+router = APIRouter()
+
+
+@router.post("/backfill", status_code=status.HTTP_202_ACCEPTED)
+async def backfill_posters(
+    _: dict = Depends(get_current_user_with_role(("admin",)))
+):
+    """Скопировать в наше хранилище постеры всех фильмов, которые ещё ссылаются на TMDB"""
+    if not start_backfill():
+        return JSONResponse({"detail": "Backfill already running", **backfill_state}, status_code=409)
+    return {"detail": "Backfill started"}
+
+
+@router.get("/backfill")
+async def backfill_status(
+    _: dict = Depends(get_current_user_with_role(("admin", "moderator")))
+):
+    return backfill_state
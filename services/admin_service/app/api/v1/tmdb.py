@@ -1,3 +1,4 @@
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.security import get_current_user_with_role
@@ -9,11 +10,12 @@ router = APIRouter()
 @router.post("/genres/import")
 async def tmdb_import_genres_ru(
     lang: str = Query(default="ru-RU"),
+    extra: List[str] = Query(default=[], description="Дополнительные языки для genre_name, например en-US"),
     db: AsyncSession = Depends(get_db),
     _: dict = Depends(get_current_user_with_role(("admin","moderator")))
 ):
     try:
-        added = await import_genres_from_tmdb(db, language=lang)  # по умолчанию ru-RU
-        return {"message": f"Импорт жанров завершён", "added": added, "language": lang}
+        added = await import_genres_from_tmdb(db, language=lang, extra_languages=extra)  # по умолчанию ru-RU
+        return {"message": f"Импорт жанров завершён", "added": added, "language": lang, "extra_languages": extra}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,9 +4,13 @@ from decimal import Decimal
 from typing import Any, Optional
 from redis import asyncio as aioredis
 from redis.asyncio import Redis
+from kino_common import metrics, tracing
 
 redis_client: Optional[Redis] = None
 
+# BFF сбрасывает кэш каталога по событиям этого канала
+CATALOG_EVENTS_CHANNEL = "catalog_events"
+
 class DecimalEncoder(json.JSONEncoder):
     """Кастомный JSON encoder для работы с Decimal"""
     def default(self, obj):
@@ -17,7 +21,7 @@ class DecimalEncoder(json.JSONEncoder):
 async def init_redis() -> Redis:
     global redis_client
     if redis_client is None:
-        redis_client = aioredis.from_url("redis://redis:6379/0")
+        redis_client = metrics.instrument_redis(tracing.instrument_redis(aioredis.from_url("redis://redis:6379/0")))
     return redis_client
 
 async def get_redis() -> Redis:
@@ -37,12 +41,37 @@ async def publish_movie_event(
         event_type: Тип события ("created", "updated", "deleted")
         data: Дополнительные данные о фильме (для created/updated)
     """
+    redis = await get_redis()
     event = {
         "movie_id": movie_id,
         "event_type": event_type,
         "timestamp": datetime.utcnow().isoformat(),
-        "data": data
+        "data": data,
+    }
+    await redis.publish("movie_events", json.dumps(event, cls=DecimalEncoder))
+
+
+async def publish_catalog_event(event_type: str) -> None:
+    """Изменения каталога, не привязанные к одному фильму (например, справочник жанров)"""
+    redis = await get_redis()
+    event = {
+        "event_type": event_type,
+        "timestamp": datetime.utcnow().isoformat(),
     }
-    
+    await redis.publish(CATALOG_EVENTS_CHANNEL, json.dumps(event))
+
+
+async def publish_movies_event(event_type: str, movie_ids: list[int], data: Optional[dict[str, Any]] = None) -> None:
+    """Одно событие на пачку фильмов (массовый импорт/правка) вместо события на каждый.
+
+    movie_id = None: подписчики, которые не знают про movie_ids, сбрасывают кэш целиком.
+    """
     redis = await get_redis()
+    event = {
+        "movie_id": None,
+        "movie_ids": list(movie_ids),
+        "event_type": event_type,
+        "timestamp": datetime.utcnow().isoformat(),
+        "data": data,
+    }
     await redis.publish("movie_events", json.dumps(event, cls=DecimalEncoder))
@@ -2,6 +2,8 @@ import os
 from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from kino_common import metrics, query_stats, tracing
+
 
 Base = declarative_base()
 
@@ -20,10 +22,22 @@ def _build_db_url():
     return f"postgresql+asyncpg://{user}:{pwd}@{host}:{port}/{db}"
 
 DATABASE_URL = _build_db_url()
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+
+_engine = None
+
+def get_engine():
+    # один движок (и один пул соединений) на процесс, а не новый на каждый запрос
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO, pool_pre_ping=True, future=True)
+        tracing.instrument_sqlalchemy(_engine)
+        metrics.instrument_sqlalchemy(_engine)
+        query_stats.instrument_sqlalchemy(_engine)
+    return _engine
 
 def get_async_sessionmaker():
-    engine = create_async_engine(DATABASE_URL, echo=True, pool_pre_ping=True, future=True)
-    return sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, autocommit=False)
+    return sessionmaker(bind=get_engine(), class_=AsyncSession, autoflush=False, autocommit=False)
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async_session = get_async_sessionmaker()
@@ -1,42 +1,82 @@
 # app/main.py
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.openapi.utils import get_openapi
 
-from app.api.v1 import users, movies, genres, tmdb
+from app.api.v1 import users, movies, genres, tmdb, posters, imports
 from app.core.redis import init_redis
+from kino_common.http import close_clients, deadline_middleware
+from kino_common import metrics, query_stats, tracing
+from kino_common import tmdb as tmdb_gateway
+from app.core import genre_cache
 
 # NEW: для автосида жанров
-from sqlalchemy import select, func
-from app.db.session import get_db, get_async_sessionmaker
-from app.models.movie_models import Genre
-from app.services.import_genres import import_genres_from_tmdb
+from app.db.session import get_async_sessionmaker
+from app.services.import_genres import import_genres_in_background
+from app.services.tmdb_import import fail_interrupted_jobs
+from app.services import posters as posters_service
 
 app = FastAPI(title="Admin Service")
+_background_stop = asyncio.Event()
+_background_tasks: list[asyncio.Task] = []
+app.middleware("http")(deadline_middleware)
+app.middleware("http")(metrics.metrics_middleware)
+tracing.configure("admin_service")
+app.middleware("http")(tracing.tracing_middleware)
 
 # Роутеры
 app.include_router(movies.router, prefix="/admin/movies", tags=["Movies"])
+app.include_router(movies.bulk_router, tags=["Movies"])
 app.include_router(genres.router, prefix="/admin/genres", tags=["Genres"])
 app.include_router(tmdb.router,   prefix="/admin/tmdb",   tags=["TMDB"])
+app.include_router(posters.router, prefix="/admin/posters", tags=["Posters"])
+app.include_router(imports.router, prefix="/admin/imports", tags=["Imports"])
 app.include_router(users.router,  prefix="/admin",        tags=["Users"])
+app.add_api_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+app.add_api_route("/internal/query-stats", query_stats.stats_endpoint, include_in_schema=False)
+metrics.register_collector(metrics.counters_collector(
+    "tmdb_gateway_events_total", "TMDB gateway cache and throttling events", lambda: tmdb_gateway.stats, "event"
+))
 
-# Автосид жанров из TMDB при старте (только если таблица пуста)
+# Автосид жанров из TMDB при старте (фоном)
 @app.on_event("startup")
 async def startup_event():
     """Инициализация Redis и автосид жанров"""
     # Инициализируем Redis
     await init_redis()
+
+    # Импорты, оборванные перезапуском, уже не завершатся — помечаем их, чтобы их можно было перезапустить
+    try:
+        interrupted = await fail_interrupted_jobs()
+        if interrupted:
+            print(f"⚠️  Прерванных задач импорта: {interrupted}")
+    except Exception as e:
+        print(f"⚠️  Не удалось проверить задачи импорта: {e}")
     
-    # Если таблица жанров пуста — один раз импортируем жанры из TMDB
+    # Жанры из TMDB (идемпотентно, с переводами) — фоном, чтобы медленный TMDB не задерживал старт
+    _background_tasks.append(asyncio.create_task(import_genres_in_background(get_async_sessionmaker())))
+
+    # Справочник жанров в памяти; подписка перечитывает его по событиям genres_changed
     try:
-        async_session = get_async_sessionmaker()
-        async with async_session() as db:
-            count = await db.scalar(select(func.count(Genre.genre_id)))
-            if not count:
-                await import_genres_from_tmdb(db, language="ru-RU")
-                print("✅ Жанры успешно импортированы из TMDB")
+        await genre_cache.reload()
     except Exception as e:
-        print(f"⚠️  Не удалось импортировать жанры из TMDB: {e}")
-        print("⚠️  Сервис продолжит работу. Жанры можно добавить вручную через админку")
+        print(f"⚠️  Справочник жанров не загружен, попробуем при первом запросе: {e}")
+    _background_tasks.append(asyncio.create_task(genre_cache.listen(_background_stop)))
+    _background_tasks.append(asyncio.create_task(query_stats.report_periodically(_background_stop)))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Закрываем пул соединений к другим сервисам"""
+    _background_stop.set()
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await close_clients()
+    await posters_service.close_client()
+    await tmdb_gateway.close()
+
 
 
 # Кастомный OpenAPI — показываем в Swagger именно Bearer-авторизацию
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class ImportJob(Base):
+    """Фоновая задача импорта (сейчас только фильмы из TMDB); прогресс опрашивается через API"""
+    __tablename__ = "import_job"
+
+    job_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False, default="queued", index=True)  # queued|running|done|failed
+    params = Column(JSONB, nullable=False, default=dict)
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    errors = Column(JSONB, nullable=False, default=list)
+    created_by = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -35,6 +35,7 @@ class Movie(Base):
     trailer_url = Column(Text, nullable=True)
     trailer_storage_key = Column(String(255), nullable=True)
     signed_url = Column(Text, nullable=True)
+    tmdb_id = Column(BigInteger, nullable=True, unique=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
 
@@ -45,5 +46,14 @@ class Genre(Base):
 
     genre_id = Column(SmallInteger, primary_key=True, autoincrement=True, index=True)
     name = Column(String(64), nullable=False, unique=True)
+    tmdb_id = Column(Integer, nullable=True, unique=True)
 
     movies = relationship("Movie", secondary="movie_genre", back_populates="genres")
+
+class GenreName(Base):
+    """Название жанра на других языках (импорт из TMDB); основное — genre.name"""
+    __tablename__ = "genre_name"
+
+    genre_id = Column(SmallInteger, ForeignKey("genre.genre_id", ondelete="CASCADE"), primary_key=True)
+    language = Column(String(8), primary_key=True)
+    name = Column(String(64), nullable=False)
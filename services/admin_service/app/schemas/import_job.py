@@ -0,0 +1,39 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+from pydantic import BaseModel, Field, model_validator
+
+MAX_IMPORT_IDS = 10000
+
+class TmdbImportRequest(BaseModel):
+    # либо явный список TMDB id, либо параметры /discover/movie (sort_by, primary_release_year, with_genres, ...)
+    tmdb_ids: List[int] = Field(default_factory=list, max_length=MAX_IMPORT_IDS)
+    discover: Optional[dict[str, Any]] = None
+    max_pages: int = Field(1, ge=1, le=500)  # по 20 фильмов на страницу discover
+    language: str = "ru-RU"
+    default_price_rub: Decimal = Field(default=Decimal("0.00"), max_digits=12, decimal_places=2)
+
+    @model_validator(mode="after")
+    def _one_source(self):
+        if not self.tmdb_ids and self.discover is None:
+            raise ValueError("tmdb_ids or discover is required")
+        return self
+
+class ImportJobOut(BaseModel):
+    job_id: int
+    kind: str
+    status: str
+    params: dict[str, Any]
+    total: int
+    processed: int
+    created: int
+    updated: int
+    failed: int
+    errors: List[dict[str, Any]] = []
+    created_by: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -38,6 +38,7 @@ class MovieBase(BaseModel):
     trailer_url: Optional[str] = None
     trailer_storage_key: Optional[str] = None
     signed_url: Optional[str] = None
+    tmdb_id: Optional[int] = None
     genre_ids: List[int] = Field(default_factory=list)
 
 class MovieCreate(MovieBase):
@@ -46,6 +47,54 @@ class MovieCreate(MovieBase):
 class MovieUpdate(MovieBase):
     pass
 
+MAX_BULK_OPERATIONS = 1000
+
+class MoviePatch(BaseModel):
+    """Частичное изменение: меняются только переданные поля"""
+    title_local: Optional[str] = None
+    title_original: Optional[str] = None
+    synopsis: Optional[str] = None
+    description_full: Optional[str] = None
+    country_text: Optional[str] = None
+    release_year: Optional[int] = None
+    runtime_min: Optional[int] = None
+    age_rating: Optional[str] = None
+    imdb_rating: Optional[Decimal] = Field(None, max_digits=3, decimal_places=1)
+    expected_gross_rub: Optional[Decimal] = Field(None, max_digits=14, decimal_places=2)
+    is_new: Optional[bool] = None
+    is_exclusive: Optional[bool] = None
+    price_rub: Optional[Decimal] = Field(None, max_digits=12, decimal_places=2)
+    discount_rub: Optional[Decimal] = Field(None, max_digits=12, decimal_places=2)
+    torrent_url: Optional[str] = None
+    poster_url: Optional[str] = None
+    poster_storage_key: Optional[str] = None
+    trailer_url: Optional[str] = None
+    trailer_storage_key: Optional[str] = None
+    signed_url: Optional[str] = None
+
+class MovieBulkUpdate(MoviePatch):
+    movie_id: int
+    genre_ids: Optional[List[int]] = None  # None — жанры не трогаем, [] — убрать все
+
+class MovieBulkPatch(BaseModel):
+    """Одно и то же изменение для набора фильмов: set — поля, price_change_pct — цена в процентах (-10 = скидка 10%)"""
+    movie_ids: List[int] = Field(min_length=1, max_length=MAX_BULK_OPERATIONS)
+    set: Optional[MoviePatch] = None
+    price_change_pct: Optional[Decimal] = Field(None, gt=-100, le=1000)
+
+class MovieBulkRequest(BaseModel):
+    create: List[MovieCreate] = Field(default_factory=list, max_length=MAX_BULK_OPERATIONS)
+    update: List[MovieBulkUpdate] = Field(default_factory=list, max_length=MAX_BULK_OPERATIONS)
+    delete: List[int] = Field(default_factory=list, max_length=MAX_BULK_OPERATIONS)
+    patch: List[MovieBulkPatch] = Field(default_factory=list, max_length=100)
+
+class MovieBulkResult(BaseModel):
+    created: List[int] = []
+    updated: List[int] = []
+    deleted: List[int] = []
+    patched: List[int] = []
+    not_found: List[int] = []
+
 class MovieOut(MovieBase):
     movie_id: int
     genres: List[GenreOut] = []
@@ -1,7 +1,8 @@
 import os
-import httpx
 from typing import Any, Dict, Optional
 
+from kino_common.http import get_client
+
 AUTH_BASE = os.getenv("AUTH_BASE", "http://auth_service:8000")
 INTERNAL_SECRET = os.getenv("INTERNAL_SECRET") or os.getenv("AUTH_INTERNAL_SECRET") or ""
 
@@ -30,19 +31,19 @@ async def get_users(query: Optional[str], role: Optional[str], is_blocked: Optio
         "limit": limit,
         "offset": offset,
     })
-    async with httpx.AsyncClient(base_url=AUTH_BASE, timeout=15.0) as client:
-        r = await client.get("/internal/users", params=params, headers=_headers())
-        r.raise_for_status()
-        return r.json()
+    client = get_client(AUTH_BASE)
+    r = await client.get("/internal/users", params=params, headers=_headers(), timeout=15.0)
+    r.raise_for_status()
+    return r.json()
 
 async def get_user(user_id: int) -> Any:
-    async with httpx.AsyncClient(base_url=AUTH_BASE, timeout=15.0) as client:
-        r = await client.get(f"/internal/users/{user_id}", headers=_headers())
-        r.raise_for_status()
-        return r.json()
+    client = get_client(AUTH_BASE)
+    r = await client.get(f"/internal/users/{user_id}", headers=_headers(), timeout=15.0)
+    r.raise_for_status()
+    return r.json()
 
 async def update_user(user_id: int, payload: Dict[str, Any]) -> Any:
-    async with httpx.AsyncClient(base_url=AUTH_BASE, timeout=15.0) as client:
-        r = await client.patch(f"/internal/users/{user_id}", json=payload, headers=_headers())
-        r.raise_for_status()
-        return r.json()
+    client = get_client(AUTH_BASE)
+    r = await client.patch(f"/internal/users/{user_id}", json=payload, headers=_headers(), timeout=15.0)
+    r.raise_for_status()
+    return r.json()
@@ -1,22 +1,19 @@
+import asyncio
 import os
-import httpx
-from typing import Literal
+from typing import Literal, Sequence
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select  # оставляю как у тебя, совместимо
-from sqlalchemy.exc import IntegrityError
 
-from app.models.movie_models import Genre
-
-TMDB_BEARER_TOKEN = os.getenv("TMDB_BEARER_TOKEN")
-TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
-
-HEADERS = {
-    "Authorization": f"Bearer {TMDB_BEARER_TOKEN}",
-    "Accept": "application/json",
-}
+from kino_common import tmdb
+from app.models.movie_models import Genre, GenreName
 
 Language = Literal["ru-RU", "en-US", "uk-UA", "de-DE", "fr-FR"]
 
+# языки, которые импорт при старте кладёт в genre_name (первый — основной, идёт в genre.name)
+STARTUP_LANGUAGES = [l.strip() for l in os.getenv("TMDB_GENRE_LANGUAGES", "ru-RU,en-US").split(",") if l.strip()]
+
 
 def _normalize_name_ru(name: str) -> str:
     """
@@ -33,68 +30,82 @@ def _normalize_name_ru(name: str) -> str:
     return s[:1].upper() + s[1:]
 
 
-async def import_genres_from_tmdb(db: AsyncSession, language: Language = "ru-RU") -> int:
+async def import_genres_from_tmdb(
+    db: AsyncSession,
+    language: Language = "ru-RU",
+    extra_languages: Sequence[str] = (),
+) -> int:
     """
-    Импорт жанров из TMDb в таблицу `genre` (legacy оффлайн-кино) БЕЗ изменения схемы.
-    - Тянем /genre/movie/list?language=ru-RU (по умолчанию)
-    - Кладём имя в колонку `name` уже в нормализованном виде (первая буква заглавная)
-    - Дедуп по нижнему регистру
-    - Если запись уже есть, но отличается регистром/пробелами — ОБНОВЛЯЕМ её имя (чтобы был единый стиль)
-    Возвращаем количество ДОБАВЛЕННЫХ записей (обновления в счёт не идут).
+    Импорт жанров из TMDb в `genre` + переводы в `genre_name`, без циклов по строкам.
+    - Списки жанров на всех языках тянем параллельно (через общий кэш TMDB)
+    - Ключ — TMDB genre id: жанр, уже связанный с TMDB, не трогаем (его могли переименовать в админке)
+    - Новые — один INSERT ... ON CONFLICT (lower(name)) DO UPDATE: жанр, заведённый руками
+      с тем же именем, просто получает tmdb_id
+    - Переводы — один INSERT ... ON CONFLICT (genre_id, language) DO UPDATE на все языки
+    Повторный запуск ничего не меняет. Возвращаем количество ДОБАВЛЕННЫХ жанров.
     """
-    if not TMDB_BEARER_TOKEN:
+    if not tmdb.TMDB_BEARER and not tmdb.TMDB_API_KEY:
         raise RuntimeError("TMDB_BEARER_TOKEN is not set")
 
-    # 1) TMDb запрос
-    params = {"language": language}
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        r = await client.get(
-            f"{TMDB_BASE_URL}/genre/movie/list",
-            headers=HEADERS,
-            params=params,
-        )
-        r.raise_for_status()
-        data = r.json()
-        genres = data.get("genres", []) or []
-
-    # 2) Загружаем существующие жанры и строим индекс по lowercase имени
-    res = await db.execute(select(Genre))
-    existing_rows = list(res.scalars())
-    existing_by_lc = { (g.name or "").strip().lower(): g for g in existing_rows }
-
+    languages = list(dict.fromkeys([language, *extra_languages]))
+    lists = await asyncio.gather(*(tmdb.genre_list(lang) for lang in languages))
+    names = {
+        lang: {g["id"]: _normalize_name_ru(g.get("name") or "")[:64] for g in genres if g.get("id") and (g.get("name") or "").strip()}
+        for lang, genres in zip(languages, lists)
+    }
+    primary = names[language]
+    if not primary:
+        return 0
+
+    linked = dict((await db.execute(
+        select(Genre.tmdb_id, Genre.genre_id).where(Genre.tmdb_id.in_(list(primary)))
+    )).all())
     added = 0
-    updated = 0
-
-    # 3) Нормализация и upsert (без реального UPSERT — через проверку)
-    for g in genres:
-        raw_name = (g or {}).get("name") or ""
-        norm_name = _normalize_name_ru(raw_name)
-        if not norm_name:
-            continue
-
-        key = norm_name.lower()
-        row = existing_by_lc.get(key)
-
-        if row is not None:
-            # Уже есть жанр с тем же именем по lower() — при необходимости правим формат
-            current_norm = _normalize_name_ru(row.name or "")
-            if row.name != current_norm:
-                row.name = current_norm
-                updated += 1
-            continue
+    new = [{"tmdb_id": tmdb_id, "name": name} for tmdb_id, name in primary.items() if tmdb_id not in linked]
+    if new:
+        stmt = pg_insert(Genre).values(new)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[func.lower(Genre.name)],
+            set_={"tmdb_id": stmt.excluded.tmdb_id},
+            # жанр с этим именем уже привязан к другому TMDB id — оставляем как есть
+            where=Genre.tmdb_id.is_(None),
+        ).returning(Genre.genre_id, Genre.tmdb_id, literal_column("(xmax = 0)").label("inserted"))
+        rows = (await db.execute(stmt)).all()
+        linked.update({r.tmdb_id: r.genre_id for r in rows})
+        added = sum(1 for r in rows if r.inserted)
+
+    localized = [
+        {"genre_id": linked[tmdb_id], "language": lang, "name": name}
+        for lang, by_id in names.items()
+        for tmdb_id, name in by_id.items()
+        if tmdb_id in linked
+    ]
+    if localized:
+        stmt = pg_insert(GenreName).values(localized)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[GenreName.genre_id, GenreName.language],
+            set_={"name": stmt.excluded.name},
+            where=GenreName.name.is_distinct_from(stmt.excluded.name),
+        ))
+    await db.commit()
+
+    if new:
+        from app.core import genre_cache
+        from app.core.redis import publish_catalog_event
+        await genre_cache.reload()
+        try:
+            await publish_catalog_event(genre_cache.GENRES_CHANGED)
+        except Exception:
+            pass
+    return added
 
-        # Нет такого ключа — создаём новую запись
-        new_row = Genre(name=norm_name)
-        db.add(new_row)
-        existing_by_lc[key] = new_row
-        added += 1
 
+async def import_genres_in_background(session_factory) -> None:
+    """Старт admin_service не ждёт TMDB: импорт идёт фоном после запуска"""
     try:
-        await db.commit()
-    except IntegrityError as e:
-        await db.rollback()
-        # Скорее всего, конфликт уникальности по name — пробрасываем выше для явной диагностики
-        raise e
-
-    # Можно вернуть added + updated, но чтобы не ломать совместимость — оставляем только added
-    return added
+        async with session_factory() as db:
+            added = await import_genres_from_tmdb(db, language=STARTUP_LANGUAGES[0], extra_languages=STARTUP_LANGUAGES[1:])
+        print(f"✅ Жанры синхронизированы с TMDB (новых: {added}, языки: {', '.join(STARTUP_LANGUAGES)})")
+    except Exception as e:
+        print(f"⚠️  Не удалось импортировать жанры из TMDB: {e}")
+        print("⚠️  Сервис продолжит работу. Жанры можно добавить вручную через админку")
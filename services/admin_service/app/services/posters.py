@@ -0,0 +1,214 @@
+import asyncio
+import os
+import re
+import time
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy import select, update
+
+from kino_common.http import get_client
+from app.db.session import get_async_sessionmaker
+from app.models.movie_models import Movie
+
+# BFF owns the upload storage (content-addressed, with resized variants)
+BFF_BASE = os.getenv("BFF_URL", "http://bff_service:8001")
+MIRROR_MAX_BYTES = int(os.getenv("POSTER_MIRROR_MAX_BYTES", str(10 * 1024 * 1024)))
+MIRROR_CONCURRENCY = int(os.getenv("POSTER_MIRROR_CONCURRENCY", "4"))
+BACKFILL_BATCH = 100
+
+# /api/files/<sha256><ext> — content-addressed uploads stored by the BFF
+_STORAGE_URL_RE = re.compile(r"(?:^|/)api/files/([0-9a-f]{64}\.(?:jpg|png|gif|webp))(?:$|[?#])")
+
+_sessionmaker = None
+_client: Optional[httpx.AsyncClient] = None
+_limiter: Optional[asyncio.Semaphore] = None
+_tasks: set[asyncio.Task] = set()
+backfill_state: dict = {"running": False}
+
+
+def storage_key_from_url(url: Optional[str]) -> Optional[str]:
+    """Storage key of a poster uploaded through /api/upload, None for external URLs."""
+    if not url:
+        return None
+    m = _STORAGE_URL_RE.search(url)
+    return m.group(1) if m else None
+
+
+def is_external(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith(("http://", "https://")) and storage_key_from_url(url) is None
+
+
+def _session():
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = get_async_sessionmaker()
+    return _sessionmaker()
+
+
+def _external_client() -> httpx.AsyncClient:
+    # отдельный клиент для чужих CDN: без ретраев/breaker'а s2s-клиента и без наших trace-заголовков
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=15.0,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=MIRROR_CONCURRENCY * 2, max_keepalive_connections=MIRROR_CONCURRENCY),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _download(url: str) -> tuple[bytes, str]:
+    async with _external_client().stream("GET", url) as resp:
+        resp.raise_for_status()
+        if int(resp.headers.get("content-length") or 0) > MIRROR_MAX_BYTES:
+            raise ValueError(f"poster larger than {MIRROR_MAX_BYTES} bytes")
+        chunks, size = [], 0
+        # Content-Length может не быть или он может врать — считаем сами и обрываем загрузку
+        async for chunk in resp.aiter_bytes():
+            size += len(chunk)
+            if size > MIRROR_MAX_BYTES:
+                raise ValueError(f"poster larger than {MIRROR_MAX_BYTES} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks), resp.headers.get("content-type", "application/octet-stream")
+
+
+async def _store(content: bytes, content_type: str, filename: str) -> str:
+    resp = await get_client(BFF_BASE).post(
+        "/api/upload",
+        params={"kind": "poster"},
+        files={"file": (filename, content, content_type)},
+        timeout=30.0,
+    )
+    resp.raise_for_status()
+    return resp.json()["key"]
+
+
+async def mirror_poster(movie_id: int, poster_url: str) -> Optional[str]:
+    """Copy an external poster into our storage and record its key on the movie.
+
+    The row is only updated if poster_url is still the mirrored one, so a newer
+    edit made while the download ran is never overwritten.
+    """
+    content, content_type = await _download(poster_url)
+    key = await _store(content, content_type, os.path.basename(urlsplit(poster_url).path) or "poster")
+    async with _session() as db:
+        result = await db.execute(
+            update(Movie)
+            .where(Movie.movie_id == movie_id, Movie.poster_url == poster_url)
+            .values(poster_storage_key=key)
+            .returning(Movie.movie_id)
+        )
+        changed = result.scalar_one_or_none() is not None
+        await db.commit()
+    if changed:
+        try:
+            from app.core.redis import publish_movie_event
+            await publish_movie_event(
+                movie_id=movie_id,
+                event_type="updated",
+                data={"movie_id": movie_id, "poster_storage_key": key},
+            )
+        except Exception:
+            pass
+    return key if changed else None
+
+
+def _mirror_limiter() -> asyncio.Semaphore:
+    global _limiter
+    # семафор привязывается к циклу событий; в тестах у каждого свой цикл
+    if _limiter is None or getattr(_limiter, "_loop", None) not in (None, asyncio.get_running_loop()):
+        _limiter = asyncio.Semaphore(MIRROR_CONCURRENCY)
+    return _limiter
+
+
+async def _mirror_limited(movie_id: int, poster_url: str) -> Optional[str]:
+    async with _mirror_limiter():
+        return await mirror_poster(movie_id, poster_url)
+
+
+def schedule_mirror(movie_id: int, poster_url: Optional[str]) -> None:
+    """Fire-and-forget mirroring after a save; the card falls back to poster_url until it finishes.
+
+    Background mirrors share MIRROR_CONCURRENCY download slots, so a bulk import
+    queues its posters instead of opening thousands of connections at once.
+    """
+    if not is_external(poster_url):
+        return
+    task = asyncio.create_task(_mirror_limited(movie_id, poster_url))
+    _tasks.add(task)
+
+    def _done(t: asyncio.Task) -> None:
+        _tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            print(f"⚠️  Не удалось скопировать постер фильма {movie_id}: {t.exception()}")
+
+    task.add_done_callback(_done)
+
+
+def schedule_mirrors(movies: Iterable[tuple[int, Optional[str]]]) -> None:
+    """schedule_mirror for many (movie_id, poster_url) pairs, e.g. a committed import batch."""
+    for movie_id, poster_url in movies:
+        schedule_mirror(movie_id, poster_url)
+
+
+async def backfill_posters(concurrency: int = MIRROR_CONCURRENCY) -> dict:
+    """Mirror posters of every movie that still hotlinks an external URL.
+
+    Walks the table by movie_id in batches; each batch is mirrored with at most
+    `concurrency` downloads in flight. Failures are counted and left for the next run.
+    """
+    state = backfill_state
+    state.update(running=True, started_at=time.time(), finished_at=None, scanned=0, mirrored=0, failed=0)
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def _one(movie_id: int, url: str) -> None:
+        async with limiter:
+            try:
+                if await mirror_poster(movie_id, url):
+                    state["mirrored"] += 1
+            except Exception as e:
+                state["failed"] += 1
+                print(f"⚠️  Постер фильма {movie_id} не скопирован: {e}")
+
+    last_id = 0
+    try:
+        while True:
+            async with _session() as db:
+                rows = (await db.execute(
+                    select(Movie.movie_id, Movie.poster_url)
+                    .where(
+                        Movie.movie_id > last_id,
+                        Movie.poster_storage_key.is_(None),
+                        Movie.poster_url.ilike("http%"),
+                    )
+                    .order_by(Movie.movie_id)
+                    .limit(BACKFILL_BATCH)
+                )).all()
+            if not rows:
+                break
+            last_id = rows[-1].movie_id
+            state["scanned"] += len(rows)
+            await asyncio.gather(*(_one(r.movie_id, r.poster_url) for r in rows if is_external(r.poster_url)))
+    finally:
+        state.update(running=False, finished_at=time.time())
+    return dict(state)
+
+
+def start_backfill() -> bool:
+    """Run backfill_posters in the background; False if a run is already in progress."""
+    if backfill_state.get("running"):
+        return False
+    backfill_state["running"] = True  # до старта задачи, чтобы второй запрос не запустил ещё одну
+    task = asyncio.create_task(backfill_posters())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
@@ -0,0 +1,240 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Optional
+
+from sqlalchemy import func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from kino_common import tmdb
+from app.core import genre_cache
+from app.db.session import get_async_sessionmaker
+from app.models.import_job import ImportJob
+from app.models.movie_models import Genre, Movie, movie_genre
+from app.services.import_genres import _normalize_name_ru
+from app.services.posters import schedule_mirrors
+
+IMPORT_CONCURRENCY = int(os.getenv("TMDB_IMPORT_CONCURRENCY", "8"))
+IMPORT_BATCH = int(os.getenv("TMDB_IMPORT_BATCH", "100"))
+MAX_JOB_ERRORS = 100  # в job.errors храним только первые ошибки, остальные — счётчиком
+POSTER_BASE = "https://image.tmdb.org/t/p/w500"
+
+# поля, которые повторный импорт обновляет; цена, флаги и ссылки на файлы остаются за админкой
+TMDB_FIELDS = (
+    "title_local", "title_original", "synopsis", "description_full", "country_text",
+    "release_year", "runtime_min", "imdb_rating", "poster_url", "trailer_url",
+)
+
+_sessionmaker = None
+_tasks: set[asyncio.Task] = set()
+
+
+def _session():
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = get_async_sessionmaker()
+    return _sessionmaker()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _trailer(details: dict) -> Optional[str]:
+    for v in ((details.get("videos") or {}).get("results") or []):
+        if v.get("site") == "YouTube" and v.get("type") in ("Trailer", "Teaser"):
+            return f"https://www.youtube.com/watch?v={v.get('key')}"
+    return None
+
+
+def map_movie(details: dict, price_rub: Decimal) -> tuple[dict, list[str]]:
+    """TMDB /movie/{id} -> (row for `movie`, genre names)."""
+    release = details.get("release_date") or ""
+    rating = details.get("vote_average")
+    countries = ", ".join(c["name"] for c in details.get("production_countries") or [] if c.get("name"))
+    row = {
+        "tmdb_id": details["id"],
+        "title_local": (details.get("title") or details.get("original_title") or "")[:256],
+        "title_original": (details.get("original_title") or "")[:256] or None,
+        "synopsis": details.get("tagline") or None,
+        "description_full": details.get("overview") or None,
+        "country_text": countries[:128] or None,
+        "release_year": int(release[:4]) if release[:4].isdigit() else None,
+        "runtime_min": details.get("runtime") or None,
+        "imdb_rating": round(Decimal(str(rating)), 1) if rating else None,
+        "poster_url": f"{POSTER_BASE}{details['poster_path']}" if details.get("poster_path") else None,
+        "trailer_url": _trailer(details),
+        "price_rub": price_rub,
+        "is_new": False,
+        "is_exclusive": False,
+    }
+    genres = [_normalize_name_ru(g["name"]) for g in details.get("genres") or [] if g.get("name")]
+    return row, genres
+
+
+async def _resolve_ids(params: dict) -> list[int]:
+    if params.get("tmdb_ids"):
+        return list(dict.fromkeys(int(i) for i in params["tmdb_ids"]))
+    query = {**(params.get("discover") or {}), "language": params.get("language", "ru-RU")}
+    first = await tmdb.get("/discover/movie", {**query, "page": 1})
+    pages = min(int(first.get("total_pages") or 1), int(params.get("max_pages", 1)), 500)
+    results = [first] + list(await asyncio.gather(*(
+        tmdb.get("/discover/movie", {**query, "page": page}) for page in range(2, pages + 1)
+    )))
+    ids = [m["id"] for page in results for m in page.get("results") or [] if m.get("id")]
+    return list(dict.fromkeys(ids))
+
+
+async def _genre_ids(db, names: set[str]) -> dict[str, int]:
+    """lower(name) -> genre_id; missing genres are created in the same statement batch."""
+    if not names:
+        return {}
+    wanted = {n.lower(): n for n in names}
+    rows = (await db.execute(
+        select(Genre.genre_id, Genre.name).where(func.lower(Genre.name).in_(list(wanted)))
+    )).all()
+    found = {name.lower(): gid for gid, name in rows}
+    missing = [wanted[k] for k in wanted if k not in found]
+    if missing:
+        await db.execute(pg_insert(Genre).values([{"name": n} for n in missing]).on_conflict_do_nothing())
+        rows = (await db.execute(
+            select(Genre.genre_id, Genre.name).where(func.lower(Genre.name).in_([n.lower() for n in missing]))
+        )).all()
+        found.update({name.lower(): gid for gid, name in rows})
+    return found
+
+
+async def _upsert_batch(
+    db, mapped: list[tuple[dict, list[str]]]
+) -> tuple[list[int], int, int, list[tuple[int, str]]]:
+    """INSERT ... ON CONFLICT (tmdb_id) DO UPDATE for the batch plus its movie_genre links.
+
+    Also returns (movie_id, poster_url) of the movies whose poster has no local copy yet.
+    """
+    rows = [row for row, _ in mapped]
+    stmt = pg_insert(Movie).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Movie.tmdb_id],
+        set_={field: stmt.excluded[field] for field in TMDB_FIELDS} | {"updated_at": func.now()},
+    ).returning(
+        Movie.movie_id, Movie.tmdb_id, Movie.poster_url, Movie.poster_storage_key,
+        literal_column("(xmax = 0)").label("inserted"),
+    )
+    result = (await db.execute(stmt)).all()
+    movie_by_tmdb = {r.tmdb_id: r.movie_id for r in result}
+    created = sum(1 for r in result if r.inserted)
+
+    genre_ids = await _genre_ids(db, {name for _, names in mapped for name in names})
+    links = [
+        {"movie_id": movie_by_tmdb[row["tmdb_id"]], "genre_id": genre_ids[name.lower()]}
+        for row, names in mapped
+        for name in names
+        if name.lower() in genre_ids
+    ]
+    if links:
+        # только добавляем: жанры, выставленные вручную в админке, импорт не трогает
+        await db.execute(pg_insert(movie_genre).values(links).on_conflict_do_nothing())
+    to_mirror = [(r.movie_id, r.poster_url) for r in result if r.poster_url and not r.poster_storage_key]
+    return list(movie_by_tmdb.values()), created, len(result) - created, to_mirror
+
+
+async def run_import(job_id: int) -> None:
+    async with _session() as db:
+        job = await db.get(ImportJob, job_id)
+        params = dict(job.params)
+        job.status, job.started_at = "running", _now()
+        await db.commit()
+
+    touched: list[int] = []
+    errors: list[dict[str, Any]] = []
+    try:
+        ids = await _resolve_ids(params)
+        async with _session() as db:
+            await db.execute(update(ImportJob).where(ImportJob.job_id == job_id).values(total=len(ids)))
+            await db.commit()
+
+        price = Decimal(str(params.get("default_price_rub", "0")))
+        language = params.get("language", "ru-RU")
+        limiter = asyncio.Semaphore(IMPORT_CONCURRENCY)
+
+        async def _details(tmdb_id: int) -> Optional[dict]:
+            async with limiter:
+                try:
+                    return await tmdb.movie_details(tmdb_id, language=language, append="videos")
+                except (tmdb.TMDBNotFound, tmdb.TMDBUnavailable) as e:
+                    errors.append({"tmdb_id": tmdb_id, "error": type(e).__name__})
+                    return None
+
+        for start in range(0, len(ids), IMPORT_BATCH):
+            chunk = ids[start:start + IMPORT_BATCH]
+            errors_before = len(errors)
+            fetched = {d["id"]: d for d in await asyncio.gather(*(_details(i) for i in chunk)) if d and d.get("id")}
+            # один tmdb_id дважды в одном INSERT ... ON CONFLICT — ошибка Postgres, поэтому словарь
+            mapped = [map_movie(d, price) for d in fetched.values()]
+            async with _session() as db:
+                created = updated = 0
+                to_mirror = []
+                if mapped:
+                    movie_ids, created, updated, to_mirror = await _upsert_batch(db, mapped)
+                    touched.extend(movie_ids)
+                # прогресс пишем в той же транзакции, что и фильмы: счётчики не расходятся с данными
+                await db.execute(
+                    update(ImportJob)
+                    .where(ImportJob.job_id == job_id)
+                    .values(
+                        processed=ImportJob.processed + len(chunk),
+                        created=ImportJob.created + created,
+                        updated=ImportJob.updated + updated,
+                        failed=ImportJob.failed + (len(errors) - errors_before),
+                        errors=errors[:MAX_JOB_ERRORS],
+                    )
+                )
+                await db.commit()
+            # постеры копируем к себе после коммита пачки, не дожидаясь конца импорта
+            schedule_mirrors(to_mirror)
+        status = "done"
+    except Exception as e:
+        print(f"⚠️  Импорт TMDB #{job_id} прерван: {e}")
+        errors.append({"error": str(e)[:500]})
+        status = "failed"
+
+    if touched:
+        # одно событие на весь импорт: кэши каталога сбрасываются один раз, а не 5000
+        try:
+            from app.core.redis import publish_catalog_event, publish_movies_event
+            await publish_movies_event("imported", touched, data={"job_id": job_id, "count": len(touched)})
+            # импорт мог создать новые жанры — справочники в памяти сервисов перечитываются
+            await genre_cache.reload()
+            await publish_catalog_event(genre_cache.GENRES_CHANGED)
+        except Exception as e:
+            print(f"⚠️  Импорт TMDB #{job_id}: кэши каталога не сброшены: {e}")
+            errors.insert(0, {"error": f"catalog events: {str(e)[:500]}"})
+
+    async with _session() as db:
+        await db.execute(
+            update(ImportJob)
+            .where(ImportJob.job_id == job_id)
+            .values(status=status, finished_at=_now(), errors=errors[:MAX_JOB_ERRORS])
+        )
+        await db.commit()
+
+
+def start_import(job_id: int) -> None:
+    task = asyncio.create_task(run_import(job_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def fail_interrupted_jobs() -> int:
+    """Jobs left queued/running by a previous process will never finish; mark them so they can be resubmitted."""
+    async with _session() as db:
+        result = await db.execute(
+            update(ImportJob)
+            .where(ImportJob.status.in_(("queued", "running")))
+            .values(status="failed", finished_at=_now(), errors=[{"error": "interrupted by restart"}])
+            .returning(ImportJob.job_id)
+        )
+        count = len(result.all())
+        await db.commit()
+    return count
@@ -1,39 +1,15 @@
-import os
-import httpx
-from dotenv import load_dotenv
-
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-
-
-
-
-load_dotenv()
-
-TMDB_BEARER_TOKEN = os.getenv("TMDB_BEARER_TOKEN")
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
-
-headers = {
-    "Authorization": f"Bearer {TMDB_BEARER_TOKEN}",
-    "accept": "application/json"
-}
+from kino_common import tmdb
 
 
 async def search_tmdb_movie_by_name(query: str) -> dict:
-    url = f"{TMDB_BASE_URL}/search/movie"
-    params = {"query": query}
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+    return await tmdb.get("/search/movie", {"query": query})
+
 
 async def fetch_tmdb_movie(tmdb_id: int) -> dict:
-    url = f"{TMDB_BASE_URL}/movie/{tmdb_id}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    return await tmdb.get(f"/movie/{tmdb_id}")
 
 
 
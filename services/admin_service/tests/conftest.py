@@ -0,0 +1,62 @@
+"""Database tests run against a real Postgres (the code under test uses RETURNING and
+ILIKE). Point TEST_DATABASE_URL at a throwaway database:
+
+    TEST_DATABASE_URL=postgresql+asyncpg://postgres@localhost/admin_test pytest -q
+
+Without it the database tests are skipped.
+"""
+import asyncio
+import os
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # app.db.session reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+requires_db = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def run(fn, *args, **kwargs):
+    """Run one async test body on a fresh loop; pooled connections belong to that loop, so dispose them after."""
+    from app.db import session
+
+    async def main():
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            if session._engine is not None:
+                await session._engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _create_schema() -> None:
+    from app.db.session import Base, get_engine
+    from app.models import import_job, movie_models  # noqa: F401  registers the tables
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@pytest.fixture(scope="session")
+def schema():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    run(_create_schema)
+
+
+@pytest.fixture
+def clean_db(schema):
+    from sqlalchemy import text
+
+    from app.db.session import Base, get_engine
+
+    async def truncate():
+        async with get_engine().begin() as conn:
+            tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+            await conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+    run(truncate)
@@ -0,0 +1,33 @@
+from sqlalchemy import select
+
+from conftest import requires_db, run
+
+pytestmark = requires_db
+
+
+def test_movies_are_hydrated_from_the_in_memory_dictionary(clean_db, monkeypatch):
+    from app.core import genre_cache
+    from app.db.session import get_async_sessionmaker
+    from app.models.movie_models import Genre, Movie, movie_genre
+
+    # the session maker is bound to the engine of the previous test's loop
+    monkeypatch.setattr(genre_cache, "_sessionmaker", None)
+
+    async def scenario():
+        async with get_async_sessionmaker()() as db:
+            drama, comedy = Genre(name="драма"), Genre(name="комедия")
+            movie = Movie(title_local="Фильм", price_rub=199)
+            db.add_all([drama, comedy, movie])
+            await db.flush()
+            await db.execute(movie_genre.insert().values(movie_id=movie.movie_id, genre_id=drama.genre_id))
+            await db.commit()
+        version = await genre_cache.reload()
+        async with get_async_sessionmaker()() as db:
+            row = (await db.execute(select(Movie, genre_cache.genre_ids_column()))).one()
+        return version, await genre_cache.all_genres(), genre_cache.movie_with_genres(*row)
+
+    version, genres, movie = run(scenario)
+    assert [g["name"] for g in genres] == ["драма", "комедия"]
+    assert genre_cache.etag() == f'"genres-{version}"'
+    assert movie["title_local"] == "Фильм"
+    assert [g["name"] for g in movie["genres"]] == ["драма"]
@@ -0,0 +1,43 @@
+from conftest import requires_db, run
+
+pytestmark = requires_db
+
+
+def test_bulk_create_separates_new_movies_from_upserted_ones(clean_db, monkeypatch):
+    from app.api.v1 import movies
+    from app.core import redis
+    from app.db.session import get_async_sessionmaker
+    from app.models.movie_models import Movie
+    from app.schemas.movie import MovieBulkRequest
+
+    mirrored, events = [], []
+    monkeypatch.setattr(movies, "schedule_mirror", lambda movie_id, url: mirrored.append((movie_id, url)))
+
+    async def publish_movies_event(event_type, movie_ids, data=None):
+        events.append((event_type, movie_ids, data))
+
+    monkeypatch.setattr(redis, "publish_movies_event", publish_movies_event)
+
+    async def scenario():
+        async with get_async_sessionmaker()() as db:
+            old = Movie(title_local="Старый", price_rub=199, tmdb_id=1, poster_storage_key="a" * 64 + ".png")
+            db.add(old)
+            await db.flush()
+            old_id = old.movie_id
+            await db.commit()
+        payload = MovieBulkRequest(create=[
+            {"title_local": "Старый, правка", "tmdb_id": 1, "poster_url": "https://cdn.test/old.jpg",
+             "poster_storage_key": "a" * 64 + ".png"},
+            {"title_local": "Новый", "tmdb_id": 2, "poster_url": "https://cdn.test/new.jpg"},
+            {"title_local": "Свой", "poster_url": "/api/files/" + "b" * 64 + ".png", "poster_storage_key": "b" * 64 + ".png"},
+        ])
+        async with get_async_sessionmaker()() as db:
+            result = await movies.bulk_movies(payload, db=db, _={})
+        return old_id, result
+
+    old_id, result = run(scenario)
+    new_id, own_id = result.created
+    assert result.updated == [old_id]
+    assert events[0][2] == {"created": 2, "updated": 1, "patched": 0, "deleted": 0}
+    # only the movie without a local copy of its poster is mirrored
+    assert mirrored == [(new_id, "https://cdn.test/new.jpg")]
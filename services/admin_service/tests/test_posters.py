@@ -0,0 +1,226 @@
+import hashlib
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import select
+
+from conftest import requires_db, run
+
+pytestmark = requires_db
+
+POSTER = b"\x89PNG\r\n\x1a\n" + b"poster-bytes" * 100
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Plays both the image CDN (GET /t/p/...) and the BFF upload endpoint (POST /api/upload)."""
+
+    uploads: list[tuple[str, bytes]] = []
+    downloads: list[str] = []
+    download_headers: list[dict] = []
+
+    def do_GET(self):
+        self.downloads.append(self.path)
+        self.download_headers.append(dict(self.headers))
+        if self.path == "/t/p/w500/poster.png":
+            self._send(200, POSTER, "image/png")
+        elif self.path == "/t/p/w500/redirect.png":
+            self.send_response(302)
+            self.send_header("Location", "/t/p/w500/poster.png")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/t/p/w500/endless.png":
+            # no Content-Length: the size is only known by reading
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.end_headers()
+            try:
+                for _ in range(1000):
+                    self.wfile.write(b"x" * 1024)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        part = next(message.iter_parts())
+        content = part.get_payload(decode=True)
+        self.uploads.append((self.path, content))
+        key = hashlib.sha256(content).hexdigest() + ".png"
+        self._send(200, f'{{"key": "{key}"}}'.encode(), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    from app.core import redis
+    from app.services import posters
+
+    StandIn.uploads, StandIn.downloads, StandIn.download_headers = [], [], []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    events = []
+
+    async def publish_movie_event(**event):
+        events.append(event)
+
+    monkeypatch.setattr(posters, "BFF_BASE", base)
+    monkeypatch.setattr(redis, "publish_movie_event", publish_movie_event)
+    # the session maker is bound to the engine of the previous test's loop
+    monkeypatch.setattr(posters, "_sessionmaker", None)
+    yield base, events
+    server.shutdown()
+    server.server_close()
+
+
+async def _add_movie(poster_url: str) -> int:
+    from app.db.session import get_async_sessionmaker
+    from app.models.movie_models import Movie
+
+    async with get_async_sessionmaker()() as db:
+        movie = Movie(title_local="Фильм", price_rub=199, poster_url=poster_url)
+        db.add(movie)
+        await db.flush()
+        movie_id = movie.movie_id
+        await db.commit()
+        return movie_id
+
+
+async def _poster_columns(movie_id: int):
+    from app.db.session import get_async_sessionmaker
+    from app.models.movie_models import Movie
+
+    async with get_async_sessionmaker()() as db:
+        return (await db.execute(
+            select(Movie.poster_url, Movie.poster_storage_key).where(Movie.movie_id == movie_id)
+        )).one()
+
+
+async def _close_clients():
+    from kino_common.http import close_clients
+
+    from app.services.posters import close_client
+
+    await close_clients()
+    await close_client()
+
+
+def test_mirror_stores_the_poster_and_records_its_key(clean_db, stand_in):
+    from app.services.posters import mirror_poster
+
+    base, events = stand_in
+    url = f"{base}/t/p/w500/redirect.png"
+
+    async def scenario():
+        try:
+            movie_id = await _add_movie(url)
+            key = await mirror_poster(movie_id, url)
+            return movie_id, key, await _poster_columns(movie_id)
+        finally:
+            await _close_clients()
+
+    movie_id, key, row = run(scenario)
+    expected = hashlib.sha256(POSTER).hexdigest() + ".png"
+    assert key == expected
+    assert StandIn.uploads == [("/api/upload?kind=poster", POSTER)]
+    # the CDN is a third party: our trace and request ids stay inside
+    assert not any(
+        name.lower() in ("traceparent", "x-request-id") for headers in StandIn.download_headers for name in headers
+    )
+    # poster_url stays as entered; the key says where our copy is
+    assert (row.poster_url, row.poster_storage_key) == (url, expected)
+    assert events == [{
+        "movie_id": movie_id, "event_type": "updated",
+        "data": {"movie_id": movie_id, "poster_storage_key": expected},
+    }]
+
+
+def test_download_stops_once_the_size_cap_is_passed(stand_in, monkeypatch):
+    from app.services import posters
+
+    base, _ = stand_in
+    monkeypatch.setattr(posters, "MIRROR_MAX_BYTES", 64 * 1024)
+
+    async def scenario():
+        try:
+            await posters._download(f"{base}/t/p/w500/endless.png")
+        finally:
+            await _close_clients()
+
+    with pytest.raises(ValueError, match="larger than"):
+        run(scenario)
+    assert StandIn.uploads == []
+
+
+def test_mirror_does_not_overwrite_a_newer_edit(clean_db, stand_in, monkeypatch):
+    from app.services import posters
+
+    base, events = stand_in
+    old_url = f"{base}/t/p/w500/poster.png"
+    download = posters._download
+
+    async def edited_while_downloading(url):
+        from sqlalchemy import update
+
+        from app.db.session import get_async_sessionmaker
+        from app.models.movie_models import Movie
+
+        result = await download(url)
+        async with get_async_sessionmaker()() as db:
+            await db.execute(update(Movie).values(poster_url="https://example.com/new.jpg"))
+            await db.commit()
+        return result
+
+    monkeypatch.setattr(posters, "_download", edited_while_downloading)
+
+    async def scenario():
+        try:
+            movie_id = await _add_movie(old_url)
+            return await posters.mirror_poster(movie_id, old_url), await _poster_columns(movie_id)
+        finally:
+            await _close_clients()
+
+    key, row = run(scenario)
+    assert key is None
+    assert (row.poster_url, row.poster_storage_key) == ("https://example.com/new.jpg", None)
+    assert events == []
+
+
+def test_backfill_mirrors_external_posters_and_counts_failures(clean_db, stand_in):
+    from app.services.posters import backfill_posters
+
+    base, _ = stand_in
+
+    async def scenario():
+        try:
+            ok = await _add_movie(f"{base}/t/p/w500/poster.png")
+            missing = await _add_movie(f"{base}/t/p/w500/gone.png")
+            local = await _add_movie("/api/files/" + "a" * 64 + ".png")
+            state = await backfill_posters(concurrency=2)
+            return state, [await _poster_columns(m) for m in (ok, missing, local)]
+        finally:
+            await _close_clients()
+
+    state, (ok, missing, local) = run(scenario)
+    assert (state["scanned"], state["mirrored"], state["failed"], state["running"]) == (2, 1, 1, False)
+    assert ok.poster_storage_key == hashlib.sha256(POSTER).hexdigest() + ".png"
+    assert missing.poster_storage_key is None
+    # uploaded through our own storage: nothing to mirror, never scanned
+    assert local.poster_storage_key is None
@@ -0,0 +1,70 @@
+from sqlalchemy import select
+
+from conftest import requires_db, run
+
+pytestmark = requires_db
+
+
+def _details(tmdb_id: int, poster: str | None) -> dict:
+    return {"id": tmdb_id, "title": f"Фильм {tmdb_id}", "poster_path": poster, "genres": [{"name": "драма"}]}
+
+
+def _stub(monkeypatch, mirrored: list, *, events_fail: bool = False):
+    from app.core import genre_cache, redis
+    from app.services import tmdb_import
+
+    async def movie_details(tmdb_id, language="ru-RU", append=None):
+        return _details(tmdb_id, "/p.jpg" if tmdb_id % 2 else None)
+
+    async def publish(*args, **kwargs):
+        if events_fail:
+            raise ConnectionError("redis is down")
+
+    async def reload():
+        pass
+
+    monkeypatch.setattr(tmdb_import.tmdb, "movie_details", movie_details)
+    monkeypatch.setattr(tmdb_import, "schedule_mirrors", lambda movies: mirrored.append(sorted(movies)))
+    monkeypatch.setattr(tmdb_import, "IMPORT_BATCH", 2)
+    monkeypatch.setattr(tmdb_import, "_sessionmaker", None)
+    monkeypatch.setattr(redis, "publish_movies_event", publish)
+    monkeypatch.setattr(redis, "publish_catalog_event", publish)
+    monkeypatch.setattr(genre_cache, "reload", reload)
+
+
+async def _run_job(tmdb_ids: list[int]):
+    from app.db.session import get_async_sessionmaker
+    from app.models.import_job import ImportJob
+    from app.models.movie_models import Movie
+    from app.services.tmdb_import import run_import
+
+    async with get_async_sessionmaker()() as db:
+        job = ImportJob(kind="tmdb_movies", params={"tmdb_ids": tmdb_ids, "default_price_rub": "199"})
+        db.add(job)
+        await db.flush()
+        job_id = job.job_id
+        await db.commit()
+    await run_import(job_id)
+    async with get_async_sessionmaker()() as db:
+        job = await db.get(ImportJob, job_id)
+        movies = dict((await db.execute(select(Movie.tmdb_id, Movie.movie_id))).all())
+        return job, movies
+
+
+def test_each_committed_batch_queues_its_external_posters(clean_db, monkeypatch):
+    mirrored = []
+    _stub(monkeypatch, mirrored)
+
+    job, movies = run(_run_job, [1, 2, 3])
+    assert (job.status, job.created, job.errors) == ("done", 3, [])
+    poster = "https://image.tmdb.org/t/p/w500/p.jpg"
+    # batches of two; tmdb 2 has no poster
+    assert mirrored == [[(movies[1], poster)], [(movies[3], poster)]]
+
+
+def test_failed_catalog_events_are_recorded_on_the_job(clean_db, monkeypatch):
+    _stub(monkeypatch, [], events_fail=True)
+
+    job, _ = run(_run_job, [1])
+    assert job.status == "done"
+    assert job.errors == [{"error": "catalog events: redis is down"}]
@@ -14,9 +14,20 @@ router = APIRouter(prefix="/users", tags=["internal-users"])
 async def list_users(
     db: AsyncSession = Depends(get_db),
     q: Optional[str] = Query(None, description="Поиск по имени/email/ИНН"),
+    ids: Optional[str] = Query(None, description="ID через запятую — пакетная выборка (до 1000)"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
 ):
+    if ids:
+        try:
+            id_list = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        if len(id_list) > 1000:
+            raise HTTPException(status_code=400, detail="At most 1000 ids per request")
+        users = (await db.execute(select(User).where(User.id.in_(id_list)))).scalars().all()
+        return {"users": users, "total": len(users)}
+
     query = select(User)
     if q:
         like = f"%{q.lower()}%"
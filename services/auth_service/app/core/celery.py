@@ -3,9 +3,14 @@ from celery import Celery
 import os
 from dotenv import load_dotenv
 
+from kino_common import tracing
+
 load_dotenv()
 
 celery_app = Celery(
     'auth_service',
     broker=os.getenv('REDIS_URL')
 )
+
+# задачи, поставленные из auth_service, несут trace context запроса
+tracing.instrument_celery()
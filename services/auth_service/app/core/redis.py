@@ -1,7 +1,8 @@
 from redis.asyncio import Redis
+from kino_common import metrics, tracing
 from app.core.config import REDIS_URL
 
-redis = Redis.from_url(REDIS_URL, decode_responses=True)
+redis = metrics.instrument_redis(tracing.instrument_redis(Redis.from_url(REDIS_URL, decode_responses=True)))
 
 REFRESH_PREFIX = "refresh_token:"
 
@@ -1,9 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from app.core.config import DATABASE_URL
+from kino_common import metrics, query_stats, tracing
+from app.core.config import DATABASE_URL, SQL_ECHO
 
 # Создание асинхронного движка
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO)
+tracing.instrument_sqlalchemy(engine)
+metrics.instrument_sqlalchemy(engine)
+query_stats.instrument_sqlalchemy(engine)
 
 # Асинхронная фабрика сессий
 async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
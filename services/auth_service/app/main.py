@@ -1,9 +1,13 @@
+import asyncio
+
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import auth, internal_users, admin
 from app.models.user import Base
 from app.db.database import engine
+from kino_common import metrics, query_stats, tracing
+from kino_common.http import close_clients, deadline_middleware
 
 app = FastAPI(
     title="Auth Service",
@@ -11,6 +15,7 @@ app = FastAPI(
     redoc_url="/redoc",
     openapi_url="/openapi.json",
 )
+app.middleware("http")(deadline_middleware)
 
 # CORS — если нужен ограниченный список, поменяй на конкретные origin'ы
 app.add_middleware(
@@ -20,6 +25,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(metrics.metrics_middleware)
+tracing.configure("auth_service")
+app.middleware("http")(tracing.tracing_middleware)
 
 # Группа внутренних ручек
 internal_router = APIRouter(prefix="/internal", tags=["internal"])
@@ -29,9 +37,22 @@ internal_router.include_router(internal_users.router)
 app.include_router(internal_router)
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(admin.router, prefix="/auth", tags=["Admin"])
+app.add_api_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+app.add_api_route("/internal/query-stats", query_stats.stats_endpoint, include_in_schema=False)
+
+_background_stop = asyncio.Event()
+_background_tasks: list[asyncio.Task] = []
 
 @app.on_event("startup")
 async def on_startup():
     # создаём таблицы если их нет
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    _background_tasks.append(asyncio.create_task(query_stats.report_periodically(_background_stop)))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    _background_stop.set()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    # закрываем пул соединений к другим сервисам
+    await close_clients()
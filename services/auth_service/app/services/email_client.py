@@ -1,5 +1,5 @@
-import httpx
 import os
+from kino_common.http import get_client
 from app.core.config import EMAIL_SERVICE_URL
 
 async def send_email_async(to_email: str, subject: str, email_type: str, token: str):
@@ -29,12 +29,12 @@ async def send_email_async(to_email: str, subject: str, email_type: str, token:
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{EMAIL_SERVICE_URL}/send-email", json=email_data, timeout=10.0)
-            print(f"📧 Password reset email response: {response.status_code}")
-            if response.status_code == 200:
-                print("✅ Password reset email sent successfully")
-            else:
-                print(f"❌ Email service error: {response.text}")
+        client = get_client(EMAIL_SERVICE_URL)
+        response = await client.post("/send-email", json=email_data, timeout=10.0)
+        print(f"📧 Password reset email response: {response.status_code}")
+        if response.status_code == 200:
+            print("✅ Password reset email sent successfully")
+        else:
+            print(f"❌ Email service error: {response.text}")
     except Exception as e:
         print(f"❌ Failed to send password reset email: {e}")
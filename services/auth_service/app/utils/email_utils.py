@@ -1,6 +1,6 @@
-import httpx
 import os
 from datetime import datetime
+from kino_common.http import get_client
 from app.core.config import ADMIN_EMAIL, SUPPORT_EMAIL, FROM_EMAIL, EMAIL_SERVICE_URL
 from app.models.user import User
 
@@ -22,13 +22,13 @@ async def send_admin_notification(user: User):
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{EMAIL_SERVICE_URL}/send-email", json=email_data, timeout=10.0)
-            print(f"📧 Admin notification response: {response.status_code}")
-            if response.status_code == 200:
-                print("✅ Admin notification sent successfully")
-            else:
-                print(f"❌ Email service error: {response.text}")
+        client = get_client(EMAIL_SERVICE_URL)
+        response = await client.post("/send-email", json=email_data, timeout=10.0)
+        print(f"📧 Admin notification response: {response.status_code}")
+        if response.status_code == 200:
+            print("✅ Admin notification sent successfully")
+        else:
+            print(f"❌ Email service error: {response.text}")
     except Exception as e:
         print(f"❌ Failed to send admin notification: {e}")
 
@@ -47,13 +47,13 @@ async def send_approval_email(user: User):
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{EMAIL_SERVICE_URL}/send-email", json=email_data, timeout=10.0)
-            print(f"📧 Approval email response: {response.status_code}")
-            if response.status_code == 200:
-                print("✅ Approval email sent successfully")
-            else:
-                print(f"❌ Email service error: {response.text}")
+        client = get_client(EMAIL_SERVICE_URL)
+        response = await client.post("/send-email", json=email_data, timeout=10.0)
+        print(f"📧 Approval email response: {response.status_code}")
+        if response.status_code == 200:
+            print("✅ Approval email sent successfully")
+        else:
+            print(f"❌ Email service error: {response.text}")
     except Exception as e:
         print(f"❌ Failed to send approval email: {e}")
 
@@ -74,12 +74,12 @@ async def send_rejection_email(user: User, reason: str = "Не указана"):
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{EMAIL_SERVICE_URL}/send-email", json=email_data, timeout=10.0)
-            print(f"📧 Rejection email response: {response.status_code}")
-            if response.status_code == 200:
-                print("✅ Rejection email sent successfully")
-            else:
-                print(f"❌ Email service error: {response.text}")
+        client = get_client(EMAIL_SERVICE_URL)
+        response = await client.post("/send-email", json=email_data, timeout=10.0)
+        print(f"📧 Rejection email response: {response.status_code}")
+        if response.status_code == 200:
+            print("✅ Rejection email sent successfully")
+        else:
+            print(f"❌ Email service error: {response.text}")
     except Exception as e:
         print(f"❌ Failed to send rejection email: {e}")
\ No newline at end of file
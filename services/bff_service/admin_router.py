@@ -1,31 +1,37 @@
 
 from fastapi import APIRouter, Request, Response
-import os, json, httpx
+import os
 from typing import Dict, Any
 
+from . import guards
+from .compose import Composite, Part, compose
+
 router = APIRouter(prefix="/api/admin", tags=["admin-proxy"])
 
 ADMIN_BASE = os.getenv("ADMIN_SERVICE_URL", "http://admin_service:8000")
 
 def _join(*parts: str) -> str:
-    return "/".join(s.strip("/")
-                    for s in parts if s is not None).replace(":/", "://")
+    # strip("/") не трогает "//" после схемы, поэтому base склеивается как есть
+    return "/".join(s.strip("/") for s in parts if s is not None)
 
-async def _proxy(request: Request, method: str, path: str):
-    url = _join(ADMIN_BASE, path)
+def _forward_headers(request: Request) -> dict:
     headers = dict(request.headers)
     # cleanup hop-by-hop headers
     for h in ["host", "content-length"]:
         headers.pop(h, None)
+    # куки клиента уходят как есть в заголовке Cookie: у общего пула клиентов своих кук нет
+    return headers
 
-    cookies = request.cookies
+async def _proxy(request: Request, method: str, path: str):
+    url = _join(ADMIN_BASE, path)
+    headers = _forward_headers(request)
     params = dict(request.query_params)
     body = await request.body()
 
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        r = await client.request(method, url, headers=headers, params=params, content=body, cookies=cookies)
-        content_type = r.headers.get("content-type", "application/json")
-        return Response(content=r.content, status_code=r.status_code, media_type=content_type)
+    r = await guards.call("admin", method, url, headers=headers, params=params, content=body,
+                          follow_redirects=True)
+    content_type = r.headers.get("content-type", "application/json")
+    return Response(content=r.content, status_code=r.status_code, media_type=content_type)
 
 @router.get("/genres/")
 async def genres(request: Request):
@@ -35,44 +41,26 @@ async def genres(request: Request):
 async def movies_list(request: Request):
     return await _proxy(request, "GET", "/admin/movies/")
 
+def _set_genres(movie: dict, genres: list) -> None:
+    movie["genres"] = genres
+
+def _add_genre_ids(movie: dict) -> None:
+    genres = movie.get("genres") or []
+    # Добавляем и ID жанров, и сами жанры в ответ
+    movie["genre_ids"] = [g.get("genre_id", g.get("id")) for g in genres if g.get("genre_id") or g.get("id")]
+
+# admin_service отдаёт фильм уже с жанрами (selectinload), отдельный запрос нужен только для старых ответов
+MOVIE_DETAIL = Composite(
+    primary=Part("movie", "/admin/movies/{movie_id}"),
+    parts=[Part("genres", "/admin/movies/{movie_id}/genres", merge=_set_genres, embedded_key="genres")],
+    finalize=_add_genre_ids,
+)
+
 @router.get("/movies/{movie_id}")
 async def movie_detail(movie_id: int, request: Request):
-    headers = dict(request.headers)
-    # cleanup hop-by-hop headers
-    for h in ["host", "content-length"]:
-        headers.pop(h, None)
+    headers = _forward_headers(request)
     headers['Accept'] = 'application/json'
-    headers['Content-Type'] = 'application/json'
-    
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        # Получаем данные о фильме
-        movie_url = _join(ADMIN_BASE, f"/admin/movies/{movie_id}")
-        movie_response = await client.get(movie_url, headers=headers, cookies=request.cookies)
-        
-        if not movie_response.is_success:
-            return Response(
-                content=movie_response.content,
-                status_code=movie_response.status_code,
-                media_type=movie_response.headers.get('content-type', 'application/json')
-            )
-            
-        movie_data = movie_response.json()
-        
-        # Получаем жанры фильма
-        genres_url = _join(ADMIN_BASE, f"/admin/movies/{movie_id}/genres")
-        genres_response = await client.get(genres_url, headers=headers, cookies=request.cookies)
-        
-        if genres_response.is_success:
-            genres_data = genres_response.json()
-            # Добавляем и ID жанров, и сами жанры в ответ
-            movie_data['genres'] = genres_data
-            movie_data['genre_ids'] = [g.get('genre_id', g.get('id')) for g in genres_data if g.get('genre_id') or g.get('id')]
-        
-        return Response(
-            content=json.dumps(movie_data),
-            status_code=200,
-            media_type='application/json'
-        )
+    return await compose(MOVIE_DETAIL, "admin", ADMIN_BASE, params={"movie_id": movie_id}, headers=headers)
 
 @router.put("/movies/{movie_id}")
 async def movie_update(movie_id: int, request: Request):
@@ -0,0 +1,37 @@
+import asyncio
+import logging
+import os
+
+import redis.asyncio as aioredis
+
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+# admin_service publishes movie changes and catalog-wide changes (genres) here
+CHANNELS = ("movie_events", "catalog_events")
+
+
+async def listen_catalog_events(stop: asyncio.Event) -> None:
+    """Purge cached catalog responses on every catalog change; reconnects on failure."""
+    while not stop.is_set():
+        client = aioredis.from_url(REDIS_URL)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(*CHANNELS)
+            # events may have been missed while disconnected
+            response_cache.purge()
+            while not stop.is_set():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    response_cache.purge()
+        except Exception as e:
+            logger.warning("Catalog events listener error, reconnecting: %s", e)
+            await asyncio.sleep(5)
+        finally:
+            try:
+                await pubsub.close()
+                await client.close()
+            except Exception:
+                pass
@@ -0,0 +1,96 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import httpx
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from . import guards
+
+
+@dataclass
+class Part:
+    """One upstream call contributing to a composite document."""
+    name: str
+    path: str  # str.format template, filled with the composite's path params
+    merge: Callable[[dict, Any], None] | None = None
+    # skip the call when the primary document already carries this key
+    embedded_key: str | None = None
+    required: bool = False
+
+
+@dataclass
+class Composite:
+    primary: Part
+    parts: list[Part] = field(default_factory=list)
+    # runs on the merged document, whether parts were fetched or embedded
+    finalize: Callable[[dict], None] | None = None
+
+
+async def _get(upstream: str, base: str, part: Part, params: dict, **kwargs) -> httpx.Response:
+    url = base.rstrip("/") + part.path.format(**params)
+    return await guards.call(upstream, "GET", url, follow_redirects=True, **kwargs)
+
+
+async def compose(
+    spec: Composite,
+    upstream: str,
+    base: str,
+    *,
+    params: dict,
+    headers: dict | None = None,
+) -> Response:
+    """Run a composite: the primary and independent parts concurrently, embeddable parts only when missing.
+
+    A failed primary or required part is returned to the client as-is; optional parts are dropped on failure.
+    """
+    kwargs = {"headers": headers}
+    primary_task = asyncio.ensure_future(_get(upstream, base, spec.primary, params, **kwargs))
+    independent = {
+        part.name: asyncio.ensure_future(_get(upstream, base, part, params, **kwargs))
+        for part in spec.parts
+        if part.embedded_key is None
+    }
+    try:
+        primary = await primary_task
+    except BaseException:
+        for task in independent.values():
+            task.cancel()
+        raise
+    if not primary.is_success:
+        for task in independent.values():
+            task.cancel()
+        return Response(
+            content=primary.content,
+            status_code=primary.status_code,
+            media_type=primary.headers.get("content-type", "application/json"),
+        )
+    document = primary.json()
+
+    dependent = {
+        part.name: asyncio.ensure_future(_get(upstream, base, part, params, **kwargs))
+        for part in spec.parts
+        if part.embedded_key is not None and part.embedded_key not in document
+    }
+    tasks = {**independent, **dependent}
+    results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+
+    for part in spec.parts:
+        if part.name not in results:
+            continue
+        result = results[part.name]
+        ok = isinstance(result, httpx.Response) and result.is_success
+        if not ok:
+            if part.required:
+                if isinstance(result, httpx.Response):
+                    return Response(content=result.content, status_code=result.status_code,
+                                    media_type=result.headers.get("content-type", "application/json"))
+                return JSONResponse({"detail": f"{part.name} unavailable"}, status_code=502)
+            continue
+        if part.merge is not None:
+            part.merge(document, result.json())
+
+    if spec.finalize is not None:
+        spec.finalize(document)
+    return JSONResponse(document)
@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+import os
+
+import brotli
+from fastapi import Request, Response
+
+MIN_SIZE = int(os.getenv("BFF_COMPRESS_MIN_SIZE", "1024"))
+# Dynamic responses are compressed per request, cached ones once: spend more CPU on the latter
+GZIP_LEVEL = int(os.getenv("BFF_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BFF_BROTLI_QUALITY", "5"))
+BROTLI_QUALITY_CACHED = int(os.getenv("BFF_BROTLI_QUALITY_CACHED", "9"))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+# preferred order when the client weights several encodings equally
+SUPPORTED = ("br", "gzip")
+ETAG_SUFFIX = {"br": "-br", "gzip": "-gz"}
+# stored files are served byte-exact: Range offsets and the sha256 ETag refer to the raw bytes
+UNCOMPRESSED_PREFIXES = ("/api/files",)
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: str | None, size: int) -> bool:
+    return size >= MIN_SIZE and bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _compress_sync(body: bytes, encoding: str, cached: bool) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY_CACHED if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+async def compress(body: bytes, encoding: str, *, cached: bool = False) -> bytes:
+    # off the event loop: a large catalog page takes milliseconds of CPU
+    return await asyncio.to_thread(_compress_sync, body, encoding, cached)
+
+
+def encoded_etag(etag: str | None, encoding: str | None) -> str | None:
+    """Strong validators must differ per content-coding."""
+    if not etag or not encoding or etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + ETAG_SUFFIX[encoding] + '"'
+
+
+def _add_vary(response: Response) -> None:
+    vary = response.headers.get("vary")
+    if not vary:
+        response.headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        response.headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+async def compression_middleware(request: Request, call_next):
+    """Compress responses that nobody compressed yet (cached entries arrive precompressed)."""
+    if request.headers.get("range") or request.url.path.startswith(UNCOMPRESSED_PREFIXES):
+        return await call_next(request)
+    response = await call_next(request)
+    if response.headers.get("content-encoding") or request.method == "HEAD" or response.status_code == 206:
+        return response
+    content_type = response.headers.get("content-type")
+    length = response.headers.get("content-length")
+    if length is None or not is_compressible(content_type, int(length)):
+        return response
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is None:
+        _add_vary(response)
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    compressed = await compress(body, encoding)
+    new_response = Response(content=compressed, status_code=response.status_code)
+    # raw headers keep repeated Set-Cookie lines intact
+    new_response.raw_headers = [
+        (name, value) for name, value in response.raw_headers if name not in (b"content-length", b"etag")
+    ] + [(b"content-length", str(len(compressed)).encode("latin-1"))]
+    new_response.headers["Content-Encoding"] = encoding
+    etag = encoded_etag(response.headers.get("etag"), encoding)
+    if etag:
+        new_response.headers["ETag"] = etag
+    _add_vary(new_response)
+    return new_response
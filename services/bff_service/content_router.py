@@ -1,9 +1,20 @@
 from fastapi import APIRouter, Request, Response
-import os, httpx
+import os
+
+from . import guards
+from .response_cache import Upstream, cached_get, lookup
 
 router = APIRouter(prefix="/api/content", tags=["content-proxy"])
 
 CONTENT_BASE = os.getenv("CONTENT_SERVICE_URL", "http://content_service:8000")
+# Routes whose identical concurrent GETs share one upstream call (content_service ignores auth)
+COALESCED_ROUTES = {
+    name.strip()
+    for name in os.getenv("BFF_COALESCED_ROUTES", "movies_list,movie_detail,genres_list,movie_genres").split(",")
+    if name.strip()
+}
+# Only these request headers can influence a shared response
+SHARED_HEADERS = ("accept", "accept-language")
 
 def _join(*parts: str) -> str:
     result = "/".join(s.strip("/") for s in parts if s and s.strip("/"))
@@ -14,9 +25,36 @@ def _join(*parts: str) -> str:
         result = result.replace("https:", "https://")
     return result
 
-async def _proxy(request: Request, method: str, path: str):
+async def _fetch_shared(url: str, headers: dict, params: list, etag: str | None = None) -> Upstream:
+    if etag:
+        headers = {**headers, "If-None-Match": etag}
+    r = await guards.call("content", "GET", url, headers=headers, params=params, follow_redirects=True)
+    return Upstream(r.status_code, r.content, r.headers.get("content-type", "application/json"), r.headers.get("etag"))
+
+def _shared_key(url: str, params: list, headers: dict) -> tuple:
+    return (url, tuple(sorted(params)), tuple(sorted(headers.items())))
+
+async def fetch_public(route: str, path: str, params: list | None = None, headers: dict | None = None) -> Upstream:
+    """Public catalog GET for server-side composition (same cache and coalescing as the proxy routes)."""
+    url = CONTENT_BASE.rstrip("/") + "/" + path.lstrip("/")
+    params = list(params or [])
+    headers = headers or {}
+    key = _shared_key(url, params, headers)
+    entry, upstream, _ = await lookup(route, key, lambda etag: _fetch_shared(url, headers, params, etag))
+    if entry is None:
+        return upstream
+    return Upstream(200, entry.content, entry.content_type, entry.etag)
+
+async def _proxy(request: Request, method: str, path: str, route: str | None = None):
     # Простое и правильное формирование URL
     url = CONTENT_BASE.rstrip("/") + "/" + path.lstrip("/")
+
+    if method == "GET" and route in COALESCED_ROUTES:
+        headers = {h: request.headers[h] for h in SHARED_HEADERS if h in request.headers}
+        params = list(request.query_params.multi_items())
+        key = _shared_key(url, params, headers)
+        return await cached_get(request, route, key, lambda etag: _fetch_shared(url, headers, params, etag))
+
     headers = dict(request.headers)
     # cleanup hop-by-hop headers
     for h in ["host", "content-length"]:
@@ -25,27 +63,26 @@ async def _proxy(request: Request, method: str, path: str):
     params = dict(request.query_params)
     body = await request.body()
 
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        r = await client.request(method, url, headers=headers, params=params, content=body)
-        content_type = r.headers.get("content-type", "application/json")
-        return Response(content=r.content, status_code=r.status_code, media_type=content_type)
+    r = await guards.call("content", method, url, headers=headers, params=params, content=body, follow_redirects=True)
+    content_type = r.headers.get("content-type", "application/json")
+    return Response(content=r.content, status_code=r.status_code, media_type=content_type)
 
 @router.get("/movies/")
 async def movies_list(request: Request):
     """Get list of movies from content service"""
-    return await _proxy(request, "GET", "api/v1/movies")  # Добавляем правильный префикс
+    return await _proxy(request, "GET", "api/v1/movies", route="movies_list")  # Добавляем правильный префикс
 
 @router.get("/movies/{movie_id}")
 async def movie_detail(movie_id: int, request: Request):
     """Get movie details by ID from content service"""
-    return await _proxy(request, "GET", f"api/v1/movies/{movie_id}")
+    return await _proxy(request, "GET", f"api/v1/movies/{movie_id}", route="movie_detail")
 
 @router.get("/genres/")
 async def genres_list(request: Request):
     """Get list of genres from content service"""
-    return await _proxy(request, "GET", "api/v1/genres")
+    return await _proxy(request, "GET", "api/v1/genres", route="genres_list")
 
 @router.get("/movies/{movie_id}/genres/")
 async def movie_genres(movie_id: int, request: Request):
     """Get genres for specific movie from content service"""
-    return await _proxy(request, "GET", f"api/v1/movies/{movie_id}/genres")
+    return await _proxy(request, "GET", f"api/v1/movies/{movie_id}/genres", route="movie_genres")
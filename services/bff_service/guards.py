@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+import httpx
+from kino_common import metrics, tracing
+
+# name -> [max concurrent requests, max requests waiting for a slot]
+DEFAULT_LIMITS = (50, 100)
+LIMITS: dict[str, tuple[int, int]] = {
+    name: tuple(limits) for name, limits in json.loads(os.getenv("BFF_UPSTREAM_LIMITS", "{}")).items()
+}
+MAX_TIMEOUT = float(os.getenv("BFF_UPSTREAM_MAX_TIMEOUT", "10"))
+MIN_TIMEOUT = float(os.getenv("BFF_UPSTREAM_MIN_TIMEOUT", "1"))
+CONNECT_TIMEOUT = float(os.getenv("BFF_UPSTREAM_CONNECT_TIMEOUT", "3"))
+# timeout = p99 of recent successful calls x this factor, clamped to [MIN_TIMEOUT, MAX_TIMEOUT]
+P99_FACTOR = float(os.getenv("BFF_UPSTREAM_P99_FACTOR", "3"))
+MIN_SAMPLES = 50
+BREAKER_FAILURES = int(os.getenv("BFF_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BFF_BREAKER_RESET_SECONDS", "15"))
+RETRY_STATUSES = {502, 503, 504}
+# total budget for one incoming request; sent upstream as X-Request-Deadline so the
+# services stop retrying and cap their own calls once the client has given up
+REQUEST_DEADLINE_SECONDS = float(os.getenv("BFF_REQUEST_DEADLINE_SECONDS", "15"))
+DEADLINE_HEADER = "X-Request-Deadline"  # absolute unix time, milliseconds
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("bff_request_deadline", default=None)
+
+
+class Overloaded(Exception):
+    """The upstream is shedding load or its breaker is open; answer 503 with Retry-After."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: int):
+        super().__init__(f"{upstream}: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The request's budget ran out before the upstream call was sent."""
+
+
+class _NoCookies(DefaultCookiePolicy):
+    # the pooled clients are shared by all users: never remember a Set-Cookie
+    def set_ok(self, cookie, request):
+        return False
+
+
+class UpstreamGuard:
+    def __init__(self, name: str, concurrency: int, max_waiting: int):
+        self.name = name
+        self.max_waiting = max_waiting
+        self._slots = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.waiting = 0
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.latencies: deque[float] = deque(maxlen=512)
+        self.counters = {"requests": 0, "errors": 0, "shed": 0, "short_circuited": 0}
+        self.client = httpx.AsyncClient(
+            cookies=CookieJar(policy=_NoCookies()),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            event_hooks=metrics.httpx_event_hooks(tracing.httpx_event_hooks()),
+        )
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= BREAKER_RESET_SECONDS:
+            return "half_open"
+        return "open"
+
+    def timeout(self, cap: float | None = None) -> httpx.Timeout:
+        upper = min(cap, MAX_TIMEOUT) if cap else MAX_TIMEOUT
+        read = upper
+        if len(self.latencies) >= MIN_SAMPLES:
+            ordered = sorted(self.latencies)
+            p99 = ordered[int(len(ordered) * 0.99) - 1]
+            read = max(MIN_TIMEOUT, min(upper, p99 * P99_FACTOR))
+        return httpx.Timeout(read, connect=min(CONNECT_TIMEOUT, read))
+
+    @asynccontextmanager
+    async def slot(self):
+        state = self.state
+        if state == "open":
+            self.counters["short_circuited"] += 1
+            retry_after = BREAKER_RESET_SECONDS - (time.monotonic() - self.opened_at)
+            raise Overloaded(self.name, "circuit open", max(1, int(retry_after + 0.5)))
+        if state == "half_open" and self.in_flight:
+            # one probe at a time while half-open
+            self.counters["short_circuited"] += 1
+            raise Overloaded(self.name, "circuit half-open", 1)
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            self.counters["shed"] += 1
+            raise Overloaded(self.name, "too many queued requests", 1)
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.counters["requests"] += 1
+        if ok:
+            self.latencies.append(latency)
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.counters["errors"] += 1
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= BREAKER_FAILURES:
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "timeout_s": round(self.timeout().read, 2),
+            **self.counters,
+        }
+
+
+_guards: dict[str, UpstreamGuard] = {}
+
+
+def guard(name: str) -> UpstreamGuard:
+    g = _guards.get(name)
+    if g is None:
+        concurrency, max_waiting = LIMITS.get(name, DEFAULT_LIMITS)
+        g = _guards[name] = UpstreamGuard(name, concurrency, max_waiting)
+    return g
+
+
+async def call(upstream: str, method: str, url: str, *, timeout_cap: float | None = None, **kwargs) -> httpx.Response:
+    """Send one request to a named upstream through its concurrency limit, breaker and adaptive timeout."""
+    deadline = _deadline.get()
+    if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Request deadline exceeded before {method} {url}")
+        timeout_cap = min(timeout_cap, remaining) if timeout_cap else remaining
+        kwargs["headers"] = {**dict(kwargs.get("headers") or {}), DEADLINE_HEADER: str(int(deadline * 1000))}
+    g = guard(upstream)
+    async with g.slot():
+        started = time.perf_counter()
+        try:
+            resp = await g.client.request(method, url, timeout=g.timeout(timeout_cap), **kwargs)
+        except httpx.HTTPError:
+            g.record(time.perf_counter() - started, ok=False)
+            metrics.record_upstream_error(upstream)
+            raise
+        g.record(time.perf_counter() - started, ok=resp.status_code not in RETRY_STATUSES)
+        return resp
+
+
+async def deadline_middleware(request, call_next):
+    """Give every incoming request a deadline that all upstream calls made for it share."""
+    token = _deadline.set(time.time() + REQUEST_DEADLINE_SECONDS)
+    try:
+        return await call_next(request)
+    finally:
+        _deadline.reset(token)
+
+
+def breaker_states() -> dict:
+    return {name: g.snapshot() for name, g in _guards.items()}
+
+
+def _collect_metrics():
+    snapshots = breaker_states()
+    families = [
+        (f"bff_upstream_{field}_total", "counter", f"Upstream calls: {field.replace('_', ' ')}",
+         [({"upstream": name}, snap[field]) for name, snap in snapshots.items()])
+        for field in ("requests", "errors", "shed", "short_circuited")
+    ]
+    families += [
+        (f"bff_upstream_{field}", "gauge", help, [({"upstream": name}, snap[field]) for name, snap in snapshots.items()])
+        for field, help in (
+            ("in_flight", "Calls holding a concurrency slot"),
+            ("waiting", "Calls queued for a concurrency slot"),
+            ("timeout_s", "Current adaptive read timeout"),
+        )
+    ]
+    families.append((
+        "bff_upstream_breaker_open", "gauge", "1 while the upstream breaker is open",
+        [({"upstream": name}, int(snap["state"] == "open")) for name, snap in snapshots.items()],
+    ))
+    return families
+
+
+metrics.register_collector(_collect_metrics)
+
+
+async def close_all() -> None:
+    for g in list(_guards.values()):
+        await g.client.aclose()
+    _guards.clear()
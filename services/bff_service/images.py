@@ -0,0 +1,120 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from . import storage
+from .singleflight import singleflight
+
+logger = logging.getLogger(__name__)
+
+# poster widths the card grid and detail pages ask for
+WIDTHS = tuple(int(w) for w in os.getenv("BFF_IMAGE_WIDTHS", "185,342,500,780").split(","))
+WORKERS = int(os.getenv("BFF_IMAGE_WORKERS", "2"))
+WEBP_QUALITY = int(os.getenv("BFF_IMAGE_WEBP_QUALITY", "80"))
+JPEG_QUALITY = int(os.getenv("BFF_IMAGE_JPEG_QUALITY", "82"))
+# refuse decompression bombs before resizing
+MAX_PIXELS = int(os.getenv("BFF_IMAGE_MAX_PIXELS", str(40_000_000)))
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+_pool: ProcessPoolExecutor | None = None
+_tasks: set[asyncio.Task] = set()
+
+
+def variant_key(sha256: str, width: int, fmt: str) -> str:
+    # deliberately not a storage key: variants are only reachable through /api/images
+    return f"{sha256}.w{width}.{fmt}"
+
+
+def pick_width(requested: int | None) -> int:
+    if requested is None:
+        return WIDTHS[-1]
+    for width in WIDTHS:
+        if width >= requested:
+            return width
+    return WIDTHS[-1]
+
+
+def pick_format(accept: str | None) -> str:
+    return "webp" if accept and "image/webp" in accept else "jpeg"
+
+
+def _render(data: bytes, widths: tuple[int, ...]) -> dict[tuple[int, str], bytes]:
+    """Runs in a worker process: decode once, emit WebP + JPEG per width bucket."""
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    with Image.open(io.BytesIO(data)) as src:
+        src.seek(0)  # first frame of a GIF
+        image = src.convert("RGBA" if src.mode in ("RGBA", "LA", "P") else "RGB")
+    out: dict[tuple[int, str], bytes] = {}
+    for width in widths:
+        # never upscale: buckets above the original width get the original width
+        target = min(width, image.width)
+        height = max(1, round(image.height * target / image.width))
+        resized = image if target == image.width else image.resize((target, height), Image.LANCZOS)
+
+        buf = io.BytesIO()
+        resized.save(buf, "WEBP", quality=WEBP_QUALITY, method=4)
+        out[(width, "webp")] = buf.getvalue()
+
+        if resized.mode == "RGBA":
+            flat = Image.new("RGB", resized.size, (255, 255, 255))
+            flat.paste(resized, mask=resized.getchannel("A"))
+            resized = flat
+        buf = io.BytesIO()
+        resized.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        out[(width, "jpeg")] = buf.getvalue()
+    return out
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and open sockets is asking for trouble
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def _generate(key: str) -> int:
+    parsed = storage.parse_key(key)
+    if parsed is None or not parsed[1].startswith("image/"):
+        return 0
+    sha256 = parsed[0]
+    data = await storage.read_bytes(key)
+    if data is None:
+        return 0
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(_get_pool(), _render, data, WIDTHS)
+    backend = storage.get_backend()
+    await asyncio.gather(*(
+        backend.put_bytes(variant_key(sha256, width, fmt), body, FORMATS[fmt])
+        for (width, fmt), body in rendered.items()
+    ))
+    return len(rendered)
+
+
+async def ensure_variants(key: str) -> int:
+    """Render every width/format of an uploaded image once; concurrent callers share the work."""
+    return await singleflight.do("image_variants", ("image_variants", key), lambda: _generate(key))
+
+
+def schedule_variants(key: str) -> None:
+    task = asyncio.ensure_future(ensure_variants(key))
+    _tasks.add(task)
+
+    def _done(t: asyncio.Task) -> None:
+        _tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            logger.error("Image variants failed for %s", key, exc_info=t.exception())
+
+    task.add_done_callback(_done)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
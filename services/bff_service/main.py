@@ -1,13 +1,25 @@
-﻿import uuid
+﻿import asyncio
 from pathlib import Path
 
 from fastapi import FastAPI, Request, Response, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
+import json
+import logging
 import os
 import re
+from jose import JWTError, jwt
 
+from .cache_events import listen_catalog_events
+from kino_common import metrics, tmdb, tracing
+from . import guards, images, storage
+from .compression import compression_middleware
+from .content_router import fetch_public
+from .response_cache import Upstream, cached_get, lookup, response_cache
+from .singleflight import singleflight
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="BFF Service (patched v7)")
 
@@ -18,17 +30,31 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-UPLOAD_DIR = Path("/tmp/uploads")
-try:
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-except Exception:
-    pass
+app.middleware("http")(compression_middleware)
+# every upstream call made for a request shares its deadline (sent as X-Request-Deadline)
+app.middleware("http")(guards.deadline_middleware)
+app.middleware("http")(metrics.metrics_middleware)
+# outermost: the server span covers compression and CORS too
+tracing.configure("bff_service")
+app.middleware("http")(tracing.tracing_middleware)
+# files saved by the old uploader, before content-addressed storage; served read-only
+LEGACY_UPLOAD_DIR = Path("/tmp/uploads")
 
 
 ADMIN_BASE = os.getenv("ADMIN_BASE", "http://admin_service:8000")
 AUTH_BASE = os.getenv("AUTH_BASE", "http://auth_service:8000")
 PAYMENT_BASE = os.getenv("PAYMENT_SERVICE_URL", "http://payment_service:8000")
 COOKIE_PATH_REWRITE_ENABLED = os.getenv("COOKIE_PATH_REWRITE_ENABLED", "1") == "1"
+UPSTREAM_NAMES = {AUTH_BASE: "auth", ADMIN_BASE: "admin", PAYMENT_BASE: "payment"}
+
+def _upstream_name(url: str) -> str:
+    for base, name in UPSTREAM_NAMES.items():
+        if url.startswith(base):
+            return name
+    return "other"
+# With the auth signing key available the BFF reads id/role from the access token instead of calling /auth/me
+JWT_SECRET_KEY = os.getenv("SECRET_KEY", "")
+JWT_ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
 def _cookie_to_bearer(request: Request, headers: dict) -> dict:
     token = request.cookies.get("access_token")
@@ -85,10 +111,8 @@ async def _passthrough(method: str, url: str, request: Request, inject_bearer: b
 
     params = dict(request.query_params)
 
-    timeout = httpx.Timeout(10.0, connect=10.0)
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
-        resp = await client.request(method, url, headers=headers, params=params, json=json_body, content=data)
-        return _build_response_from_httpx(resp)
+    resp = await guards.call(_upstream_name(url), method, url, headers=headers, params=params, json=json_body, content=data)
+    return _build_response_from_httpx(resp)
 
 # ---------- Auth service proxies (/api/auth/*) ----------
 @app.api_route("/api/auth/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
@@ -98,26 +122,42 @@ async def proxy_auth(path: str, request: Request):
 
 # Helper: read /auth/me to enrich headers for admin_service
 async def _fetch_me_headers(request: Request) -> dict:
-    timeout = httpx.Timeout(5.0, connect=5.0)
     headers = {k: v for k, v in request.headers.items() if k.lower() not in {"host","content-length"}}
     headers = _cookie_to_bearer(request, headers)
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
-        try:
-            resp = await client.get(f"{AUTH_BASE}/auth/me", headers=headers)
-            if resp.status_code == 200:
-                data = resp.json()
-                extra = {}
-                if isinstance(data, dict):
-                    if "id" in data: extra["X-User-Id"] = str(data["id"])
-                    if "role" in data: extra["X-User-Role"] = str(data["role"])
-                    if "email" in data: extra["X-User-Email"] = str(data["email"])
-                return extra
-        except Exception:
-            pass
+    # guards.Overloaded propagates: with auth shedding load the answer is 503, not "anonymous"
+    try:
+        resp = await guards.call("auth", "GET", f"{AUTH_BASE}/auth/me", headers=headers, timeout_cap=5.0)
+    except httpx.HTTPError:
+        return {}
+    if resp.status_code == 200:
+        data = resp.json()
+        extra = {}
+        if isinstance(data, dict):
+            if "id" in data: extra["X-User-Id"] = str(data["id"])
+            if "role" in data: extra["X-User-Role"] = str(data["role"])
+            if "email" in data: extra["X-User-Email"] = str(data["email"])
+        return extra
     return {}
 
+def _claims_headers(request: Request) -> dict:
+    if not JWT_SECRET_KEY:
+        return {}
+    token = request.cookies.get("access_token")
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        token = auth[7:].strip()
+    if not token:
+        return {}
+    try:
+        claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        return {}
+    if claims.get("type") != "access" or not claims.get("sub") or not claims.get("role"):
+        return {}
+    return {"X-User-Id": str(claims["sub"]), "X-User-Role": str(claims["role"])}
+
 async def _require_admin(request: Request, allowed_roles: set[str] | None = None) -> dict:
-    extra = await _fetch_me_headers(request)
+    extra = _claims_headers(request) or await _fetch_me_headers(request)
     if not extra.get("X-User-Id"):
         raise HTTPException(status_code=401, detail="Unauthorized")
     role = str(extra.get("X-User-Role", "")).lower()
@@ -155,31 +195,107 @@ async def admin_list_purchases(request: Request):
     return await _passthrough("GET", target, request, inject_bearer=True, extra_headers=extra)
 
 
+@app.post("/api/payment/admin/purchases:bulk-update")
+async def admin_bulk_update_purchases(request: Request):
+    target = f"{PAYMENT_BASE}/api/v1/purchases:bulk-update"
+    extra = await _require_admin(request, {"admin", "administrator", "moderator"})
+    return await _passthrough("POST", target, request, inject_bearer=True, extra_headers=extra)
+
+
 @app.patch("/api/payment/admin/purchases/{purchase_id}")
 async def admin_update_purchase(purchase_id: int, request: Request):
     target = f"{PAYMENT_BASE}/api/v1/purchases/{purchase_id}"
     extra = await _require_admin(request, {"admin", "administrator", "moderator"})
     return await _passthrough("PATCH", target, request, inject_bearer=True, extra_headers=extra)
 
+async def _fetch_payment_settings(etag: str | None) -> Upstream:
+    headers = {"If-None-Match": etag} if etag else {}
+    resp = await guards.call("payment", "GET", f"{PAYMENT_BASE}/api/v1/payments/settings", headers=headers)
+    return Upstream(resp.status_code, resp.content, resp.headers.get("content-type", "application/json"), resp.headers.get("etag"))
+
 @app.get("/api/payment/settings")
 async def get_payment_settings(request: Request):
-    target = f"{PAYMENT_BASE}/api/v1/payments/settings"
-    return await _passthrough("GET", target, request, inject_bearer=False)
+    return await cached_get(request, "payment_settings", ("payment_settings",), _fetch_payment_settings)
+
+# ---------- Bootstrap: everything the SPA needs on first load, in one round trip ----------
+BOOTSTRAP_SECTION_TIMEOUT = float(os.getenv("BOOTSTRAP_SECTION_TIMEOUT", "5"))
+BOOTSTRAP_MOVIE_PARAMS = ("search", "genre_id", "limit", "offset", "sort_by", "sort_order")
+
+class SectionError(Exception):
+    pass
+
+def _json_body(upstream: Upstream) -> bytes:
+    if upstream.status_code != 200:
+        raise SectionError(f"upstream returned {upstream.status_code}")
+    return upstream.content
+
+async def _bootstrap_public(route: str, path: str, params: list, headers: dict) -> bytes:
+    return _json_body(await fetch_public(route, path, params, headers))
+
+async def _bootstrap_payment_settings() -> bytes:
+    entry, upstream, _ = await lookup("payment_settings", ("payment_settings",), _fetch_payment_settings)
+    return entry.content if entry is not None else _json_body(upstream)
+
+async def _bootstrap_private(url: str, request: Request, *, optional_auth: bool = False) -> bytes:
+    headers = _cookie_to_bearer(request, {})
+    if request.headers.get("authorization"):
+        headers["Authorization"] = request.headers["authorization"]
+    resp = await guards.call(_upstream_name(url), "GET", url, headers=headers, timeout_cap=BOOTSTRAP_SECTION_TIMEOUT)
+    if optional_auth and resp.status_code in (401, 403):
+        return b"null"
+    return _json_body(Upstream(resp.status_code, resp.content, resp.headers.get("content-type", "")))
+
+@app.get("/api/bootstrap")
+async def bootstrap(request: Request):
+    """Fan out to every upstream the start page needs; a failed section is null plus an entry in "errors".
+
+    Public sections come from the shared response cache, upstream JSON is spliced in without re-parsing.
+    """
+    shared_headers = {h: request.headers[h] for h in ("accept-language",) if h in request.headers}
+    movie_params = [(k, v) for k, v in request.query_params.multi_items() if k in BOOTSTRAP_MOVIE_PARAMS]
+    sections = {
+        "genres": _bootstrap_public("genres_list", "api/v1/genres", [], shared_headers),
+        "movies": _bootstrap_public("movies_list", "api/v1/movies", movie_params, shared_headers),
+        "payment_settings": _bootstrap_payment_settings(),
+    }
+    logged_in = bool(request.cookies.get("access_token") or request.headers.get("authorization"))
+    if logged_in:
+        sections["me"] = _bootstrap_private(f"{AUTH_BASE}/auth/me", request, optional_auth=True)
+        sections["purchases"] = _bootstrap_private(f"{PAYMENT_BASE}/api/v1/purchases/my", request, optional_auth=True)
+
+    results = await asyncio.gather(
+        *(asyncio.wait_for(coro, BOOTSTRAP_SECTION_TIMEOUT) for coro in sections.values()),
+        return_exceptions=True,
+    )
+    parts: list[bytes] = []
+    errors: dict[str, str] = {}
+    for name, result in zip(sections, results):
+        if isinstance(result, BaseException):
+            errors[name] = "timeout" if isinstance(result, asyncio.TimeoutError) else (str(result) or type(result).__name__)
+            result = b"null"
+        parts.append(json.dumps(name).encode() + b":" + result)
+    if not logged_in:
+        parts += [b'"me":null', b'"purchases":null']
+    parts.append(b'"errors":' + json.dumps(errors).encode())
+    body = b"{" + b",".join(parts) + b"}"
+    # public-only documents may be shared by caches; anything with user data may not
+    cache_control = "private, no-cache" if logged_in else "public, no-cache"
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": cache_control})
 
 # Fallback for /api/offline-movies used by UI
 @app.get("/api/offline-movies")
 async def offline_movies_fallback(request: Request):
     target = f"{ADMIN_BASE}/offline-movies"
     try:
-        timeout = httpx.Timeout(5.0, connect=5.0)
         headers = _cookie_to_bearer(request, {k: v for k, v in request.headers.items() if k.lower() not in {"host","content-length"}})
         headers.update(await _fetch_me_headers(request))
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
-            resp = await client.get(target, headers=headers, params=request.query_params)
+        resp = await guards.call("admin", "GET", target, headers=headers, params=request.query_params, timeout_cap=5.0)
         if resp.status_code < 400:
             return _build_response_from_httpx(resp)
-    except Exception:
-        pass
+    except (guards.Overloaded, httpx.HTTPError) as e:
+        # the UI treats an empty list as "nothing offline"; mark the answer as degraded
+        logger.warning("offline-movies fallback: %s", e)
+        return JSONResponse([], status_code=200, headers={"X-Degraded": "1"})
     return JSONResponse([], status_code=200)
 
 # ---------- Users (auth_service) with shape normalization ----------
@@ -187,11 +303,9 @@ async def offline_movies_fallback(request: Request):
 async def get_users(request: Request):
     extra = await _require_admin(request, {"admin", "administrator"})
     target = f"{AUTH_BASE}/internal/users"
-    timeout = httpx.Timeout(10.0, connect=10.0)
     headers = _cookie_to_bearer(request, {})
     headers.update({k: v for k, v in extra.items() if k.lower().startswith("x-")})
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
-        resp = await client.get(target, params=request.query_params, headers=headers)
+    resp = await guards.call("auth", "GET", target, params=request.query_params, headers=headers)
     try:
         data = resp.json()
     except Exception:
@@ -210,11 +324,9 @@ async def set_user_role(user_id: str, request: Request):
     if role is None:
         raise HTTPException(400, "role is required")
     target = f"{AUTH_BASE}/internal/users/{user_id}"
-    timeout = httpx.Timeout(10.0, connect=10.0)
     headers = _cookie_to_bearer(request, {})
     headers.update({k: v for k, v in extra.items() if k.lower().startswith("x-")})
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
-        resp = await client.patch(target, json={"role": role}, headers=headers)
+    resp = await guards.call("auth", "PATCH", target, json={"role": role}, headers=headers)
     return _build_response_from_httpx(resp)
 
 @app.post("/api/users/{user_id}/ban")
@@ -225,11 +337,9 @@ async def ban_user(user_id: str, request: Request):
     if is_blocked is None:
         raise HTTPException(400, "is_blocked is required (true/false)")
     target = f"{AUTH_BASE}/internal/users/{user_id}"
-    timeout = httpx.Timeout(10.0, connect=10.0)
     headers = _cookie_to_bearer(request, {})
     headers.update({k: v for k, v in extra.items() if k.lower().startswith("x-")})
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
-        resp = await client.patch(target, json={"is_blocked": bool(is_blocked)}, headers=headers)
+    resp = await guards.call("auth", "PATCH", target, json={"is_blocked": bool(is_blocked)}, headers=headers)
     return _build_response_from_httpx(resp)
 
 @app.put("/api/users/{user_id}")
@@ -237,11 +347,9 @@ async def update_user_generic(user_id: str, request: Request):
     extra = await _require_admin(request)
     body = await request.json()
     target = f"{AUTH_BASE}/internal/users/{user_id}"
-    timeout = httpx.Timeout(10.0, connect=10.0)
     headers = _cookie_to_bearer(request, {})
     headers.update({k: v for k, v in extra.items() if k.lower().startswith("x-")})
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
-        resp = await client.patch(target, json=body, headers=headers)
+    resp = await guards.call("auth", "PATCH", target, json=body, headers=headers)
     return _build_response_from_httpx(resp)
 
 @app.delete("/api/users/{user_id}")
@@ -251,28 +359,181 @@ async def delete_user_not_supported(user_id: str, request: Request):
 
 
 @app.post("/api/upload")
-async def upload_file_dev(file: UploadFile = File(...), kind: str = "file"):
-    # Dev-only upload handler: saves to /tmp/uploads and returns public URL
-    ext = os.path.splitext(file.filename or "")[1]
-    fname = f"{kind}-{uuid.uuid4().hex}{ext}"
-    dest = UPLOAD_DIR / fname
+async def upload_file(file: UploadFile = File(...), kind: str = "file"):
+    # kind is kept for old clients; objects are named by their content hash
     try:
-        content = await file.read()
-        with dest.open("wb") as f:
-            f.write(content)
+        stored = await storage.save_upload(file)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
-    return {"public_url": f"/api/files/{fname}"}
+    image_url = None
+    if stored.content_type.startswith("image/"):
+        images.schedule_variants(stored.key)
+        image_url = f"/api/images/{stored.key}"
+    return {
+        "public_url": f"/api/files/{stored.key}",
+        "image_url": image_url,
+        "key": stored.key,
+        "size": stored.size,
+        "content_type": stored.content_type,
+        "sha256": stored.sha256,
+        "deduplicated": stored.deduplicated,
+    }
+
+def _parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Single byte range; None when absent or unparsable (serve the whole object)."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
 
 @app.get("/api/files/{name}")
-async def get_uploaded_file(name: str):
-    dest = UPLOAD_DIR / name
-    if not dest.exists():
+async def get_uploaded_file(name: str, request: Request):
+    parsed = storage.parse_key(name)
+    if parsed is None:
+        legacy = LEGACY_UPLOAD_DIR / Path(name).name
+        if not legacy.is_file():
+            raise HTTPException(status_code=404, detail="File not found")
+        return FileResponse(legacy)
+
+    sha256, content_type = parsed
+    backend = storage.get_backend()
+    size = await backend.size(name)
+    if size is None:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(dest)
+    etag = f'"{sha256}"'
+    headers = {"ETag": etag, "Cache-Control": storage.IMMUTABLE_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == etag:
+        byte_range = _parse_range(request.headers.get("range"), size)
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(backend.iter_range(name, start, end), status_code=status, headers=headers,
+                             media_type=content_type)
+@app.get("/api/images/{name}")
+async def get_image_variant(name: str, request: Request, w: int | None = None):
+    """Resized poster: nearest width bucket at or above `w`, WebP when the client accepts it."""
+    parsed = storage.parse_key(name)
+    if parsed is None or not parsed[1].startswith("image/"):
+        raise HTTPException(status_code=404, detail="Image not found")
+    sha256 = parsed[0]
+    width = images.pick_width(w)
+    fmt = images.pick_format(request.headers.get("accept"))
+    key = images.variant_key(sha256, width, fmt)
+
+    backend = storage.get_backend()
+    size = await backend.size(key)
+    if size is None:
+        # uploaded before the pipeline existed, or the background render has not finished yet
+        try:
+            await images.ensure_variants(name)
+        except Exception as e:
+            logger.exception("Image variants failed for %s", name)
+            raise HTTPException(status_code=404, detail="Image not found")
+        size = await backend.size(key)
+        if size is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = f'"{sha256}-w{width}-{fmt}"'
+    headers = {"ETag": etag, "Cache-Control": storage.IMMUTABLE_CACHE_CONTROL, "Vary": "Accept"}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+        return Response(status_code=304, headers=headers)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(backend.iter_range(key, 0, size - 1), headers=headers,
+                             media_type=images.FORMATS[fmt])
+
 @app.get("/healthz")
 async def healthz():
-    return {"status": "ok"}
+    upstreams = guards.breaker_states()
+    degraded = any(u["state"] != "closed" for u in upstreams.values())
+    return {"status": "degraded" if degraded else "ok", "upstreams": upstreams}
+
+@app.exception_handler(guards.Overloaded)
+async def upstream_overloaded(request: Request, exc: guards.Overloaded):
+    return JSONResponse(
+        {"detail": f"Service temporarily unavailable ({exc.upstream}: {exc.reason})"},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(httpx.TimeoutException)
+async def upstream_timeout(request: Request, exc: httpx.TimeoutException):
+    return JSONResponse({"detail": "Upstream timed out"}, status_code=504)
+
+@app.exception_handler(httpx.TransportError)
+async def upstream_unreachable(request: Request, exc: httpx.TransportError):
+    return JSONResponse({"detail": "Upstream unavailable"}, status_code=502)
+
+@app.get("/internal/stats")
+async def internal_stats():
+    # not routed by the gateway (only /api/ is), reachable from inside the network
+    return {"singleflight": singleflight.stats(), "response_cache": response_cache.stats(), "tmdb": tmdb.stats}
+
+
+def _response_cache_metrics():
+    stats = response_cache.stats()
+    return [
+        ("bff_response_cache_requests_total", "counter", "Response cache lookups by result",
+         [({"result": k}, stats[k]) for k in ("fresh", "stale", "miss", "not_modified")]),
+        ("bff_response_cache_purged_total", "counter", "Entries dropped by catalog purges", [({}, stats["purged"])]),
+        ("bff_response_cache_entries", "gauge", "Entries in the response cache", [({}, stats["entries"])]),
+        ("bff_response_cache_bytes", "gauge", "Bytes held by the response cache", [({}, stats["bytes"])]),
+    ]
+
+
+def _singleflight_metrics():
+    stats = singleflight.stats()
+    return [(
+        "bff_singleflight_calls_total", "counter", "Upstream calls made vs merged into an in-flight one",
+        [({"route": route, "result": k}, v) for route, counters in stats.items() for k, v in counters.items()],
+    )]
+
+
+metrics.register_collector(_response_cache_metrics)
+metrics.register_collector(_singleflight_metrics)
+metrics.register_collector(metrics.counters_collector(
+    "tmdb_gateway_events_total", "TMDB gateway cache and throttling events", lambda: tmdb.stats, "event"
+))
+app.add_api_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+
+
+_background_stop = asyncio.Event()
+_background_tasks: list[asyncio.Task] = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    _background_tasks.append(asyncio.create_task(listen_catalog_events(_background_stop)))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    _background_stop.set()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await guards.close_all()
+    images.shutdown_pool()
+    await tmdb.close()
 
 from .tmdb_router import router as tmdb_router
 from .admin_router import router as admin_router
@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+
+from .compression import SUPPORTED, choose_encoding, compress, encoded_etag, is_compressible
+from .singleflight import singleflight
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("BFF_RESPONSE_CACHE_ENABLED", "1") == "1"
+MAX_ENTRIES = int(os.getenv("BFF_RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+MAX_BYTES = int(os.getenv("BFF_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CLIENT_CACHE_CONTROL = "public, no-cache"
+
+# route -> (ttl, stale-while-revalidate window), seconds
+ROUTE_TTLS: dict[str, tuple[float, float]] = {
+    "movies_list": (30, 300),
+    "movie_detail": (60, 600),
+    "genres_list": (300, 3600),
+    "payment_settings": (60, 600),
+}
+ROUTE_TTLS.update({
+    route: tuple(ttls)
+    for route, ttls in json.loads(os.getenv("BFF_ROUTE_TTLS", "{}")).items()
+})
+
+
+@dataclass
+class Upstream:
+    status_code: int
+    content: bytes
+    content_type: str
+    etag: str | None = None
+
+
+@dataclass
+class CacheEntry:
+    content: bytes
+    content_type: str
+    etag: str
+    stored_at: float
+    ttl: float
+    swr: float
+    # precompressed bodies by content-coding, built once when the entry is stored
+    variants: dict[str, bytes] = field(default_factory=dict, repr=False)
+    refreshing: bool = field(default=False, repr=False)
+
+    def age(self, now: float) -> float:
+        return now - self.stored_at
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + sum(len(body) for body in self.variants.values())
+
+
+class ResponseCache:
+    """Bounded LRU of upstream 200 responses for public, auth-independent GETs."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        # bumped on purge so responses fetched before an invalidation are not stored after it
+        self.generation = 0
+        self._refresh_tasks: set[asyncio.Task] = set()
+        self.counters = {"fresh": 0, "stale": 0, "miss": 0, "not_modified": 0, "purged": 0}
+
+    def get(self, key: tuple) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.age(time.monotonic()) > entry.ttl + entry.swr:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def purge(self) -> None:
+        self.generation += 1
+        self.counters["purged"] += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes, **self.counters}
+
+    def schedule_refresh(self, route: str, key: tuple, entry: CacheEntry, fetch) -> None:
+        if entry.refreshing:
+            return
+        entry.refreshing = True
+        task = asyncio.ensure_future(self._refresh(route, key, entry, fetch))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, route: str, key: tuple, entry: CacheEntry, fetch) -> None:
+        generation = self.generation
+        try:
+            # separate flight key: a conditional fetch may answer 304 without a body
+            upstream = await singleflight.do(route, key + ("revalidate",), lambda: fetch(entry.etag))
+            if generation != self.generation:
+                return
+            if upstream.status_code == 304:
+                entry.stored_at = time.monotonic()
+            elif upstream.status_code == 200:
+                fresh = await _build_entry(upstream, entry.ttl, entry.swr)
+                if generation == self.generation:
+                    self.put(key, fresh)
+        except Exception as e:
+            logger.warning("Background refresh failed for %s: %s", route, e)
+        finally:
+            entry.refreshing = False
+
+
+async def _build_entry(upstream: Upstream, ttl: float, swr: float) -> CacheEntry:
+    etag = upstream.etag or '"b-' + hashlib.sha1(upstream.content).hexdigest()[:20] + '"'
+    variants: dict[str, bytes] = {}
+    if is_compressible(upstream.content_type, len(upstream.content)):
+        bodies = await asyncio.gather(*(compress(upstream.content, enc, cached=True) for enc in SUPPORTED))
+        variants = dict(zip(SUPPORTED, bodies))
+    return CacheEntry(
+        content=upstream.content,
+        content_type=upstream.content_type,
+        etag=etag,
+        stored_at=time.monotonic(),
+        ttl=ttl,
+        swr=swr,
+        variants=variants,
+    )
+
+
+def _client_has(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    candidates = [tag.strip() for tag in inm.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _respond(request: Request, entry: CacheEntry, cache_state: str) -> Response:
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if entry.variants else None
+    etag = encoded_etag(entry.etag, encoding)
+    headers = {"ETag": etag, "Cache-Control": CLIENT_CACHE_CONTROL, "X-Cache": cache_state}
+    if entry.variants:
+        headers["Vary"] = "Accept-Encoding"
+    if _client_has(request, etag):
+        response_cache.counters["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        return Response(content=entry.variants[encoding], status_code=200, media_type=entry.content_type, headers=headers)
+    return Response(content=entry.content, status_code=200, media_type=entry.content_type, headers=headers)
+
+
+async def lookup(
+    route: str,
+    key: tuple,
+    fetch: Callable[[str | None], Awaitable[Upstream]],
+) -> tuple[CacheEntry | None, Upstream | None, str]:
+    """Fresh hit, stale hit + background revalidation, or coalesced miss.
+
+    Returns (entry, None, state) when the response is cacheable and
+    (None, upstream, "BYPASS") for uncached routes and non-200 upstream answers.
+    `fetch(etag)` performs the upstream call, conditional when an etag is given.
+    """
+    ttls = ROUTE_TTLS.get(route)
+    if not CACHE_ENABLED or ttls is None:
+        return None, await singleflight.do(route, key, lambda: fetch(None)), "BYPASS"
+
+    entry = response_cache.get(key)
+    if entry is not None:
+        if entry.age(time.monotonic()) <= entry.ttl:
+            response_cache.counters["fresh"] += 1
+            return entry, None, "HIT"
+        response_cache.counters["stale"] += 1
+        response_cache.schedule_refresh(route, key, entry, fetch)
+        return entry, None, "STALE"
+
+    response_cache.counters["miss"] += 1
+
+    async def fill() -> tuple[CacheEntry | None, Upstream]:
+        # runs once per flight: waiters share the stored entry instead of compressing the body again
+        generation = response_cache.generation
+        upstream = await fetch(None)
+        if upstream.status_code != 200:
+            return None, upstream
+        entry = await _build_entry(upstream, *ttls)
+        if generation == response_cache.generation:
+            response_cache.put(key, entry)
+        return entry, upstream
+
+    entry, upstream = await singleflight.do(route, key, fill)
+    if entry is None:
+        return None, upstream, "BYPASS"
+    return entry, None, "MISS"
+
+
+async def cached_get(
+    request: Request,
+    route: str,
+    key: tuple,
+    fetch: Callable[[str | None], Awaitable[Upstream]],
+) -> Response:
+    """Serve a public GET through the cache with ETag/304 and precompressed bodies."""
+    entry, upstream, state = await lookup(route, key, fetch)
+    if entry is None:
+        return Response(content=upstream.content, status_code=upstream.status_code, media_type=upstream.content_type)
+    return _respond(request, entry, state)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,39 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Merge identical in-flight calls onto one upstream request.
+
+    The upstream call runs as its own task, so a waiter that disconnects does not
+    cancel it for the others. Only for responses that don't depend on the caller.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._stats: dict[str, dict[str, int]] = defaultdict(lambda: {"upstream": 0, "merged": 0})
+
+    async def do(self, route: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats[route]["upstream"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self._stats[route]["merged"] += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {route: dict(counters) for route, counters in self._stats.items()}
+
+
+singleflight = SingleFlight()
@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+
+from fastapi import HTTPException, UploadFile
+
+STORAGE_BACKEND = os.getenv("BFF_STORAGE_BACKEND", "local")  # local | s3
+STORAGE_DIR = Path(os.getenv("BFF_STORAGE_DIR", "/data/uploads"))
+S3_ENDPOINT_URL = os.getenv("BFF_S3_ENDPOINT_URL") or None  # e.g. http://minio:9000
+S3_BUCKET = os.getenv("BFF_S3_BUCKET", "uploads")
+S3_ACCESS_KEY = os.getenv("BFF_S3_ACCESS_KEY") or None
+S3_SECRET_KEY = os.getenv("BFF_S3_SECRET_KEY") or None
+S3_REGION = os.getenv("BFF_S3_REGION", "us-east-1")
+
+CHUNK_SIZE = 1024 * 1024
+# object names are content hashes: a name never points at different bytes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# gateway caps request bodies at 50m (client_max_body_size), keep the defaults at or below it
+MAX_IMAGE_BYTES = int(os.getenv("BFF_UPLOAD_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+MAX_VIDEO_BYTES = int(os.getenv("BFF_UPLOAD_MAX_VIDEO_BYTES", str(50 * 1024 * 1024)))
+
+# content type -> (extension, magic check on the first bytes)
+ALLOWED_TYPES = {
+    "image/jpeg": (".jpg", lambda head: head.startswith(b"\xff\xd8\xff")),
+    "image/png": (".png", lambda head: head.startswith(b"\x89PNG\r\n\x1a\n")),
+    "image/gif": (".gif", lambda head: head[:6] in (b"GIF87a", b"GIF89a")),
+    "image/webp": (".webp", lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP"),
+    "video/mp4": (".mp4", lambda head: head[4:8] == b"ftyp"),
+    "video/webm": (".webm", lambda head: head.startswith(b"\x1a\x45\xdf\xa3")),
+}
+EXTENSION_TYPES = {ext: content_type for content_type, (ext, _) in ALLOWED_TYPES.items()}
+# content-addressed object names: <sha256><ext>
+KEY_RE = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]{2,5})$")
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    content_type: str
+    sha256: str
+    deduplicated: bool = False
+
+
+def sniff_type(head: bytes) -> str | None:
+    for content_type, (_, matches) in ALLOWED_TYPES.items():
+        if matches(head):
+            return content_type
+    return None
+
+
+def max_bytes_for(content_type: str) -> int:
+    return MAX_VIDEO_BYTES if content_type.startswith("video/") else MAX_IMAGE_BYTES
+
+
+def parse_key(name: str) -> tuple[str, str] | None:
+    """(sha256, content type) for a content-addressed name, None for anything else."""
+    m = KEY_RE.match(name)
+    if not m or m.group(2) not in EXTENSION_TYPES:
+        return None
+    return m.group(1), EXTENSION_TYPES[m.group(2)]
+
+
+class LocalBackend:
+    """Objects under STORAGE_DIR/ab/cd/<key>; mount a volume there to share it between replicas."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / key
+
+    async def size(self, key: str) -> int | None:
+        try:
+            return (await asyncio.to_thread(self._path(key).stat)).st_size
+        except FileNotFoundError:
+            return None
+
+    async def put(self, key: str, source: Path, content_type: str) -> None:
+        dest = self._path(key)
+
+        def _move():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            # same-directory temp name + rename: readers never see a half-written object
+            tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+            shutil.move(str(source), tmp)
+            os.replace(tmp, dest)
+
+        await asyncio.to_thread(_move)
+
+    async def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
+        dest = self._path(key)
+
+        def _write():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, dest)
+
+        await asyncio.to_thread(_write)
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(open, self._path(key), "rb")
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+class S3Backend:
+    """Any S3-compatible store (MinIO locally). boto3 is synchronous, so every call runs in a thread."""
+
+    def __init__(self):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = S3_BUCKET
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=S3_ENDPOINT_URL,
+            aws_access_key_id=S3_ACCESS_KEY,
+            aws_secret_access_key=S3_SECRET_KEY,
+            region_name=S3_REGION,
+            config=Config(max_pool_connections=32, retries={"max_attempts": 3, "mode": "standard"}),
+        )
+        self._bucket_checked = False
+
+    async def _ensure_bucket(self) -> None:
+        if self._bucket_checked:
+            return
+        from botocore.exceptions import ClientError
+
+        try:
+            await asyncio.to_thread(self.client.head_bucket, Bucket=self.bucket)
+        except ClientError:
+            await asyncio.to_thread(self.client.create_bucket, Bucket=self.bucket)
+        self._bucket_checked = True
+
+    async def size(self, key: str) -> int | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["ContentLength"]
+
+    async def put(self, key: str, source: Path, content_type: str) -> None:
+        await self._ensure_bucket()
+        await asyncio.to_thread(
+            self.client.upload_file,
+            str(source),
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE_CACHE_CONTROL},
+        )
+
+    async def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
+        await self._ensure_bucket()
+        await asyncio.to_thread(
+            self.client.put_object,
+            Bucket=self.bucket,
+            Key=key,
+            Body=data,
+            ContentType=content_type,
+            CacheControl=IMMUTABLE_CACHE_CONTROL,
+        )
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        obj = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}"
+        )
+        body = obj["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+
+_backend: LocalBackend | S3Backend | None = None
+
+
+def get_backend() -> LocalBackend | S3Backend:
+    global _backend
+    if _backend is None:
+        _backend = S3Backend() if STORAGE_BACKEND == "s3" else LocalBackend(STORAGE_DIR)
+    return _backend
+
+
+async def read_bytes(key: str) -> bytes | None:
+    backend = get_backend()
+    size = await backend.size(key)
+    if size is None:
+        return None
+    return b"".join([chunk async for chunk in backend.iter_range(key, 0, size - 1)])
+
+
+def _tmp_dir() -> str | None:
+    # stage next to the objects so the local backend finishes with a rename, not a copy
+    if isinstance(get_backend(), LocalBackend):
+        STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+        return str(STORAGE_DIR)
+    return None
+
+
+async def save_upload(file: UploadFile) -> StoredObject:
+    """Stream an upload to a temp file while hashing it, then store it under its SHA-256.
+
+    The declared type is not trusted: the first bytes decide it. Size is checked
+    as the data arrives, so an oversized upload is cut off at the limit.
+    """
+    backend = get_backend()
+    digest = hashlib.sha256()
+    tmp_dir = await asyncio.to_thread(_tmp_dir)
+    fd, tmp_name = await asyncio.to_thread(tempfile.mkstemp, prefix=".upload-", dir=tmp_dir)
+    tmp = Path(tmp_name)
+    out = os.fdopen(fd, "wb")
+    size = 0
+    content_type: str | None = None
+    try:
+        try:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if content_type is None:
+                    content_type = sniff_type(chunk[:16])
+                    if content_type is None:
+                        raise HTTPException(status_code=415, detail="Unsupported file type")
+                size += len(chunk)
+                if size > max_bytes_for(content_type):
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File is larger than {max_bytes_for(content_type) // (1024 * 1024)} MB",
+                    )
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        finally:
+            await asyncio.to_thread(out.close)
+        if content_type is None:
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        sha256 = digest.hexdigest()
+        key = sha256 + ALLOWED_TYPES[content_type][0]
+        if await backend.size(key) is not None:
+            return StoredObject(key, size, content_type, sha256, deduplicated=True)
+        await backend.put(key, tmp, content_type)
+        return StoredObject(key, size, content_type, sha256)
+    finally:
+        if tmp.exists():
+            await asyncio.to_thread(tmp.unlink, True)
@@ -0,0 +1,53 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bff_service import admin_router, guards
+
+
+class StubAdmin(BaseHTTPRequestHandler):
+    cookies: list[str | None] = []
+
+    def do_GET(self):
+        self.cookies.append(self.headers.get("Cookie"))
+        if self.path.startswith("/admin/movies/7"):
+            payload = {"movie_id": 7, "genres": [{"genre_id": 1, "name": "драма"}]}
+        else:
+            payload = []
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    StubAdmin.cookies = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAdmin)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(admin_router, "ADMIN_BASE", f"http://127.0.0.1:{server.server_port}")
+    # pooled clients belong to the event loop of the test that created them
+    monkeypatch.setattr(guards, "_guards", {})
+    app = FastAPI()
+    app.include_router(admin_router.router)
+    with TestClient(app) as test_client:
+        yield test_client
+    server.shutdown()
+    server.server_close()
+
+
+def test_caller_cookies_are_forwarded_as_a_header(client):
+    client.cookies.set("access_token", "abc")
+    assert client.get("/api/admin/genres/").status_code == 200
+    detail = client.get("/api/admin/movies/7")
+    assert detail.json()["genre_ids"] == [1]
+    assert StubAdmin.cookies == ["access_token=abc", "access_token=abc"]
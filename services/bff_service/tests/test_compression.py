@@ -0,0 +1,41 @@
+import asyncio
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from bff_service.compression import compression_middleware
+
+BODY = b'{"k": "' + b"x" * 4096 + b'"}'
+
+
+def _request(path: str, headers: dict[str, str]) -> Request:
+    raw = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": raw})
+
+
+def _run(path: str, headers: dict[str, str], status_code: int = 200) -> Response:
+    async def call_next(request):
+        # what call_next hands to a middleware: a streamed body with its length in the headers
+        async def body():
+            yield BODY
+
+        return StreamingResponse(
+            body(), status_code=status_code, media_type="application/json",
+            headers={"Content-Length": str(len(BODY))},
+        )
+
+    return asyncio.run(compression_middleware(_request(path, {"Accept-Encoding": "gzip", **headers}), call_next))
+
+
+def test_plain_responses_are_compressed():
+    assert _run("/api/movies", {}).headers["content-encoding"] == "gzip"
+
+
+def test_partial_and_file_responses_are_left_alone():
+    for path, headers, status_code in [
+        ("/api/movies", {}, 206),
+        ("/api/movies", {"Range": "bytes=0-99"}, 200),
+        ("/api/files/abc.json", {}, 200),
+    ]:
+        response = _run(path, headers, status_code)
+        assert "content-encoding" not in response.headers, (path, headers, status_code)
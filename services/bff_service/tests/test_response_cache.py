@@ -0,0 +1,49 @@
+import asyncio
+
+from bff_service import response_cache
+from bff_service.response_cache import Upstream, lookup
+
+BODY = b'{"movies": "' + b"x" * 5000 + b'"}'
+
+
+def test_concurrent_misses_fetch_and_build_the_entry_once(monkeypatch):
+    calls = {"fetch": 0, "build": 0}
+    build_entry = response_cache._build_entry
+
+    async def counting_build(*args):
+        calls["build"] += 1
+        return await build_entry(*args)
+
+    async def fetch(etag):
+        calls["fetch"] += 1
+        await asyncio.sleep(0.05)
+        return Upstream(200, BODY, "application/json")
+
+    monkeypatch.setattr(response_cache, "_build_entry", counting_build)
+    monkeypatch.setattr(response_cache, "response_cache", response_cache.ResponseCache())
+
+    async def scenario():
+        return await asyncio.gather(*(lookup("movies_list", ("movies", "page-1"), fetch) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+    assert calls == {"fetch": 1, "build": 1}
+    assert {state for _, _, state in results} == {"MISS"}
+    # every waiter got the one stored entry, precompressed bodies included
+    entries = {id(entry) for entry, _, _ in results}
+    assert len(entries) == 1 and results[0][0].variants
+    assert response_cache.response_cache.get(("movies", "page-1")) is results[0][0]
+
+
+def test_non_200_answers_are_shared_but_not_cached(monkeypatch):
+    monkeypatch.setattr(response_cache, "response_cache", response_cache.ResponseCache())
+
+    async def fetch(etag):
+        await asyncio.sleep(0.01)
+        return Upstream(404, b'{"detail": "Movie not found"}', "application/json")
+
+    async def scenario():
+        return await asyncio.gather(*(lookup("movie_detail", ("movie", 7), fetch) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert [(entry, upstream.status_code, state) for entry, upstream, state in results] == [(None, 404, "BYPASS")] * 3
+    assert response_cache.response_cache.get(("movie", 7)) is None
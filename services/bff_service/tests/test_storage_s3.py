@@ -0,0 +1,74 @@
+"""The S3 backend against a real S3-compatible server. Start MinIO and point the test at it:
+
+    docker run -d -p 9000:9000 minio/minio server /data
+    TEST_S3_ENDPOINT_URL=http://localhost:9000 pytest -q tests/test_storage_s3.py
+
+Without TEST_S3_ENDPOINT_URL the test is skipped.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import uuid
+
+import pytest
+from fastapi import UploadFile
+
+from bff_service import storage
+
+ENDPOINT = os.getenv("TEST_S3_ENDPOINT_URL")
+PNG = b"\x89PNG\r\n\x1a\n" + os.urandom(3 * storage.CHUNK_SIZE // 2)
+
+pytestmark = pytest.mark.skipif(not ENDPOINT, reason="TEST_S3_ENDPOINT_URL is not set")
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "s3")
+    monkeypatch.setattr(storage, "S3_ENDPOINT_URL", ENDPOINT)
+    monkeypatch.setattr(storage, "S3_ACCESS_KEY", os.getenv("TEST_S3_ACCESS_KEY", "minioadmin"))
+    monkeypatch.setattr(storage, "S3_SECRET_KEY", os.getenv("TEST_S3_SECRET_KEY", "minioadmin"))
+    # a fresh bucket per test: the backend creates it on first write
+    monkeypatch.setattr(storage, "S3_BUCKET", f"bff-test-{uuid.uuid4().hex[:12]}")
+    monkeypatch.setattr(storage, "_backend", None)
+    backend = storage.get_backend()
+    assert isinstance(backend, storage.S3Backend)
+    yield backend
+    for item in backend.client.list_objects_v2(Bucket=backend.bucket).get("Contents", []):
+        backend.client.delete_object(Bucket=backend.bucket, Key=item["Key"])
+    backend.client.delete_bucket(Bucket=backend.bucket)
+
+
+def test_upload_is_stored_under_its_hash_and_deduplicated(s3):
+    async def scenario():
+        first = await storage.save_upload(UploadFile(io.BytesIO(PNG), filename="a.png"))
+        again = await storage.save_upload(UploadFile(io.BytesIO(PNG), filename="b.png"))
+        return first, again, await storage.read_bytes(first.key)
+
+    first, again, stored = asyncio.run(scenario())
+    sha256 = hashlib.sha256(PNG).hexdigest()
+    assert (first.key, first.size, first.content_type, first.deduplicated) == (f"{sha256}.png", len(PNG), "image/png", False)
+    assert again.key == first.key and again.deduplicated
+    assert stored == PNG
+    head = s3.client.head_object(Bucket=s3.bucket, Key=first.key)
+    assert head["ContentType"] == "image/png"
+    assert head["CacheControl"] == storage.IMMUTABLE_CACHE_CONTROL
+
+
+def test_ranges_and_missing_objects(s3):
+    key = hashlib.sha256(b"video").hexdigest() + ".mp4"
+
+    async def scenario():
+        missing = await s3.size(key)
+        await s3.put_bytes(key, PNG, "video/mp4")
+        size = await s3.size(key)
+        middle = b"".join([chunk async for chunk in s3.iter_range(key, 100, 199)])
+        # spans more than one read chunk
+        tail = b"".join([chunk async for chunk in s3.iter_range(key, 10, size - 1)])
+        return missing, size, middle, tail
+
+    missing, size, middle, tail = asyncio.run(scenario())
+    assert missing is None
+    assert size == len(PNG)
+    assert middle == PNG[100:200]
+    assert tail == PNG[10:]
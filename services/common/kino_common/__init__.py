@@ -0,0 +1,6 @@
+"""Code shared by the services.
+
+Every image installs this package (the services build with ./services as the
+context and `pip install ./common`), so a service imports
+`from kino_common import tracing` instead of keeping its own copy.
+"""
@@ -0,0 +1,126 @@
+"""In-process genre dictionary.
+
+The genre table changes maybe once a month, so every process keeps a copy in
+memory: loaded at startup, reloaded whenever a "genres_changed" event arrives
+on catalog_events, and on every (re)subscribe in case an event was missed.
+Movie genres are hydrated from movie_genre ids against this copy instead of
+joining `genre` on every query.
+
+A service builds one GenreCache from its own session factory, Redis getter and
+models (see app/core/genre_cache.py in admin_service and content_service).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import func, select
+
+logger = logging.getLogger(__name__)
+
+GENRES_CHANGED = "genres_changed"
+CATALOG_EVENTS_CHANNEL = "catalog_events"
+RESUBSCRIBE_DELAY_SECONDS = 2.0
+
+
+class GenreCache:
+    def __init__(
+        self,
+        session: Callable[[], Any],
+        get_redis: Callable[[], Awaitable[Any]],
+        genre: Any,
+        movie: Any,
+        movie_genre: Any,
+        channel: str = CATALOG_EVENTS_CHANNEL,
+    ):
+        """`session()` opens an AsyncSession; genre, movie and movie_genre are the service's own models."""
+        self._session = session
+        self._get_redis = get_redis
+        self._genre = genre
+        self._movie = movie
+        self._movie_genre = movie_genre
+        self._channel = channel
+        self._by_id: dict[int, dict[str, Any]] = {}
+        self._ordered: list[dict[str, Any]] = []
+        # the version is a hash of the content: the same on every replica with the same dictionary
+        self.version: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def reload(self) -> str:
+        Genre = self._genre
+        async with self._lock:
+            async with self._session() as db:
+                rows = (await db.execute(select(Genre.genre_id, Genre.name).order_by(Genre.name))).all()
+            ordered = [{"genre_id": gid, "name": name} for gid, name in rows]
+            digest = hashlib.sha1(json.dumps(ordered, ensure_ascii=False).encode()).hexdigest()[:16]
+            # swap whole references: readers never see a half-updated dictionary
+            self._by_id, self._ordered, self.version = {g["genre_id"]: g for g in ordered}, ordered, digest
+        return digest
+
+    async def ensure_loaded(self) -> None:
+        if self.version is None:
+            await self.reload()
+
+    def etag(self) -> str:
+        return f'"genres-{self.version}"'
+
+    async def all_genres(self) -> list[dict[str, Any]]:
+        await self.ensure_loaded()
+        return self._ordered
+
+    async def get(self, genre_id: int) -> Optional[dict[str, Any]]:
+        await self.ensure_loaded()
+        return self._by_id.get(genre_id)
+
+    def hydrate(self, genre_ids: Optional[Iterable[int]]) -> list[dict[str, Any]]:
+        """movie_genre ids -> [{genre_id, name}] in dictionary order; unknown ids are skipped."""
+        wanted = set(genre_ids or ())
+        return [g for g in self._ordered if g["genre_id"] in wanted]
+
+    def genre_ids_column(self):
+        """Correlated array_agg of a movie's genre ids, to select next to Movie instead of loading Movie.genres."""
+        # aliased: the outer query may join movie_genre itself (genre filter)
+        links = self._movie_genre.alias("movie_genre_ids")
+        return (
+            select(func.array_agg(links.c.genre_id))
+            .where(links.c.movie_id == self._movie.movie_id)
+            .scalar_subquery()
+            .label("genre_ids")
+        )
+
+    def movie_with_genres(self, movie: Any, genre_ids: Optional[Iterable[int]]) -> dict[str, Any]:
+        data = {attr.key: getattr(movie, attr.key) for attr in self._movie.__mapper__.column_attrs}
+        data["genres"] = self.hydrate(genre_ids)
+        return data
+
+    async def listen(self, stop: asyncio.Event) -> None:
+        """Follow catalog_events and reload on genres_changed until `stop` is set."""
+        while not stop.is_set():
+            pubsub = None
+            try:
+                pubsub = (await self._get_redis()).pubsub()
+                await pubsub.subscribe(self._channel)
+                # an event may have passed while we were not subscribed: reload
+                await self.reload()
+                while not stop.is_set():
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    try:
+                        event = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    if isinstance(event, dict) and event.get("event_type") == GENRES_CHANGED:
+                        await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Genre change subscription interrupted: %s", e)
+                await asyncio.sleep(RESUBSCRIBE_DELAY_SECONDS)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
@@ -0,0 +1,285 @@
+"""Service-to-service HTTP client.
+
+Used by the services that call others (admin, auth, payment).
+
+- one pooled client per base URL, closed on application shutdown; timeouts are
+  per request (timeout=...), the pool, breaker and stats are per target;
+- retries with jittered exponential backoff: idempotent methods on connection
+  errors and 502/503/504, any method when the connection was never established;
+- a circuit breaker per base URL, letting one probe through while half-open;
+- the caller's deadline travels in X-Request-Deadline and caps every timeout
+  (the BFF stamps it on every request it forwards, see bff_service/guards.py);
+- latency / error counters per base URL, see stats() and /metrics;
+- trace context and X-Request-ID forwarded on every call (see tracing.py).
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from collections import deque
+
+import httpx
+
+from . import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "X-Request-Deadline"  # absolute unix time, milliseconds
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {502, 503, 504}
+# nothing reached the upstream, so even a POST is safe to repeat
+SAFE_TO_REPEAT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised without touching the network while the target's breaker is open."""
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The caller's deadline passed before the request could be sent."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probe_started: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != "half_open":
+            return state == "closed"
+        # half-open lets a single probe through; a probe that never reported back
+        # (cancelled mid-flight) stops blocking others after reset_timeout
+        now = time.monotonic()
+        if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+            return False
+        self.probe_started = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_started = None
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            # a failed probe re-opens the breaker for another full period
+            self.opened_at = time.monotonic()
+
+
+class TargetStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.latencies_ms: deque[float] = deque(maxlen=1024)
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.latencies_ms:
+            return None
+        ordered = sorted(self.latencies_ms)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 1)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "short_circuited": self.short_circuited,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+        }
+
+
+class ServiceClient:
+    """Thin wrapper over httpx.AsyncClient; get/post/... return the final httpx.Response."""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.1,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = TargetStats()
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            event_hooks=metrics.httpx_event_hooks(tracing.httpx_event_hooks()),
+        )
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def _remaining(self) -> float | None:
+        deadline = _deadline.get()
+        if deadline is None:
+            return None
+        return deadline - time.time()
+
+    async def request(self, method: str, url: str, *, retry: bool | None = None, **kwargs) -> httpx.Response:
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS if retry is None else retry
+        timeout = kwargs.pop("timeout", self.timeout)
+        headers = dict(kwargs.pop("headers", None) or {})
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.stats.short_circuited += 1
+                raise CircuitOpenError(f"Circuit open for {self.base_url}")
+
+            remaining = self._remaining()
+            if remaining is not None:
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"Deadline exceeded before {method} {self.base_url}{url}")
+                headers[DEADLINE_HEADER] = str(int(_deadline.get() * 1000))
+                effective_timeout = min(timeout, remaining) if timeout else remaining
+            else:
+                effective_timeout = timeout
+
+            self.stats.requests += 1
+            started = time.perf_counter()
+            try:
+                response = await self._client.request(
+                    method, url, headers=headers, timeout=effective_timeout, **kwargs
+                )
+            except httpx.TransportError as exc:
+                self.stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+                self.stats.errors += 1
+                metrics.record_upstream_error(self.base_url)
+                self.breaker.record_failure()
+                if attempt < self.retries and (idempotent or isinstance(exc, SAFE_TO_REPEAT)):
+                    attempt += 1
+                    await self._sleep(attempt)
+                    continue
+                raise
+            self.stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+
+            if response.status_code in RETRY_STATUSES:
+                self.stats.errors += 1
+                self.breaker.record_failure()
+                if attempt < self.retries and idempotent:
+                    attempt += 1
+                    await response.aclose()
+                    await self._sleep(attempt)
+                    continue
+            else:
+                self.breaker.record_success()
+            return response
+
+    async def _sleep(self, attempt: int) -> None:
+        self.stats.retries += 1
+        # full jitter: spreads retries of many callers hitting the same failure
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        remaining = self._remaining()
+        if remaining is not None:
+            delay = min(delay, max(remaining, 0))
+        await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+
+_clients: dict[str, ServiceClient] = {}
+
+
+def get_client(base_url: str) -> ServiceClient:
+    """The shared client for a target; pass timeout= per request to override the default."""
+    base_url = base_url.rstrip("/")
+    client = _clients.get(base_url)
+    if client is None or client.is_closed:
+        client = ServiceClient(base_url)
+        _clients[base_url] = client
+    return client
+
+
+async def close_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def stats() -> dict:
+    return {
+        base_url: {**client.stats.as_dict(), "breaker": client.breaker.state}
+        for base_url, client in _clients.items()
+    }
+
+
+def _collect_metrics():
+    clients = list(_clients.items())
+    counters = [
+        (f"service_client_{field}_total", f"Service client {field.replace('_', ' ')}", field)
+        for field in ("requests", "errors", "retries", "short_circuited")
+    ]
+    families = [
+        (name, "counter", help, [({"target": url}, getattr(c.stats, field)) for url, c in clients])
+        for name, help, field in counters
+    ]
+    families.append((
+        "service_client_breaker_open", "gauge", "1 while the circuit breaker for the target is open",
+        [({"target": url}, int(c.breaker.state == "open")) for url, c in clients],
+    ))
+    return families
+
+
+metrics.register_collector(_collect_metrics)
+
+
+async def deadline_middleware(request, call_next):
+    """Adopt the caller's deadline (if any) for every outgoing call made while handling the request."""
+    raw = request.headers.get(DEADLINE_HEADER)
+    token = None
+    if raw:
+        try:
+            token = _deadline.set(int(raw) / 1000)
+        except ValueError:
+            logger.debug("Ignoring malformed %s header: %r", DEADLINE_HEADER, raw)
+    try:
+        return await call_next(request)
+    finally:
+        if token is not None:
+            _deadline.reset(token)
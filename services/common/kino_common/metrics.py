@@ -0,0 +1,293 @@
+"""Prometheus-style metrics without external dependencies.
+
+- metrics_middleware: request latency histogram per route template (not per
+  URL: /movies/{movie_id}) and method/status, plus in-flight requests;
+- instrument_sqlalchemy: pool size / checked-out gauges, time waiting for a
+  connection and time a connection is held;
+- httpx_event_hooks: outbound latency per upstream host;
+- instrument_redis: latency per Redis command;
+- register_collector: anything that already keeps its own counters (caches,
+  breakers) is read at scrape time instead of being duplicated here.
+
+GET /metrics renders the text exposition format; the gateway only routes
+/api/, so the endpoint is reachable from inside the network only.
+"""
+import inspect
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterable, Optional
+from urllib.parse import urlsplit
+
+# seconds; covers a Redis GET (sub-millisecond) up to a slow upstream (10 s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"
+
+Sample = tuple[dict, float]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _render_header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = self._render_header()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_labels(dict(zip(self.labelnames, key)))} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count], sum
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def render(self) -> list[str]:
+        lines = self._render_header()
+        for key, counts in self._counts.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(self._sums[key])}")
+            lines.append(f"{self.name}_count{_labels(labels)} {cumulative}")
+        return lines
+
+
+_registry: list[_Metric] = []
+# fn() -> [(name, type, help, [(labels, value), ...]), ...], called on every scrape; may be async
+_collectors: list[Callable] = []
+
+http_requests = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status")
+)
+http_in_flight = Gauge("http_requests_in_flight", "Requests being handled")
+upstream_requests = Histogram(
+    "http_client_request_duration_seconds", "Outbound HTTP latency (to response headers) by upstream host",
+    ("upstream", "method", "status"),
+)
+upstream_errors = Counter("http_client_errors_total", "Outbound HTTP requests that got no response", ("upstream",))
+db_pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled DB connection", ("pool",))
+db_pool_hold = Histogram("db_pool_checkout_hold_seconds", "Time a DB connection stays checked out", ("pool",))
+redis_commands = Histogram("redis_command_duration_seconds", "Redis command latency", ("command", "status"))
+
+
+def register_collector(fn: Callable) -> None:
+    _collectors.append(fn)
+
+
+def counters_collector(name: str, help: str, read: Callable[[], dict], label: str, kind: str = "counter"):
+    """Collector for code that keeps a {label value: number} dict of its own counters."""
+    def collect():
+        return [(name, kind, help, [({label: k}, v) for k, v in read().items() if isinstance(v, (int, float))])]
+    return collect
+
+
+async def render() -> str:
+    lines: list[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            result = collect()
+            if inspect.isawaitable(result):
+                result = await result
+            families = list(result)
+        except Exception as e:
+            lines.append(f"# collector {getattr(collect, '__name__', 'collector')} failed: {_escape(e)}")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_endpoint():
+    from starlette.responses import Response
+
+    return Response(await render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def metrics_middleware(request, call_next):
+    http_in_flight.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_in_flight.dec()
+        route = request.scope.get("route")
+        http_requests.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            # route templates only: otherwise every id becomes a new time series
+            route=getattr(route, "path", None) or UNMATCHED_ROUTE,
+            status=status,
+        )
+
+
+# --- httpx ---------------------------------------------------------------------------
+
+async def _on_request(request) -> None:
+    request.extensions["metrics_started"] = time.perf_counter()
+
+
+async def _on_response(response) -> None:
+    started = response.request.extensions.get("metrics_started")
+    if started is not None:
+        upstream_requests.observe(
+            time.perf_counter() - started,
+            upstream=response.request.url.host,
+            method=response.request.method,
+            status=response.status_code,
+        )
+
+
+def httpx_event_hooks(base: Optional[dict] = None) -> dict:
+    """event_hooks= for httpx.AsyncClient, merged with `base` (e.g. the tracing hooks)."""
+    base = base or {}
+    return {
+        "request": [_on_request, *base.get("request", [])],
+        "response": [_on_response, *base.get("response", [])],
+    }
+
+
+def record_upstream_error(url) -> None:
+    """httpx has no hook for transport errors; clients that catch them call this."""
+    host = getattr(url, "host", None) or urlsplit(str(url)).hostname or str(url)
+    upstream_errors.inc(upstream=host)
+
+
+# --- SQLAlchemy ----------------------------------------------------------------------
+
+def instrument_sqlalchemy(engine, name: str = "default") -> None:
+    from sqlalchemy import event
+
+    target = getattr(engine, "sync_engine", engine)
+    if getattr(target, "_metrics_instrumented", False):
+        return
+    target._metrics_instrumented = True
+    pool = target.pool
+
+    # the pool has no "started waiting for a connection" event, so wrap connect()
+    original_connect = pool.connect
+
+    def connect():
+        started = time.perf_counter()
+        try:
+            return original_connect()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, pool=name)
+
+    pool.connect = connect
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        record.info["metrics_checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_connection, record):
+        started = record.info.pop("metrics_checked_out_at", None)
+        if started is not None:
+            db_pool_hold.observe(time.perf_counter() - started, pool=name)
+
+    def collect():
+        current = target.pool
+        samples = []
+        for metric, reader in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"), ("checked_in", "checkedin")):
+            fn = getattr(current, reader, None)
+            if fn is not None:
+                samples.append(({"pool": name, "state": metric}, fn()))
+        return [("db_pool_connections", "gauge", "Connection pool state", samples)]
+
+    register_collector(collect)
+
+
+# --- Redis ---------------------------------------------------------------------------
+
+def instrument_redis(client):
+    """Time execute_command of a redis.asyncio client (pipelines and pub/sub are not covered)."""
+    if getattr(client, "_metrics_instrumented", False):
+        return client
+    original = client.execute_command
+
+    async def execute_command(*args, **options):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await original(*args, **options)
+            status = "ok"
+            return result
+        finally:
+            redis_commands.observe(time.perf_counter() - started, command=str(args[0]).upper() if args else "", status=status)
+
+    client.execute_command = execute_command
+    client._metrics_instrumented = True
+    return client
@@ -0,0 +1,347 @@
+"""Per-statement SQL stats and slow-query capture (replaces echo=True).
+
+- every statement is timed by engine events and aggregated per normalized
+  SQL (literals and $n placeholders -> ?, IN/VALUES lists collapsed): count,
+  total / max time, rows, errors, and where in our code it was first called;
+- statements slower than SLOW_QUERY_MS are kept in a short ring with their
+  parameter shape (types and lengths, never values), call-site and request id;
+- a sample of slow SELECTs is re-run as EXPLAIN (ANALYZE, BUFFERS) on a
+  separate read-only connection (QUERY_EXPLAIN_SAMPLE_RATE, 0 = off: ANALYZE
+  executes the query a second time);
+- GET /internal/query-stats returns the table; report_periodically() prints
+  the top statements of the last interval.
+
+The services' SQL_ECHO flag still turns on SQLAlchemy's echo, which prints
+every statement synchronously to stdout: for local debugging only.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+import sys
+import sysconfig
+import time
+from collections import deque
+from typing import Any, Optional
+
+from . import tracing
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+EXPLAIN_SAMPLE_RATE = float(os.getenv("QUERY_EXPLAIN_SAMPLE_RATE", "0"))
+EXPLAIN_INTERVAL_SECONDS = float(os.getenv("QUERY_EXPLAIN_INTERVAL_SECONDS", "600"))
+LOG_INTERVAL_SECONDS = float(os.getenv("QUERY_STATS_LOG_SECONDS", "300"))
+LOG_TOP = int(os.getenv("QUERY_STATS_LOG_TOP", "5"))
+MAX_STATEMENTS = 2000
+MAX_SLOW_RECORDS = 200
+MAX_SQL_CHARS = 4000
+MAX_SHAPE_ITEMS = 20
+
+SKIP_OPTION = "query_stats_skip"
+
+_LIBRARY_PATHS = tuple(sorted({
+    path for key in ("stdlib", "platstdlib", "purelib", "platlib")
+    if (path := sysconfig.get_paths().get(key))
+}))
+
+# this package (query_stats, tracing, metrics) is never the call-site
+_OWN_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\bIN\s*\(\s*\?(?:::\w+)?(?:\s*,\s*\?(?:::\w+)?)*\s*\)", re.IGNORECASE)
+_ROWS = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+class StatementStats:
+    def __init__(self, sql: str, call_site: Optional[str]):
+        self.sql = sql
+        self.call_site = call_site
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.max_rows = 0
+        self.plan: Optional[str] = None
+        self.plan_at: Optional[float] = None
+
+    def as_dict(self, fingerprint: str) -> dict:
+        return {
+            "fingerprint": fingerprint,
+            "sql": self.sql,
+            "call_site": self.call_site,
+            "count": self.count,
+            "errors": self.errors,
+            "slow": self.slow,
+            "total_ms": round(self.total_ms, 1),
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.max_ms, 1),
+            "rows": self.rows,
+            "max_rows": self.max_rows,
+            "plan": self.plan,
+            "plan_at": self.plan_at,
+        }
+
+
+_stats: dict[str, StatementStats] = {}
+_slow: deque[dict] = deque(maxlen=MAX_SLOW_RECORDS)
+# raw statement -> (fingerprint, normalized); raw strings repeat thanks to the compiled cache
+_normalized: dict[str, tuple[str, str]] = {}
+_explaining: set[str] = set()
+_tasks: set[asyncio.Task] = set()
+counters = {"dropped_statements": 0, "explains": 0, "explain_errors": 0}
+_last_report: dict[str, tuple[int, float]] = {}
+
+
+def normalize(statement: str) -> tuple[str, str]:
+    """SQL -> (fingerprint, normalized text) with literals replaced and lists collapsed."""
+    cached = _normalized.get(statement)
+    if cached is not None:
+        return cached
+    sql = _SPACE.sub(" ", statement).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    # IN ($1, $2, ... $500) and multi-row VALUES get one fingerprint whatever their length
+    sql = _LIST.sub("IN (?, ...)", sql)
+    sql = _ROWS.sub(r"\1, ...", sql)
+    sql = sql[:MAX_SQL_CHARS]
+    result = (hashlib.sha1(sql.encode()).hexdigest()[:12], sql)
+    if len(_normalized) >= MAX_STATEMENTS * 4:
+        _normalized.clear()
+    _normalized[statement] = result
+    return result
+
+
+def _value_shape(value: Any) -> Any:
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (str, bytes)) and len(value) > 64:
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def params_shape(parameters: Any, executemany: bool = False) -> Any:
+    """Types and lengths of the bound parameters; the values themselves are never kept."""
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return {"executemany": len(parameters), "row": params_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        items = list(parameters.items())
+        shape: Any = {k: _value_shape(v) for k, v in items[:MAX_SHAPE_ITEMS]}
+        if len(items) > MAX_SHAPE_ITEMS:
+            shape["..."] = len(items) - MAX_SHAPE_ITEMS
+        return shape
+    if isinstance(parameters, (list, tuple)):
+        shape = [_value_shape(v) for v in parameters[:MAX_SHAPE_ITEMS]]
+        if len(parameters) > MAX_SHAPE_ITEMS:
+            shape.append(f"... +{len(parameters) - MAX_SHAPE_ITEMS}")
+        return shape
+    return None
+
+
+def _frames():
+    frame = sys._getframe(2)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+    # AsyncSession runs the sync ORM code in a greenlet; our coroutine is in the parent one
+    try:
+        import greenlet
+
+        parent = greenlet.getcurrent().parent
+    except Exception:
+        parent = None
+    frame = parent.gr_frame if parent is not None else None
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+def call_site() -> Optional[str]:
+    """First frame of the service code (not stdlib, site-packages or kino_common) that led to the statement."""
+    for frame in _frames():
+        filename = frame.f_code.co_filename
+        if filename.startswith("<") or filename.startswith(_LIBRARY_PATHS) or os.path.abspath(filename).startswith(_OWN_DIR):
+            continue
+        return f"{os.path.relpath(filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+    return None
+
+
+def _record(statement: str, parameters, executemany: bool, elapsed_ms: float, rows: int, error: bool):
+    fingerprint, sql = normalize(statement)
+    entry = _stats.get(fingerprint)
+    if entry is None:
+        if len(_stats) >= MAX_STATEMENTS:
+            counters["dropped_statements"] += 1
+            return None
+        # the call-site is looked up once per fingerprint and for slow statements: walking the stack is not free
+        entry = _stats[fingerprint] = StatementStats(sql, call_site())
+    entry.count += 1
+    entry.total_ms += elapsed_ms
+    entry.max_ms = max(entry.max_ms, elapsed_ms)
+    if error:
+        entry.errors += 1
+    if rows > 0:
+        entry.rows += rows
+        entry.max_rows = max(entry.max_rows, rows)
+
+    if elapsed_ms < SLOW_QUERY_MS:
+        return None
+    entry.slow += 1
+    record = {
+        "at": time.time(),
+        "fingerprint": fingerprint,
+        "duration_ms": round(elapsed_ms, 1),
+        "rows": rows if rows >= 0 else None,
+        "error": error,
+        "sql": sql,
+        "params": params_shape(parameters, executemany),
+        "call_site": call_site(),
+        "request_id": tracing.current_request_id(),
+    }
+    _slow.append(record)
+    return fingerprint, entry
+
+
+def _explainable(statement: str, executemany: bool) -> bool:
+    head = statement.lstrip()[:6].upper()
+    return not executemany and head in ("SELECT", "WITH") and "FOR UPDATE" not in statement.upper()
+
+
+def _maybe_explain(engine, fingerprint: str, entry: StatementStats, statement: str, parameters, executemany: bool):
+    if engine is None or EXPLAIN_SAMPLE_RATE <= 0 or fingerprint in _explaining:
+        return
+    if entry.plan_at is not None and time.time() - entry.plan_at < EXPLAIN_INTERVAL_SECONDS:
+        return
+    if not _explainable(statement, executemany) or random.random() >= EXPLAIN_SAMPLE_RATE:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _explaining.add(fingerprint)
+    task = loop.create_task(_explain(engine, fingerprint, entry, statement, parameters))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _explain(engine, fingerprint: str, entry: StatementStats, statement: str, parameters) -> None:
+    options = {SKIP_OPTION: True}
+    try:
+        async with engine.connect() as conn:
+            # ANALYZE really runs the query: SELECT only, and only in a read-only transaction
+            await conn.exec_driver_sql("SET TRANSACTION READ ONLY", execution_options=options)
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters, execution_options=options
+            )
+            entry.plan = "\n".join(str(row[0]) for row in result)
+            await conn.rollback()
+        counters["explains"] += 1
+    except Exception as e:
+        counters["explain_errors"] += 1
+        entry.plan = f"EXPLAIN failed: {e}"
+    finally:
+        entry.plan_at = time.time()
+        _explaining.discard(fingerprint)
+
+
+def instrument_sqlalchemy(engine) -> None:
+    from sqlalchemy import event
+
+    target = getattr(engine, "sync_engine", engine)
+    if getattr(target, "_query_stats_instrumented", False):
+        return
+    target._query_stats_instrumented = True
+    # EXPLAIN runs on a separate connection of the async engine; a sync engine gets none
+    async_engine = engine if target is not engine else None
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and not context.execution_options.get(SKIP_OPTION):
+            context._query_stats_started = time.perf_counter()
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_stats_started", None)
+        if started is None:
+            return
+        context._query_stats_started = None
+        rows = getattr(cursor, "rowcount", -1) if cursor is not None else -1
+        slow = _record(statement, parameters, executemany, (time.perf_counter() - started) * 1000, rows, False)
+        if slow is not None:
+            _maybe_explain(async_engine, *slow, statement, parameters, executemany)
+
+    @event.listens_for(target, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        started = getattr(context, "_query_stats_started", None) if context is not None else None
+        if started is None:
+            return
+        context._query_stats_started = None
+        _record(
+            exception_context.statement or "", exception_context.parameters,
+            bool(getattr(context, "executemany", False)), (time.perf_counter() - started) * 1000, -1, True,
+        )
+
+
+def snapshot(order: str = "total_ms", limit: int = 20) -> dict:
+    key = order if order in ("total_ms", "mean_ms", "max_ms", "count", "max_rows", "slow", "errors") else "total_ms"
+    statements = [entry.as_dict(fingerprint) for fingerprint, entry in _stats.items()]
+    statements.sort(key=lambda s: s[key] or 0, reverse=True)
+    return {
+        "slow_query_ms": SLOW_QUERY_MS,
+        "explain_sample_rate": EXPLAIN_SAMPLE_RATE,
+        "statements_tracked": len(_stats),
+        **counters,
+        "statements": statements[:max(limit, 0)],
+        "slow": list(_slow)[-max(limit, 0):][::-1],
+    }
+
+
+def reset() -> None:
+    _stats.clear()
+    _slow.clear()
+    _last_report.clear()
+    for name in counters:
+        counters[name] = 0
+
+
+async def stats_endpoint(order: str = "total_ms", limit: int = 20, reset_after: bool = False) -> dict:
+    # like /metrics: the gateway only routes /api/, so this is reachable from inside the network only
+    data = snapshot(order, limit)
+    if reset_after:
+        reset()
+    return data
+
+
+def report() -> list[str]:
+    """Top statements by time spent since the previous report."""
+    deltas = []
+    for fingerprint, entry in _stats.items():
+        count, total_ms = _last_report.get(fingerprint, (0, 0.0))
+        if entry.count > count:
+            deltas.append((entry.total_ms - total_ms, entry.count - count, fingerprint, entry))
+        _last_report[fingerprint] = (entry.count, entry.total_ms)
+    deltas.sort(key=lambda d: d[0], reverse=True)
+    return [
+        f"{total:9.1f} ms {count:6d}x max {entry.max_ms:7.1f} ms  [{fingerprint}] {entry.call_site or '?'}  {entry.sql[:200]}"
+        for total, count, fingerprint, entry in deltas[:LOG_TOP]
+    ]
+
+
+async def report_periodically(stop: asyncio.Event) -> None:
+    if LOG_INTERVAL_SECONDS <= 0:
+        return
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=LOG_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        lines = report()
+        slow = sum(1 for r in _slow if r["at"] >= time.time() - LOG_INTERVAL_SECONDS)
+        if lines:
+            print(f"📊 SQL over {int(LOG_INTERVAL_SECONDS)} s (slower than {SLOW_QUERY_MS:g} ms: {slow}):\n" + "\n".join(lines))
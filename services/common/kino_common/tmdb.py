@@ -0,0 +1,255 @@
+"""TMDB gateway: every call to api.themoviedb.org goes through get().
+
+Used by admin_service and bff_service; both already install httpx and redis.
+
+- one pooled client per process;
+- responses cached in Redis under tmdb:v1:*, shared by both services:
+  long TTL for movie details and genre lists, short for searches;
+- 404s are cached too (briefly), so a bad id is not re-fetched on every call;
+- identical in-flight requests share one upstream call;
+- a token bucket in Redis keeps both services together under TMDB's rate
+  limit; without Redis each process falls back to its own bucket.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any
+
+import httpx
+import redis.asyncio as aioredis
+
+from . import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+TMDB_BEARER = os.getenv("TMDB_BEARER") or os.getenv("TMDB_BEARER_TOKEN")
+TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3").rstrip("/")
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+DETAIL_TTL = int(os.getenv("TMDB_DETAIL_TTL_SECONDS", str(24 * 3600)))
+SEARCH_TTL = int(os.getenv("TMDB_SEARCH_TTL_SECONDS", "600"))
+NEGATIVE_TTL = int(os.getenv("TMDB_NEGATIVE_TTL_SECONDS", "300"))
+# TMDB enforces roughly 50 requests/s per key; stay below it
+RATE_PER_SECOND = float(os.getenv("TMDB_RATE_PER_SECOND", "40"))
+BURST = int(os.getenv("TMDB_BURST", "40"))
+TIMEOUT = float(os.getenv("TMDB_TIMEOUT_SECONDS", "10"))
+
+CACHE_PREFIX = "tmdb:v1:"
+BUCKET_KEY = "tmdb:ratelimit"
+_NOT_FOUND = "__404__"
+
+# returns 0 when a token was taken, otherwise milliseconds until the next one
+_TOKEN_BUCKET_LUA = """
+local tokens_key, ts_key = KEYS[1], KEYS[2]
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(redis.call('GET', tokens_key) or burst)
+local last = tonumber(redis.call('GET', ts_key) or now)
+tokens = math.min(burst, tokens + (now - last) / 1000 * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = math.ceil((1 - tokens) / rate * 1000)
+end
+local ttl = math.ceil(burst / rate * 1000) + 1000
+redis.call('SET', tokens_key, tokens, 'PX', ttl)
+redis.call('SET', ts_key, now, 'PX', ttl)
+return wait
+"""
+
+
+class TMDBNotFound(Exception):
+    pass
+
+
+class TMDBUnavailable(Exception):
+    """Network error, 5xx or rate limited after retrying."""
+
+
+class _LocalBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+_client: httpx.AsyncClient | None = None
+_redis: aioredis.Redis | None = None
+_bucket_script = None
+_local_bucket = _LocalBucket(RATE_PER_SECOND, BURST)
+_inflight: dict[str, asyncio.Future] = {}
+stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "throttled": 0, "errors": 0}
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        headers = {"Accept": "application/json"}
+        if TMDB_BEARER:
+            headers["Authorization"] = f"Bearer {TMDB_BEARER}"
+        _client = httpx.AsyncClient(
+            base_url=TMDB_BASE_URL,
+            headers=headers,
+            timeout=TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            # span per call, but our trace headers stay inside our network
+            event_hooks=metrics.httpx_event_hooks(tracing.httpx_event_hooks(propagate=False)),
+        )
+    return _client
+
+
+def _get_redis() -> aioredis.Redis:
+    global _redis, _bucket_script
+    if _redis is None:
+        _redis = metrics.instrument_redis(tracing.instrument_redis(aioredis.from_url(REDIS_URL, decode_responses=True)))
+        _bucket_script = _redis.register_script(_TOKEN_BUCKET_LUA)
+    return _redis
+
+
+def _ttl_for(path: str) -> int:
+    return SEARCH_TTL if path.startswith("/search") else DETAIL_TTL
+
+
+def _cache_key(path: str, params: dict) -> str:
+    canonical = json.dumps([path, sorted(params.items())], ensure_ascii=False, separators=(",", ":"))
+    return CACHE_PREFIX + hashlib.sha1(canonical.encode()).hexdigest()
+
+
+async def _cache_get(key: str) -> str | None:
+    try:
+        return await _get_redis().get(key)
+    except Exception as e:
+        logger.warning("TMDB cache read failed: %s", e)
+        return None
+
+
+async def _cache_set(key: str, value: str, ttl: int) -> None:
+    try:
+        await _get_redis().set(key, value, ex=ttl)
+    except Exception as e:
+        logger.warning("TMDB cache write failed: %s", e)
+
+
+async def _acquire() -> None:
+    while True:
+        try:
+            _get_redis()
+            wait = int(await _bucket_script(
+                keys=[BUCKET_KEY, BUCKET_KEY + ":ts"],
+                args=[RATE_PER_SECOND, BURST, int(time.time() * 1000)],
+            )) / 1000
+        except Exception:
+            wait = _local_bucket.take()
+        if wait <= 0:
+            return
+        stats["throttled"] += 1
+        await asyncio.sleep(wait)
+
+
+async def _fetch(path: str, params: dict) -> str:
+    """Upstream call; returns the body to cache (_NOT_FOUND for a 404)."""
+    for attempt in range(3):
+        await _acquire()
+        try:
+            resp = await _get_client().get(path, params=params)
+        except httpx.HTTPError as e:
+            stats["errors"] += 1
+            metrics.record_upstream_error(TMDB_BASE_URL)
+            raise TMDBUnavailable(f"TMDB request failed: {e}") from e
+        if resp.status_code == 404:
+            return _NOT_FOUND
+        if resp.status_code == 429 and attempt < 2:
+            # another client of the same key used up the quota; TMDB says when to come back
+            stats["throttled"] += 1
+            await asyncio.sleep(min(float(resp.headers.get("retry-after") or 1), 10))
+            continue
+        if resp.status_code >= 400:
+            stats["errors"] += 1
+            raise TMDBUnavailable(f"TMDB answered {resp.status_code} for {path}")
+        return resp.text
+    raise TMDBUnavailable(f"TMDB rate limit for {path}")
+
+
+async def _load(key: str, path: str, params: dict, ttl: int) -> str:
+    body = await _fetch(path, params)
+    await _cache_set(key, body, NEGATIVE_TTL if body == _NOT_FOUND else ttl)
+    return body
+
+
+def _done(key: str, future: asyncio.Future) -> None:
+    if _inflight.get(key) is future:
+        del _inflight[key]
+    # mark the exception as retrieved even if every waiter went away
+    if not future.cancelled():
+        future.exception()
+
+
+async def get(path: str, params: dict | None = None, *, ttl: int | None = None) -> Any:
+    """GET a TMDB endpoint (path relative to /3) and return parsed JSON.
+
+    Raises TMDBNotFound for 404 (cached) and TMDBUnavailable when TMDB cannot be reached.
+    """
+    params = dict(params or {})
+    if TMDB_API_KEY and not TMDB_BEARER:
+        params["api_key"] = TMDB_API_KEY
+    key = _cache_key(path, {k: v for k, v in params.items() if k != "api_key"})
+
+    body = await _cache_get(key)
+    if body is not None:
+        stats["negative_hits" if body == _NOT_FOUND else "hits"] += 1
+    else:
+        future = _inflight.get(key)
+        if future is not None:
+            stats["coalesced"] += 1
+            body = await asyncio.shield(future)
+        else:
+            stats["misses"] += 1
+            future = asyncio.ensure_future(_load(key, path, params, ttl or _ttl_for(path)))
+            _inflight[key] = future
+            future.add_done_callback(lambda f, k=key: _done(k, f))
+            body = await asyncio.shield(future)
+
+    if body == _NOT_FOUND:
+        raise TMDBNotFound(path)
+    return json.loads(body)
+
+
+async def search_movies(query: str, language: str = "ru-RU", page: int = 1) -> dict:
+    # a search box sends "Matrix", "matrix " and "MATRIX": one cache entry for all of them
+    query = " ".join(query.split()).lower()
+    return await get("/search/movie", {"query": query, "language": language, "include_adult": "false", "page": page})
+
+
+async def movie_details(tmdb_id: int, language: str = "ru-RU", append: str | None = "videos") -> dict:
+    params = {"language": language}
+    if append:
+        params["append_to_response"] = append
+    return await get(f"/movie/{tmdb_id}", params)
+
+
+async def genre_list(language: str = "ru-RU") -> list[dict]:
+    return (await get("/genre/movie/list", {"language": language})).get("genres") or []
+
+
+async def close() -> None:
+    global _client, _redis
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
@@ -0,0 +1,477 @@
+"""Distributed tracing without external dependencies.
+
+- `X-Request-ID` (set by nginx) and W3C `traceparent` are read from incoming
+  requests and forwarded on every outgoing httpx call and Celery task, whether
+  or not the trace is sampled;
+- spans: HTTP handlers (middleware), outgoing httpx calls (event hooks),
+  SQLAlchemy statements (engine events), Redis commands, Celery tasks;
+- the sampling decision is made once at the root (TRACING_SAMPLE_RATE, 0 = off)
+  and travels with the trace; when a trace is not recorded every hook returns
+  after one contextvar lookup;
+- finished spans are queued and written by a background thread: JSON lines to
+  TRACING_FILE, or OTLP/HTTP JSON to TRACING_OTLP_ENDPOINT (OpenTelemetry
+  collector, Jaeger, Tempo).
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0"))
+EXPORTER = os.getenv("TRACING_EXPORTER", "file")  # file | otlp
+TRACING_FILE = os.getenv("TRACING_FILE", "/tmp/traces/{service}.jsonl")
+OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+MAX_QUEUED_SPANS = 10000
+BATCH_SIZE = 256
+FLUSH_SECONDS = 2.0
+MAX_STATEMENT_CHARS = 2000
+
+REQUEST_ID_HEADER = "X-Request-ID"
+TRACEPARENT_HEADER = "traceparent"
+
+# OTLP SpanKind
+_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class Span:
+    __slots__ = ("name", "kind", "context", "parent_id", "start_ns", "end_ns", "attributes", "error", "request_id")
+
+    def __init__(self, name: str, kind: str, parent: Optional[SpanContext], attributes: Optional[dict] = None):
+        self.name = name
+        self.kind = kind
+        self.context = SpanContext(parent.trace_id if parent else _new_id(16), _new_id(8), True)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: dict[str, Any] = dict(attributes or {})
+        self.error: Optional[str] = None
+        self.request_id = _request_id.get()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"[:500]
+
+    def as_dict(self) -> dict:
+        return {
+            "service": _service,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.request_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round(((self.end_ns or self.start_ns) - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current: contextvars.ContextVar[Optional[SpanContext]] = contextvars.ContextVar("trace_context", default=None)
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_service = os.getenv("SERVICE_NAME", "unknown")
+_queue: "queue.Queue[Span]" = queue.Queue(maxsize=MAX_QUEUED_SPANS)
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+stats = {"exported": 0, "dropped": 0, "export_errors": 0}
+
+
+def configure(service_name: str) -> None:
+    global _service
+    _service = os.getenv("SERVICE_NAME", service_name)
+
+
+def enabled() -> bool:
+    return SAMPLE_RATE > 0
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def _new_id(nbytes: int) -> str:
+    return secrets.token_hex(nbytes)
+
+
+def _recording(ctx: Optional[SpanContext]) -> bool:
+    return ctx is not None and ctx.sampled and SAMPLE_RATE > 0
+
+
+def _parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+def inject(headers: dict) -> dict:
+    """Add traceparent and X-Request-ID of the current request to outgoing headers."""
+    ctx = _current.get()
+    if ctx is not None:
+        headers[TRACEPARENT_HEADER] = ctx.traceparent()
+    request_id = _request_id.get()
+    if request_id:
+        headers[REQUEST_ID_HEADER] = request_id
+    return headers
+
+
+def _start_root(name: str, kind: str, traceparent: Optional[str], request_id: Optional[str],
+                attributes: Optional[dict] = None) -> tuple[Optional[Span], list]:
+    """Adopt the caller's trace (or start one) for the current context; returns the span and reset tokens."""
+    parent = _parse_traceparent(traceparent)
+    sampled = parent.sampled if parent else (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)
+    root = None
+    if sampled and SAMPLE_RATE > 0:
+        root = Span(name, kind, parent, attributes)
+        ctx = root.context
+    else:
+        # not recorded, but still propagated: downstream services keep the same trace_id
+        ctx = SpanContext(parent.trace_id if parent else _new_id(16), _new_id(8), sampled)
+    request_id = request_id or _new_id(8)
+    if root is not None:
+        root.request_id = request_id
+    return root, [_current.set(ctx), _request_id.set(request_id)]
+
+
+def _reset(tokens: list) -> None:
+    _current.reset(tokens[0])
+    _request_id.reset(tokens[1])
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", attributes: Optional[dict] = None) -> Iterator[Optional[Span]]:
+    """Child span of the current one; yields None (and records nothing) when the trace is not sampled."""
+    parent = _current.get()
+    if not _recording(parent):
+        yield None
+        return
+    current = Span(name, kind, parent, attributes)
+    token = _current.set(current.context)
+    try:
+        yield current
+    except BaseException as exc:
+        current.record_error(exc)
+        raise
+    finally:
+        _current.reset(token)
+        _finish(current)
+
+
+async def tracing_middleware(request, call_next):
+    """Server span per request; the request id is echoed back in X-Request-ID."""
+    root, tokens = _start_root(
+        f"{request.method} {request.url.path}",
+        "server",
+        request.headers.get(TRACEPARENT_HEADER),
+        request.headers.get(REQUEST_ID_HEADER),
+        {"http.method": request.method, "http.target": request.url.path},
+    )
+    request_id = _request_id.get()
+    try:
+        response = await call_next(request)
+    except BaseException as exc:
+        if root is not None:
+            root.record_error(exc)
+            _finish(root)
+        _reset(tokens)
+        raise
+    if root is not None:
+        route = request.scope.get("route")
+        if route is not None and getattr(route, "path", None):
+            # the route template, not the concrete URL: /movies/{movie_id}
+            root.name = f"{request.method} {route.path}"
+            root.attributes["http.route"] = route.path
+        root.attributes["http.status_code"] = response.status_code
+        if response.status_code >= 500:
+            root.error = f"HTTP {response.status_code}"
+        _finish(root)
+    _reset(tokens)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
+# --- httpx ---------------------------------------------------------------------------
+
+def httpx_event_hooks(propagate: bool = True) -> dict:
+    """event_hooks= for httpx.AsyncClient: a client span per request and, for our own
+    services (propagate=True), traceparent / X-Request-ID headers."""
+
+    async def on_request(request) -> None:
+        ctx = _current.get()
+        if ctx is None:
+            return
+        parent = ctx
+        if _recording(ctx):
+            client_span = Span(
+                f"HTTP {request.method} {request.url.host}",
+                "client",
+                ctx,
+                {"http.method": request.method, "http.url": str(request.url).split("?", 1)[0], "peer.host": request.url.host},
+            )
+            request.extensions["tracing_span"] = client_span
+            parent = client_span.context
+        if propagate:
+            request.headers[TRACEPARENT_HEADER] = parent.traceparent()
+            request_id = _request_id.get()
+            if request_id:
+                request.headers[REQUEST_ID_HEADER] = request_id
+
+    async def on_response(response) -> None:
+        client_span = response.request.extensions.get("tracing_span")
+        if client_span is None:
+            return
+        client_span.attributes["http.status_code"] = response.status_code
+        if response.status_code >= 500:
+            client_span.error = f"HTTP {response.status_code}"
+        _finish(client_span)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+# --- SQLAlchemy ----------------------------------------------------------------------
+
+def instrument_sqlalchemy(engine) -> None:
+    from sqlalchemy import event
+
+    target = getattr(engine, "sync_engine", engine)
+    if getattr(target, "_tracing_instrumented", False):
+        return
+    target._tracing_instrumented = True
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        ctx = _current.get()
+        if not _recording(ctx):
+            return
+        context._tracing_span = Span(
+            "db " + (statement.split(None, 1)[0].upper() if statement else "query"),
+            "client",
+            ctx,
+            {"db.system": "postgresql", "db.statement": statement[:MAX_STATEMENT_CHARS], "db.executemany": executemany},
+        )
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        db_span = getattr(context, "_tracing_span", None)
+        if db_span is not None:
+            context._tracing_span = None
+            if cursor is not None and getattr(cursor, "rowcount", -1) >= 0:
+                db_span.attributes["db.rowcount"] = cursor.rowcount
+            _finish(db_span)
+
+    @event.listens_for(target, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        db_span = getattr(context, "_tracing_span", None) if context is not None else None
+        if db_span is not None:
+            context._tracing_span = None
+            db_span.record_error(exception_context.original_exception)
+            _finish(db_span)
+
+
+# --- Redis ---------------------------------------------------------------------------
+
+def instrument_redis(client):
+    """Wrap execute_command of a redis.asyncio client (pipelines and pub/sub are not traced)."""
+    if getattr(client, "_tracing_instrumented", False):
+        return client
+    original = client.execute_command
+
+    async def execute_command(*args, **options):
+        if not _recording(_current.get()):
+            return await original(*args, **options)
+        with span(f"redis {args[0]}", "client", {"db.system": "redis"}):
+            return await original(*args, **options)
+
+    client.execute_command = execute_command
+    client._tracing_instrumented = True
+    return client
+
+
+# --- Celery --------------------------------------------------------------------------
+
+def instrument_celery() -> None:
+    """Propagate the trace into task headers and record a span per executed task (signals are global)."""
+    from celery import signals
+
+    @signals.before_task_publish.connect(weak=False)
+    def _publish(headers=None, **kwargs):
+        if headers is not None:
+            inject(headers)
+
+    @signals.task_prerun.connect(weak=False)
+    def _prerun(task_id=None, task=None, **kwargs):
+        request = task.request
+        root, tokens = _start_root(
+            f"celery {task.name}",
+            "consumer",
+            getattr(request, TRACEPARENT_HEADER, None),
+            getattr(request, REQUEST_ID_HEADER, None),
+            {"celery.task_id": task_id, "celery.retries": request.retries or 0},
+        )
+        request._tracing = (root, tokens)
+
+    @signals.task_failure.connect(weak=False)
+    def _failure(sender=None, exception=None, **kwargs):
+        root, _ = getattr(sender.request, "_tracing", (None, None))
+        if root is not None and exception is not None:
+            root.record_error(exception)
+
+    @signals.task_postrun.connect(weak=False)
+    def _postrun(task=None, state=None, **kwargs):
+        root, tokens = getattr(task.request, "_tracing", (None, None))
+        if tokens is None:
+            return
+        task.request._tracing = None
+        if root is not None:
+            root.attributes["celery.state"] = state
+            _finish(root)
+        try:
+            _reset(tokens)
+        except ValueError:
+            # postrun in a different context than prerun (should not happen): just forget it
+            pass
+
+
+# --- export --------------------------------------------------------------------------
+
+def _finish(finished: Span) -> None:
+    finished.end_ns = time.time_ns()
+    try:
+        _queue.put_nowait(finished)
+    except queue.Full:
+        stats["dropped"] += 1
+        return
+    if _worker is None:
+        _start_worker()
+
+
+def _start_worker() -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="tracing-exporter", daemon=True)
+            _worker.start()
+            atexit.register(flush)
+
+
+def _drain(first: Optional[Span] = None) -> list[Span]:
+    batch = [first] if first is not None else []
+    while len(batch) < BATCH_SIZE:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _run() -> None:
+    while True:
+        try:
+            first = _queue.get(timeout=FLUSH_SECONDS)
+        except queue.Empty:
+            continue
+        _export(_drain(first))
+
+
+def flush() -> None:
+    while True:
+        batch = _drain()
+        if not batch:
+            return
+        _export(batch)
+
+
+def _export(batch: list[Span]) -> None:
+    try:
+        if EXPORTER == "otlp":
+            _export_otlp(batch)
+        else:
+            _export_file(batch)
+        stats["exported"] += len(batch)
+    except Exception as e:
+        stats["export_errors"] += 1
+        if stats["export_errors"] in (1, 10, 100) or stats["export_errors"] % 1000 == 0:
+            print(f"Tracing export failed ({stats['export_errors']}x): {e}")
+
+
+def _export_file(batch: list[Span]) -> None:
+    path = TRACING_FILE.format(service=_service)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for finished in batch:
+            f.write(json.dumps(finished.as_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(finished: Span) -> dict:
+    attributes = dict(finished.attributes)
+    if finished.request_id:
+        attributes["request_id"] = finished.request_id
+    item = {
+        "traceId": finished.context.trace_id,
+        "spanId": finished.context.span_id,
+        "name": finished.name,
+        "kind": _KINDS.get(finished.kind, 1),
+        "startTimeUnixNano": str(finished.start_ns),
+        "endTimeUnixNano": str(finished.end_ns or finished.start_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None],
+        "status": {"code": 2, "message": finished.error} if finished.error else {"code": 1},
+    }
+    if finished.parent_id:
+        item["parentSpanId"] = finished.parent_id
+    return item
+
+
+def _export_otlp(batch: list[Span]) -> None:
+    payload = {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": _service}}]},
+            "scopeSpans": [{"scope": {"name": "kino.tracing"}, "spans": [_otlp_span(s) for s in batch]}],
+        }]
+    }
+    request = urllib.request.Request(
+        OTLP_ENDPOINT,
+        data=json.dumps(payload, default=str).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=5) as resp:
+        resp.read()
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+import httpx
+
+from kino_common import http
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = http.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow() is False
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert [breaker.allow() for _ in range(3)] == [True, False, False]
+    breaker.record_success()
+    assert [breaker.allow() for _ in range(2)] == [True, True]
+
+
+def test_timeout_is_per_request_on_a_shared_client():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200)
+
+    async def scenario():
+        client = http.get_client("http://upstream.test")
+        client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+        await http.get_client("http://upstream.test/").get("/a", timeout=30.0)
+        await http.get_client("http://upstream.test").get("/b")
+        same = http.get_client("http://upstream.test") is client
+        await http.close_clients()
+        return same
+
+    assert asyncio.run(scenario()) is True
+    assert seen == [30.0, 10.0]
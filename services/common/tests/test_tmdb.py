@@ -0,0 +1,113 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from kino_common import tmdb
+
+
+class StubTMDB(BaseHTTPRequestHandler):
+    """Answers like api.themoviedb.org/3 for the few paths the tests use."""
+
+    calls: list[tuple[str, dict, str]] = []
+    rate_limited_once: set[str] = set()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.calls.append((url.path, query, self.headers.get("Authorization")))
+        if url.path == "/movie/603":
+            time.sleep(0.2)  # slow enough for concurrent callers to overlap
+            self._send(200, {"id": 603, "title": "Матрица", "language": query.get("language")})
+        elif url.path == "/movie/429" and url.path not in self.rate_limited_once:
+            self.rate_limited_once.add(url.path)
+            self._send(429, {"status_message": "slow down"}, {"Retry-After": "0"})
+        elif url.path == "/movie/429":
+            self._send(200, {"id": 429})
+        elif url.path == "/movie/500":
+            self._send(500, {"status_message": "oops"})
+        elif url.path == "/search/movie":
+            self._send(200, {"results": [], "query": query.get("query")})
+        else:
+            self._send(404, {"status_code": 34})
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    StubTMDB.calls, StubTMDB.rate_limited_once = [], set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTMDB)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(tmdb, "TMDB_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(tmdb, "TMDB_BEARER", "token")
+    # nothing listens there: cache reads and writes fail soft, the bucket is per process
+    monkeypatch.setattr(tmdb, "REDIS_URL", "redis://127.0.0.1:1/0")
+    monkeypatch.setattr(tmdb, "stats", dict.fromkeys(tmdb.stats, 0))
+    yield StubTMDB.calls
+    server.shutdown()
+    server.server_close()
+
+
+def run(fn):
+    async def scenario():
+        try:
+            return await fn()
+        finally:
+            await tmdb.close()
+
+    return asyncio.run(scenario())
+
+
+def test_identical_concurrent_requests_share_one_upstream_call(stub):
+    async def scenario():
+        return await asyncio.gather(*(tmdb.movie_details(603, append=None) for _ in range(5)))
+
+    results = run(scenario)
+    assert [r["title"] for r in results] == ["Матрица"] * 5
+    assert stub == [("/movie/603", {"language": "ru-RU"}, "Bearer token")]
+    assert (tmdb.stats["misses"], tmdb.stats["coalesced"]) == (1, 4)
+
+
+def test_not_found_and_upstream_errors(stub):
+    async def scenario():
+        with pytest.raises(tmdb.TMDBNotFound):
+            await tmdb.movie_details(1)
+        with pytest.raises(tmdb.TMDBUnavailable):
+            await tmdb.movie_details(500)
+
+    run(scenario)
+    assert tmdb.stats["errors"] == 1
+
+
+def test_rate_limited_call_is_retried(stub):
+    async def scenario():
+        return await tmdb.movie_details(429)
+
+    assert run(scenario)["id"] == 429
+    assert [path for path, _, _ in stub] == ["/movie/429", "/movie/429"]
+    assert tmdb.stats["throttled"] >= 1
+
+
+def test_search_query_is_normalized(stub):
+    async def scenario():
+        return await tmdb.search_movies("  The   MATRIX ")
+
+    assert run(scenario)["query"] == "the matrix"
+    assert stub[0][1]["query"] == "the matrix"
@@ -1,31 +1,58 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 from sqlalchemy import and_, or_, desc, asc
 from typing import Optional, List
 
+from app.core import genre_cache
+from app.core.catalog import check_etag, etag_response
 from app.db.session import get_async_session
-from app.models.movie import Movie, Genre, movie_genre
+from app.models.movie import Movie, movie_genre
 from app.schemas.film import FilmCard, FilmDetail, GenreResponse, MoviesResponse
 
 router = APIRouter()
 
+MAX_BATCH_IDS = 200
+
 @router.get("/movies", response_model=MoviesResponse)
 async def get_movies(
+    request: Request,
     db: AsyncSession = Depends(get_async_session),
     search: Optional[str] = Query(None, description="Search by title"),
     genre_id: Optional[int] = Query(None, description="Filter by genre ID"),
     limit: int = Query(20, ge=1, le=100, description="Number of movies per page"),
     offset: int = Query(0, ge=0, description="Number of movies to skip"),
     sort_by: str = Query("release_year", description="Sort field: release_year, title, imdb_rating"),
-    sort_order: str = Query("desc", description="Sort order: asc or desc")
+    sort_order: str = Query("desc", description="Sort order: asc or desc"),
+    ids: Optional[str] = Query(None, description="Comma-separated movie IDs for batch lookup (max 200)")
 ):
     """Get list of movies with filtering, search and pagination"""
+    # жанры фильмов собираем из id в movie_genre по словарю в памяти, без JOIN на genre
+    await genre_cache.ensure_loaded()
+
+    # Batch lookup by IDs: no filtering, sorting or pagination
+    if ids:
+        try:
+            id_list = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        if len(id_list) > MAX_BATCH_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+        result = await db.execute(
+            select(Movie, genre_cache.genre_ids_column()).where(Movie.movie_id.in_(id_list))
+        )
+        movies = [genre_cache.movie_with_genres(movie, genre_ids) for movie, genre_ids in result.all()]
+        return etag_response(request, MoviesResponse, MoviesResponse(
+            movies=movies,
+            total=len(movies),
+            limit=len(id_list),
+            offset=0,
+            has_next=False
+        ))
     
     # Base query
-    query = select(Movie).options(selectinload(Movie.genres))
+    query = select(Movie, genre_cache.genre_ids_column())
     
     # Apply search filter
     if search:
@@ -69,31 +96,37 @@ async def get_movies(
     
     # Execute query
     result = await db.execute(query)
-    movies = result.scalars().all()
+    movies = [genre_cache.movie_with_genres(movie, genre_ids) for movie, genre_ids in result.all()]
     
-    return MoviesResponse(
+    return etag_response(request, MoviesResponse, MoviesResponse(
         movies=movies,
         total=total,
         limit=limit,
         offset=offset,
         has_next=offset + limit < total
-    )
+    ))
 
 @router.get("/movies/{movie_id}", response_model=FilmDetail)
-async def get_movie_by_id(movie_id: int, db: AsyncSession = Depends(get_async_session)):
+async def get_movie_by_id(
+    movie_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+):
+    await genre_cache.ensure_loaded()
     result = await db.execute(
-        select(Movie)
-        .options(selectinload(Movie.genres))
-        .where(Movie.movie_id == movie_id)
+        select(Movie, genre_cache.genre_ids_column()).where(Movie.movie_id == movie_id)
     )
-    movie = result.scalar_one_or_none()
-    if not movie:
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Movie not found")
-    return movie
+    return etag_response(request, FilmDetail, genre_cache.movie_with_genres(*row))
 
 @router.get("/genres", response_model=List[GenreResponse])
-async def get_genres(db: AsyncSession = Depends(get_async_session)):
-    """Get list of all genres"""
-    result = await db.execute(select(Genre).order_by(Genre.name))
-    genres = result.scalars().all()
+async def get_genres(request: Request, response: Response):
+    """Get list of all genres (served from the in-memory dictionary)"""
+    genres = await genre_cache.all_genres()
+    # версия справочника — уже хеш содержимого, сериализовать ради ETag не нужно
+    cached = check_etag(request, response, genre_cache.etag())
+    if cached is not None:
+        return cached
     return genres
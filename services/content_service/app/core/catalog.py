@@ -0,0 +1,42 @@
+import hashlib
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+CACHE_CONTROL = "public, no-cache"
+JSON_MEDIA_TYPE = "application/json"
+
+
+@lru_cache(maxsize=None)
+def _adapter(response_model: Any) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def etag_response(request: Request, response_model: Any, data: Any) -> Response:
+    """Сериализует data по response_model и отдаёт с ETag = хэш тела; 304, если тело у клиента то же.
+
+    ETag считается по самим байтам ответа, поэтому не может отстать от данных
+    и совпадает на всех репликах.
+    """
+    adapter = _adapter(response_model)
+    body = adapter.dump_json(adapter.validate_python(data), by_alias=True)
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    response = Response(content=body, media_type=JSON_MEDIA_TYPE)
+    return check_etag(request, response, etag) or response
+
+
+def check_etag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Готовый 304 для совпавшего If-None-Match, иначе ставит ETag в ответ и возвращает None"""
+    inm = request.headers.get("if-none-match")
+    if inm and _matches(inm, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
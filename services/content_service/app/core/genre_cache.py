@@ -0,0 +1,23 @@
+"""Справочник жанров в памяти процесса: kino_common.genre_cache на наших моделях и сессиях."""
+from kino_common.genre_cache import GENRES_CHANGED, GenreCache
+
+from app.core.redis import get_redis
+from app.db.session import async_session
+from app.models.movie import Genre, Movie, movie_genre
+
+cache = GenreCache(async_session, get_redis, Genre, Movie, movie_genre)
+
+reload = cache.reload
+ensure_loaded = cache.ensure_loaded
+etag = cache.etag
+all_genres = cache.all_genres
+get = cache.get
+hydrate = cache.hydrate
+genre_ids_column = cache.genre_ids_column
+movie_with_genres = cache.movie_with_genres
+listen = cache.listen
+
+__all__ = [
+    "GENRES_CHANGED", "cache", "reload", "ensure_loaded", "etag", "all_genres", "get",
+    "hydrate", "genre_ids_column", "movie_with_genres", "listen",
+]
@@ -4,13 +4,14 @@ from datetime import datetime
 from typing import Any, Optional, Callable
 import redis.asyncio as aioredis
 from redis.asyncio import Redis
+from kino_common import metrics, tracing
 
 redis_client: Optional[Redis] = None
 
 async def init_redis() -> Redis:
     global redis_client
     if redis_client is None:
-        redis_client = await aioredis.from_url("redis://redis:6379/0")
+        redis_client = metrics.instrument_redis(tracing.instrument_redis(await aioredis.from_url("redis://redis:6379/0")))
     return redis_client
 
 async def get_redis() -> Redis:
@@ -1,13 +1,40 @@
 
+import asyncio
+
 from fastapi import FastAPI
 from app.api.v1 import movies
+from kino_common import metrics, query_stats, tracing
+from app.core import genre_cache
 from app.models.movie import Movie, Genre  # Импортируем модель
 
 app = FastAPI(title="Content Service")
+app.middleware("http")(metrics.metrics_middleware)
+tracing.configure("content_service")
+app.middleware("http")(tracing.tracing_middleware)
+
+_background_stop = asyncio.Event()
+_background_tasks: list[asyncio.Task] = []
 
 @app.on_event("startup")
 async def startup_event():
     """Content service подключается к уже существующей базе admin_service"""
     print("✅ Content Service подключен к общей базе данных")
+    # справочник жанров держим в памяти; подписка сама загружает его при подключении
+    try:
+        await genre_cache.reload()
+    except Exception as e:
+        print(f"⚠️  Справочник жанров не загружен, попробуем при первом запросе: {e}")
+    _background_tasks.append(asyncio.create_task(genre_cache.listen(_background_stop)))
+    _background_tasks.append(asyncio.create_task(query_stats.report_periodically(_background_stop)))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    _background_stop.set()
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
 
 app.include_router(movies.router, prefix="/api/v1")
+app.add_api_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+app.add_api_route("/internal/query-stats", query_stats.stats_endpoint, include_in_schema=False)
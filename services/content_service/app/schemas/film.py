@@ -12,7 +12,9 @@ class GenreResponse(BaseModel):
 class FilmCard(BaseModel):
     movie_id: int
     title_local: str
-    poster_url: Optional[str] = None
+    poster_url: Optional[str] = None  # as entered in the admin (often a TMDB link)
+    # our copy, if mirrored: clients that want it build /api/images/{key}?w=<width> themselves
+    poster_storage_key: Optional[str] = None
     imdb_rating: Optional[float] = None
     release_year: Optional[int] = None
     is_new: Optional[bool] = False
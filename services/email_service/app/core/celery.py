@@ -1,8 +1,12 @@
 
 from celery import Celery
+from celery.signals import task_failure, task_retry, task_success
 import os
+import redis
 from dotenv import load_dotenv
 
+from kino_common import tracing
+
 load_dotenv()
 
 celery_app = Celery(
@@ -11,6 +15,41 @@ celery_app = Celery(
     backend=os.getenv('REDIS_BACKEND_URL')
 )
 
+# trace context едет в заголовках задачи: span задачи — потомок запроса, который её поставил
+tracing.configure("email_service")
+tracing.instrument_celery()
+
 celery_app.conf.task_routes = {
     'app.tasks.send_email_task': {'queue': 'emails'}
 }
+
+# Задачи выполняются в дочерних процессах воркера — счётчики кладём в Redis,
+# /metrics API-процесса читает их оттуда вместе с длиной очереди
+TASK_METRICS_KEY = "email_metrics:tasks"
+EMAIL_QUEUE = "emails"
+_metrics_redis = None
+
+
+def _count_task(state: str) -> None:
+    global _metrics_redis
+    try:
+        if _metrics_redis is None:
+            _metrics_redis = redis.Redis.from_url(os.getenv('REDIS_BROKER_URL') or "redis://redis:6379/0")
+        _metrics_redis.hincrby(TASK_METRICS_KEY, state, 1)
+    except Exception:
+        pass
+
+
+@task_success.connect
+def _on_task_success(sender=None, **kwargs):
+    _count_task("success")
+
+
+@task_failure.connect
+def _on_task_failure(sender=None, **kwargs):
+    _count_task("failure")
+
+
+@task_retry.connect
+def _on_task_retry(sender=None, **kwargs):
+    _count_task("retry")
@@ -1,8 +1,13 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 
-from app.core.celery import celery_app
+import os
+
+import redis.asyncio as aioredis
+from kino_common import metrics, tracing
+
+from app.core.celery import EMAIL_QUEUE, TASK_METRICS_KEY, celery_app
 
 app = FastAPI(
     title="Email Service",
@@ -10,6 +15,27 @@ app = FastAPI(
     redoc_url="/redoc",
     openapi_url="/openapi.json"
 )
+app.middleware("http")(metrics.metrics_middleware)
+app.middleware("http")(tracing.tracing_middleware)
+app.add_api_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+
+_broker = None
+
+
+async def _queue_metrics():
+    global _broker
+    if _broker is None:
+        _broker = aioredis.from_url(os.getenv("REDIS_BROKER_URL") or "redis://redis:6379/0", decode_responses=True)
+    depth = await _broker.llen(EMAIL_QUEUE)
+    tasks = await _broker.hgetall(TASK_METRICS_KEY)
+    return [
+        ("email_queue_depth", "gauge", "Emails waiting in the Celery queue", [({"queue": EMAIL_QUEUE}, depth)]),
+        ("email_tasks_total", "counter", "Finished email tasks by outcome",
+         [({"state": state}, int(count)) for state, count in tasks.items()]),
+    ]
+
+
+metrics.register_collector(_queue_metrics)
 
 class EmailRequest(BaseModel):
     to_email: EmailStr
@@ -21,6 +47,15 @@ class EmailResponse(BaseModel):
     message: str
     task_id: str
 
+class EmailBatchRequest(BaseModel):
+    messages: List[EmailRequest]
+
+class EmailBatchResponse(BaseModel):
+    queued: int
+    task_ids: List[str]
+
+MAX_BATCH_MESSAGES = 1000
+
 @app.post("/send-email", response_model=EmailResponse)
 async def send_email(email_request: EmailRequest):
     """Отправить email через Celery task"""
@@ -44,6 +79,27 @@ async def send_email(email_request: EmailRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to queue email: {str(e)}")
 
+@app.post("/send-email/batch", response_model=EmailBatchResponse)
+async def send_email_batch(batch: EmailBatchRequest):
+    """Поставить в очередь пачку писем одним запросом"""
+    if len(batch.messages) > MAX_BATCH_MESSAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_MESSAGES} messages per batch")
+    task_ids = []
+    try:
+        for message in batch.messages:
+            task = celery_app.send_task(
+                'app.tasks.send_template_email',
+                args=[message.to_email, message.subject, message.template_name, message.context],
+                queue='emails'
+            )
+            task_ids.append(task.id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to queue email {len(task_ids) + 1} of {len(batch.messages)}: {str(e)}"
+        )
+    return EmailBatchResponse(queued=len(task_ids), task_ids=task_ids)
+
 @app.get("/health")
 async def health_check():
     """Проверка здоровья сервиса"""
@@ -0,0 +1,83 @@
+"""add webhook events table
+
+Revision ID: 20261019_000002
+Revises: 20261019_000001
+Create Date: 2026-10-19 12:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "20261019_000002"
+down_revision = "20261019_000001"
+branch_labels = None
+depends_on = None
+
+WEBHOOK_STATUS_TYPE = "webhookeventstatus"
+ACTIVATION_STATUS_TYPE = "activationstatus"
+
+webhook_status_enum = postgresql.ENUM(
+    "received",
+    "processed",
+    "failed",
+    name=WEBHOOK_STATUS_TYPE,
+    create_type=False,
+)
+
+activation_status_enum = postgresql.ENUM(
+    "pending",
+    "done",
+    "failed",
+    name=ACTIVATION_STATUS_TYPE,
+    create_type=False,
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    webhook_status_enum.create(bind, checkfirst=True)
+    activation_status_enum.create(bind, checkfirst=True)
+
+    op.create_table(
+        "webhook_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("provider", sa.String(length=32), nullable=False),
+        sa.Column("event_id", sa.String(length=255), nullable=False),
+        sa.Column("event_type", sa.String(length=64), nullable=True),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("status", webhook_status_enum, nullable=False, server_default=sa.text("'received'")),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("activation_status", activation_status_enum, nullable=True),
+        sa.Column("activation_user_id", sa.Integer(), nullable=True),
+        sa.Column("activation_days", sa.Integer(), nullable=True),
+        sa.Column("activation_attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("received_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("provider", "event_id", name="uq_webhook_provider_event"),
+    )
+    # Partial indexes keep the worker's claim queries cheap as the table grows
+    op.create_index(
+        "ix_webhook_events_received",
+        "webhook_events",
+        ["id"],
+        postgresql_where=sa.text("status = 'received'"),
+    )
+    op.create_index(
+        "ix_webhook_events_activation_pending",
+        "webhook_events",
+        ["next_attempt_at"],
+        postgresql_where=sa.text("activation_status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_webhook_events_activation_pending", table_name="webhook_events")
+    op.drop_index("ix_webhook_events_received", table_name="webhook_events")
+    op.drop_table("webhook_events")
+
+    bind = op.get_bind()
+    activation_status_enum.drop(bind, checkfirst=True)
+    webhook_status_enum.drop(bind, checkfirst=True)
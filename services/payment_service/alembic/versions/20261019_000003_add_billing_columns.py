@@ -0,0 +1,33 @@
+"""add billing engine columns to payment attempts
+
+Revision ID: 20261019_000003
+Revises: 20261019_000002
+Create Date: 2026-10-19 14:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261019_000003"
+down_revision = "20261019_000002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("payment_attempts", sa.Column("next_charge_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("payment_attempts", sa.Column("charge_attempts", sa.Integer(), nullable=False, server_default=sa.text("0")))
+    op.add_column("payment_attempts", sa.Column("last_error", sa.Text(), nullable=True))
+    op.create_index(
+        "ix_payment_attempts_due",
+        "payment_attempts",
+        ["next_charge_at"],
+        postgresql_where=sa.text("status = 'pending' AND next_charge_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payment_attempts_due", table_name="payment_attempts")
+    op.drop_column("payment_attempts", "last_error")
+    op.drop_column("payment_attempts", "charge_attempts")
+    op.drop_column("payment_attempts", "next_charge_at")
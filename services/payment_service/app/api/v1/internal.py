@@ -1,9 +1,33 @@
-from fastapi import APIRouter
-from app.schemas.payments import OK, ChargeRequest
+from fastapi import APIRouter, Query
+from kino_common import http as s2s_http
+from app.schemas.payments import BillingRunStatus
+from app.services.auth_client import role_stats
+from app.services.billing import progress, run_billing, start_billing_in_background
 
 router = APIRouter()
 
-@router.post("/billing/run", response_model=OK)
-async def run_billing_job():
-    # Placeholder: connect scheduler/cron later
-    return OK()
+@router.post("/billing/run", response_model=BillingRunStatus)
+async def run_billing_job(
+    wait: bool = Query(default=False, description="Block until the run finishes"),
+    max_records: int | None = Query(default=None, ge=1),
+):
+    if wait:
+        await run_billing(max_records=max_records)
+    else:
+        start_billing_in_background(max_records=max_records)
+    return BillingRunStatus(**progress.as_dict())
+
+
+@router.get("/billing/status", response_model=BillingRunStatus)
+async def billing_status():
+    return BillingRunStatus(**progress.as_dict())
+
+
+@router.get("/roles/stats")
+async def role_cache_stats():
+    return role_stats.as_dict()
+
+
+@router.get("/http/stats")
+async def http_client_stats():
+    return s2s_http.stats()
@@ -6,10 +6,11 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, select, inspect as sa_inspect
-from sqlalchemy.exc import IntegrityError
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from sqlalchemy import case, exists, func, select, update, inspect as sa_inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from app.core.security import get_current_user_id, require_admin_user
 from app.db.session import get_db
@@ -19,20 +20,26 @@ from app.models import (
     PurchaseStatus,
 )
 from app.schemas.purchases import (
+    PurchaseBulkItem,
+    PurchaseBulkOutcome,
+    PurchaseBulkResult,
+    PurchaseBulkUpdate,
     PurchaseCreate,
     PurchaseList,
     PurchaseOut,
     PurchaseStatusEnum,
     PurchaseUpdateStatus,
 )
-from app.services.auth_client import get_user
-from app.services.content_client import get_movie
+from app.services.auth_client import get_user, get_users
+from app.services.content_client import get_movie, get_movies
+from app.services.idempotency import load_replay, request_fingerprint, store_response
 
-from app.services.email_client import send_template_email, send_bulk_template_email
+from app.services.email_client import send_template_email, send_bulk_template_email, send_template_email_batch
 from app.settings import (
     ADMIN_PORTAL_URL,
     INVOICE_DETAILS,
     PAYMENT_ADMIN_EMAILS,
+    PAYMENT_METHOD_DISCOUNTS,
     PHONE_PAYMENT_NUMBER,
     PROJECT_NAME,
     SUPPORT_EMAIL,
@@ -40,10 +47,15 @@ from app.settings import (
 )
 
 router = APIRouter()
+# Mounted without a prefix: the ":bulk-update" suffix cannot live under the "/api/v1/purchases" prefix
+bulk_router = APIRouter()
 
 
 logger = logging.getLogger(__name__)
 
+CREATE_SCOPE = "purchase:create"
+BULK_SCOPE = "purchase:bulk-update"
+
 
 def _map_status(status: PurchaseStatusEnum | None) -> PurchaseStatus | None:
     if status is None:
@@ -206,6 +218,33 @@ async def _resolve_delivery_url(movie_id: int, fallback: str | None = None) -> s
 
 
 
+async def _check_against_catalog(payload: PurchaseCreate) -> str | None:
+    """Validate the client-supplied price against the catalog; returns the catalog title.
+
+    If content_service is unreachable the request is accepted as-is: an admin
+    reviews every purchase before approval anyway.
+    """
+    try:
+        movie = await get_movie(payload.movie_id)
+    except Exception as exc:
+        logger.warning("Catalog check skipped for movie %s: %s", payload.movie_id, exc)
+        return payload.movie_title
+    if movie is None:
+        raise HTTPException(status_code=400, detail="Movie not found")
+
+    discount = Decimal(PAYMENT_METHOD_DISCOUNTS.get(payload.payment_method.value, 0))
+    if payload.discount_percent is not None and payload.discount_percent != discount:
+        raise HTTPException(status_code=400, detail="Discount does not match payment method")
+
+    price = movie.get("price_rub")
+    if price is not None:
+        expected = (Decimal(str(price)) * (100 - discount) / 100).quantize(Decimal("0.01"))
+        if abs(payload.amount - expected) > Decimal("0.01"):
+            raise HTTPException(status_code=400, detail="Amount does not match the current price")
+    return movie.get("title_local") or payload.movie_title
+
+
+
 async def _send_purchase_created_notifications(purchase: dict[str, Any], user_profile: dict[str, Any] | None = None) -> None:
     try:
         context = _build_common_context(purchase, user_profile=user_profile)
@@ -220,20 +259,34 @@ async def _send_purchase_created_notifications(purchase: dict[str, Any], user_pr
         logger.exception("Failed to send notifications for purchase %s", purchase.get('id'))
 
 
+def _status_email(purchase: dict[str, Any], user_profile: dict[str, Any] | None = None) -> dict[str, Any]:
+    context = _build_common_context(purchase, user_profile=user_profile)
+    if purchase.get("status") == PurchaseStatus.approved.value:
+        subject = f"[{PROJECT_NAME}] Оплата подтверждена — заявка №{purchase.get('id')}"
+        template = "email/purchase_approved"
+    else:
+        subject = f"[{PROJECT_NAME}] Заявка №{purchase.get('id')} отклонена"
+        template = "email/purchase_rejected"
+    return {
+        "to_email": context.get("user_email"),
+        "subject": subject,
+        "template_name": template,
+        "context": context,
+    }
+
+
 async def _send_purchase_approved_notification(purchase: dict[str, Any], user_profile: dict[str, Any] | None = None) -> None:
     try:
-        context = _build_common_context(purchase, user_profile=user_profile)
-        subject = f"[{PROJECT_NAME}] Оплата подтверждена — заявка №{purchase.get('id')}"
-        await send_template_email(context.get("user_email"), subject, "email/purchase_approved", context)
+        message = _status_email(purchase, user_profile=user_profile)
+        await send_template_email(message["to_email"], message["subject"], message["template_name"], message["context"])
     except Exception:
         logger.exception("Failed to send approval email for purchase %s", purchase.get('id'))
 
 
 async def _send_purchase_rejected_notification(purchase: dict[str, Any], user_profile: dict[str, Any] | None = None) -> None:
     try:
-        context = _build_common_context(purchase, user_profile=user_profile)
-        subject = f"[{PROJECT_NAME}] Заявка №{purchase.get('id')} отклонена"
-        await send_template_email(context.get("user_email"), subject, "email/purchase_rejected", context)
+        message = _status_email(purchase, user_profile=user_profile)
+        await send_template_email(message["to_email"], message["subject"], message["template_name"], message["context"])
     except Exception:
         logger.exception("Failed to send rejection email for purchase %s", purchase.get('id'))
 
@@ -243,7 +296,28 @@ async def create_purchase_request(
     payload: PurchaseCreate,
     user_id: int = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key", max_length=255),
 ) -> PurchaseOut:
+    request_hash = request_fingerprint(payload.model_dump(mode="json"))
+    replay = await load_replay(db, user_id=user_id, scope=CREATE_SCOPE, key=idempotency_key, request_hash=request_hash)
+    if replay is not None:
+        return replay
+
+    # Cheap duplicate check before the auth lookup; the ON CONFLICT below still guards the race
+    duplicate = await db.scalar(
+        select(FilmPurchaseRequest.id)
+        .where(
+            FilmPurchaseRequest.user_id == user_id,
+            FilmPurchaseRequest.movie_id == payload.movie_id,
+            FilmPurchaseRequest.status == PurchaseStatus.pending,
+        )
+        .limit(1)
+    )
+    if duplicate is not None:
+        raise HTTPException(status_code=400, detail="Purchase request already exists")
+
+    movie_title = await _check_against_catalog(payload)
+
     user_name: str | None = None
     user_email: str | None = None
     user_profile: dict[str, Any] | None = None
@@ -256,30 +330,48 @@ async def create_purchase_request(
         user_name = user_data.get("name") or user_data.get("email")
         user_email = user_data.get("email")
 
-    purchase = FilmPurchaseRequest(
-        user_id=user_id,
-        user_name=user_name,
-        user_email=user_email,
-        movie_id=payload.movie_id,
-        movie_title=payload.movie_title,
-        amount=payload.amount,
-        currency=payload.currency.upper(),
-        discount_percent=payload.discount_percent,
-        payment_method=_map_method(payload.payment_method.value),
-        proof_url=payload.proof_url,
-        customer_comment=payload.customer_comment,
+    stmt = (
+        pg_insert(FilmPurchaseRequest)
+        .values(
+            user_id=user_id,
+            user_name=user_name,
+            user_email=user_email,
+            movie_id=payload.movie_id,
+            movie_title=movie_title,
+            amount=payload.amount,
+            currency=payload.currency.upper(),
+            discount_percent=payload.discount_percent,
+            payment_method=_map_method(payload.payment_method.value),
+            status=PurchaseStatus.pending,
+            proof_url=payload.proof_url,
+            customer_comment=payload.customer_comment,
+        )
+        .on_conflict_do_nothing(constraint="uq_purchase_user_movie_pending")
+        .returning(FilmPurchaseRequest)
     )
-    db.add(purchase)
-    try:
-        await db.commit()
-    except IntegrityError as exc:
+    purchase = (await db.execute(stmt)).scalar_one_or_none()
+    if purchase is None:
         await db.rollback()
-        raise HTTPException(status_code=400, detail="Purchase request already exists") from exc
-    await db.refresh(purchase)
-    await _attach_user_details([purchase])
+        # A concurrent retry with the same key may have just committed
+        replay = await load_replay(db, user_id=user_id, scope=CREATE_SCOPE, key=idempotency_key, request_hash=request_hash)
+        if replay is not None:
+            return replay
+        raise HTTPException(status_code=400, detail="Purchase request already exists")
+
     purchase_payload = _purchase_to_payload(purchase)
+    result = PurchaseOut(**purchase_payload)
+    await store_response(
+        db,
+        user_id=user_id,
+        scope=CREATE_SCOPE,
+        key=idempotency_key,
+        request_hash=request_hash,
+        status_code=status.HTTP_201_CREATED,
+        body=result.model_dump(mode="json"),
+    )
+    await db.commit()
     await _send_purchase_created_notifications(purchase_payload, user_profile=user_profile)
-    return PurchaseOut(**purchase_payload)
+    return result
 
 
 @router.get("/my", response_model=list[PurchaseOut])
@@ -344,34 +436,69 @@ async def admin_update_purchase(
     payload: PurchaseUpdateStatus,
     admin_user_id: int = Depends(require_admin_user),
     db: AsyncSession = Depends(get_db),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key", max_length=255),
 ) -> PurchaseOut:
-    result = await db.execute(
-        select(FilmPurchaseRequest).where(FilmPurchaseRequest.id == purchase_id)
-    )
-    purchase = result.scalar_one_or_none()
-    if not purchase:
-        raise HTTPException(status_code=404, detail="Purchase request not found")
-
-    if purchase.status != PurchaseStatus.pending:
-        raise HTTPException(status_code=400, detail="Purchase request already processed")
+    scope = f"purchase:{purchase_id}:status"
+    request_hash = request_fingerprint(payload.model_dump(mode="json"))
+    replay = await load_replay(db, user_id=admin_user_id, scope=scope, key=idempotency_key, request_hash=request_hash)
+    if replay is not None:
+        return replay
 
     new_status = PurchaseStatus(payload.status.value)
     now = datetime.now(timezone.utc)
-    purchase.status = new_status
-    purchase.admin_comment = payload.admin_comment
+    values: dict[str, Any] = {
+        "status": new_status,
+        "admin_comment": payload.admin_comment,
+        "processed_by": admin_user_id,
+        "processed_at": now,
+        "updated_at": now,
+    }
     if new_status == PurchaseStatus.approved:
-        purchase.delivery_url = await _resolve_delivery_url(purchase.movie_id, payload.delivery_url)
-        purchase.delivery_token = payload.delivery_token
+        values["delivery_url"] = payload.delivery_url
+        values["delivery_token"] = payload.delivery_token
+        if not payload.delivery_url:
+            # Resolved before the UPDATE: no content_service call while the row is locked
+            movie_id = await db.scalar(select(FilmPurchaseRequest.movie_id).where(FilmPurchaseRequest.id == purchase_id))
+            if movie_id is not None:
+                values["delivery_url"] = await _resolve_delivery_url(movie_id)
     else:
-        purchase.delivery_url = None
-        purchase.delivery_token = None
-    purchase.processed_by = admin_user_id
-    purchase.processed_at = now
-    purchase.updated_at = now
+        values["delivery_url"] = None
+        values["delivery_token"] = None
+
+    # Conditional transition: the first moderator wins, everyone else learns it in the same round trip
+    stmt = (
+        update(FilmPurchaseRequest)
+        .where(
+            FilmPurchaseRequest.id == purchase_id,
+            FilmPurchaseRequest.status == PurchaseStatus.pending,
+        )
+        .values(**values)
+        .returning(FilmPurchaseRequest)
+    )
+    purchase = (await db.execute(stmt)).scalar_one_or_none()
+    if purchase is None:
+        await db.rollback()
+        replay = await load_replay(db, user_id=admin_user_id, scope=scope, key=idempotency_key, request_hash=request_hash)
+        if replay is not None:
+            return replay
+        found_id = await db.scalar(select(FilmPurchaseRequest.id).where(FilmPurchaseRequest.id == purchase_id))
+        if found_id is None:
+            raise HTTPException(status_code=404, detail="Purchase request not found")
+        raise HTTPException(status_code=400, detail="Purchase request already processed")
 
-    await db.commit()
-    await db.refresh(purchase)
     await _attach_user_details([purchase])
+    purchase_payload = _purchase_to_payload(purchase)
+    result = PurchaseOut(**purchase_payload)
+    await store_response(
+        db,
+        user_id=admin_user_id,
+        scope=scope,
+        key=idempotency_key,
+        request_hash=request_hash,
+        status_code=status.HTTP_200_OK,
+        body=result.model_dump(mode="json"),
+    )
+    await db.commit()
 
     user_profile: dict[str, Any] | None = None
     try:
@@ -381,12 +508,141 @@ async def admin_update_purchase(
     except Exception:
         user_profile = None
 
-    purchase_payload = _purchase_to_payload(purchase)
     if new_status == PurchaseStatus.approved:
         await _send_purchase_approved_notification(purchase_payload, user_profile=user_profile)
     else:
         await _send_purchase_rejected_notification(purchase_payload, user_profile=user_profile)
 
-    return PurchaseOut(**purchase_payload)
+    return result
+
+
+@bulk_router.post("/api/v1/purchases:bulk-update", response_model=PurchaseBulkResult, tags=["purchases"])
+async def admin_bulk_update_purchases(
+    payload: PurchaseBulkUpdate,
+    admin_user_id: int = Depends(require_admin_user),
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key", max_length=255),
+) -> PurchaseBulkResult:
+    """Approve or reject many pending requests in one transaction.
+
+    Only rows still pending are touched; everything else is reported per id.
+    Users and movies are resolved with one batch call each, notifications go out
+    as one batch to email_service after commit.
+    """
+    request_hash = request_fingerprint(payload.model_dump(mode="json"))
+    replay = await load_replay(db, user_id=admin_user_id, scope=BULK_SCOPE, key=idempotency_key, request_hash=request_hash)
+    if replay is not None:
+        return replay
+
+    ids = list(dict.fromkeys(payload.ids))
+    new_status = PurchaseStatus(payload.status.value)
+    now = datetime.now(timezone.utc)
+
+    # Users and movies are resolved before the UPDATE: no outbound calls while the rows are locked
+    candidates = (await db.execute(
+        select(FilmPurchaseRequest.user_id, FilmPurchaseRequest.movie_id).where(
+            FilmPurchaseRequest.id.in_(ids),
+            FilmPurchaseRequest.status == PurchaseStatus.pending,
+        )
+    )).all()
+    delivery_url: Any = None
+    if new_status == PurchaseStatus.approved and candidates:
+        try:
+            movies = await get_movies({c.movie_id for c in candidates})
+        except Exception as exc:
+            logger.warning("Failed to fetch movies for bulk delivery URLs: %s", exc)
+            movies = {}
+        urls = {
+            movie_id: movie.get("signed_url") or movie.get("torrent_url")
+            for movie_id, movie in movies.items()
+            if movie.get("signed_url") or movie.get("torrent_url")
+        }
+        if urls:
+            delivery_url = case(urls, value=FilmPurchaseRequest.movie_id, else_=None)
+    profiles: dict[int, dict] = {}
+    if candidates:
+        try:
+            profiles = await get_users({c.user_id for c in candidates})
+        except Exception as exc:
+            logger.warning("Failed to fetch users for bulk update: %s", exc)
+
+    # A user can hold one request per movie and status: a row whose (user, movie) already has
+    # one in the target status would violate uq_purchase_user_movie_pending, so it is left
+    # pending and reported as a conflict instead of failing the whole batch.
+    same_target = aliased(FilmPurchaseRequest)
+    stmt = (
+        update(FilmPurchaseRequest)
+        .where(
+            FilmPurchaseRequest.id.in_(ids),
+            FilmPurchaseRequest.status == PurchaseStatus.pending,
+            ~exists().where(
+                same_target.user_id == FilmPurchaseRequest.user_id,
+                same_target.movie_id == FilmPurchaseRequest.movie_id,
+                same_target.status == new_status,
+            ),
+        )
+        .values(
+            status=new_status,
+            admin_comment=payload.admin_comment,
+            processed_by=admin_user_id,
+            processed_at=now,
+            updated_at=now,
+            delivery_url=delivery_url,
+            delivery_token=None,
+        )
+        .returning(FilmPurchaseRequest)
+    )
+    updated = {p.id: p for p in (await db.execute(stmt)).scalars().all()}
+
+    skipped = [pid for pid in ids if pid not in updated]
+    existing: dict[int, PurchaseStatus] = {}
+    if skipped:
+        existing = dict((await db.execute(
+            select(FilmPurchaseRequest.id, FilmPurchaseRequest.status).where(FilmPurchaseRequest.id.in_(skipped))
+        )).all())
+
+    for purchase in updated.values():
+        profile = profiles.get(purchase.user_id) or {}
+        if not purchase.user_name and (profile.get("name") or profile.get("email")):
+            purchase.user_name = profile.get("name") or profile.get("email")
+        if not purchase.user_email and profile.get("email"):
+            purchase.user_email = profile.get("email")
+
+    results: list[PurchaseBulkItem] = []
+    payloads: list[dict[str, Any]] = []
+    for pid in ids:
+        purchase = updated.get(pid)
+        if purchase is not None:
+            purchase_payload = _purchase_to_payload(purchase)
+            payloads.append(purchase_payload)
+            results.append(PurchaseBulkItem(
+                id=pid, outcome=PurchaseBulkOutcome.updated, purchase=PurchaseOut(**purchase_payload)
+            ))
+        elif existing.get(pid) == PurchaseStatus.pending:
+            results.append(PurchaseBulkItem(id=pid, outcome=PurchaseBulkOutcome.conflict))
+        elif pid in existing:
+            results.append(PurchaseBulkItem(id=pid, outcome=PurchaseBulkOutcome.already_processed))
+        else:
+            results.append(PurchaseBulkItem(id=pid, outcome=PurchaseBulkOutcome.not_found))
+
+    result = PurchaseBulkResult(updated=len(updated), results=results)
+    await store_response(
+        db,
+        user_id=admin_user_id,
+        scope=BULK_SCOPE,
+        key=idempotency_key,
+        request_hash=request_hash,
+        status_code=status.HTTP_200_OK,
+        body=result.model_dump(mode="json"),
+    )
+    await db.commit()
 
+    messages = []
+    for purchase_payload in payloads:
+        try:
+            messages.append(_status_email(purchase_payload, user_profile=profiles.get(purchase_payload["user_id"])))
+        except Exception:
+            logger.exception("Failed to build email for purchase %s", purchase_payload.get("id"))
+    await send_template_email_batch(messages)
 
+    return result
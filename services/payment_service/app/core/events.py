@@ -0,0 +1,48 @@
+import asyncio
+import json
+import logging
+
+import redis.asyncio as aioredis
+
+from app.services import content_client
+from app.settings import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+MOVIE_EVENTS_CHANNEL = "movie_events"
+
+
+async def listen_movie_events(stop: asyncio.Event) -> None:
+    """Invalidate cached movies as admin_service publishes changes; reconnects on failure."""
+    while not stop.is_set():
+        client = aioredis.from_url(REDIS_URL)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(MOVIE_EVENTS_CHANNEL)
+            # anything may have changed while we were not subscribed
+            content_client.invalidate()
+            while not stop.is_set():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                try:
+                    event = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if not isinstance(event, dict):
+                    content_client.invalidate()
+                elif event.get("movie_ids"):
+                    # one aggregated event for a bulk change
+                    for movie_id in event["movie_ids"]:
+                        content_client.invalidate(movie_id)
+                else:
+                    content_client.invalidate(event.get("movie_id"))
+        except Exception as exc:
+            logger.warning("Movie events listener error, reconnecting: %s", exc)
+            await asyncio.sleep(5)
+        finally:
+            try:
+                await pubsub.close()
+                await client.close()
+            except Exception:
+                pass
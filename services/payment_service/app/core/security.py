@@ -3,23 +3,24 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyQuery
 from jose import jwt, JWTError
 
-from app.settings import SECRET_KEY, ALGORITHM
-from app.services.auth_client import get_user_role
+from app.settings import SECRET_KEY, ALGORITHM, TRUST_TOKEN_ROLE
+from app.services.auth_client import resolve_role
 
 bearer_scheme = HTTPBearer(auto_error=False)
 access_token_query = APIKeyQuery(name="access_token", auto_error=False)
 
-def _decode(token: str) -> int:
+def _decode(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return int(payload.get("sub"))
+        payload["sub"] = int(payload.get("sub"))
+        return payload
     except (JWTError, ValueError, TypeError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-def get_current_user_id(
+def get_token_claims(
     creds: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     token_q: str | None = Depends(access_token_query),
-) -> int:
+) -> dict:
     token = None
     if creds and creds.scheme.lower() == "bearer":
         token = creds.credentials
@@ -30,8 +31,13 @@ def get_current_user_id(
     return _decode(token)
 
 
-async def require_admin_user(user_id: int = Depends(get_current_user_id)) -> int:
-    role = await get_user_role(user_id)
+def get_current_user_id(claims: dict = Depends(get_token_claims)) -> int:
+    return claims["sub"]
+
+
+async def require_admin_user(claims: dict = Depends(get_token_claims)) -> int:
+    user_id = claims["sub"]
+    role = await resolve_role(user_id, claims.get("role") if TRUST_TOKEN_ROLE else None)
     if role not in {"administrator", "admin"}:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return user_id
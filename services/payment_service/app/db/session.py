@@ -1,8 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from app.settings import DATABASE_URL
+from kino_common import metrics, query_stats, tracing
+from app.settings import DATABASE_URL, SQL_ECHO
 
-engine = create_async_engine(DATABASE_URL, future=True, echo=False)
+engine = create_async_engine(DATABASE_URL, future=True, echo=SQL_ECHO)
+tracing.instrument_sqlalchemy(engine)
+metrics.instrument_sqlalchemy(engine)
+query_stats.instrument_sqlalchemy(engine)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
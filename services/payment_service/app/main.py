@@ -1,11 +1,59 @@
+import asyncio
+
 from fastapi import FastAPI
 from app.api.v1.payments import router as payments_router
-from app.api.v1.purchases import router as purchases_router
+from app.api.v1.purchases import bulk_router as purchases_bulk_router, router as purchases_router
 from app.api.v1.webhooks import router as webhooks_router
 from app.api.v1.internal import router as internal_router
+from app.core.events import listen_movie_events
+from kino_common import metrics, query_stats, tracing
+from kino_common.http import close_clients, deadline_middleware
+from app.services import content_client
+from app.services.billing import run_billing
+from app.services.webhooks import run_webhook_worker
+from app.settings import BILLING_INTERVAL_MINUTES, ENABLE_BILLING_SCHEDULER, WEBHOOK_WORKER_ENABLED
 
 app = FastAPI(title="Payment Service", version="1.1.0")
+app.middleware("http")(deadline_middleware)
+app.middleware("http")(metrics.metrics_middleware)
+tracing.configure("payment_service")
+app.middleware("http")(tracing.tracing_middleware)
 app.include_router(payments_router, prefix="/api/v1/payments", tags=["payments"])
 app.include_router(purchases_router, prefix="/api/v1/purchases", tags=["purchases"])
+app.include_router(purchases_bulk_router)
 app.include_router(webhooks_router, prefix="/webhooks", tags=["webhooks"])
 app.include_router(internal_router, prefix="/internal", tags=["internal"])
+app.add_api_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+app.add_api_route("/internal/query-stats", query_stats.stats_endpoint, include_in_schema=False)
+metrics.register_collector(metrics.counters_collector(
+    "payment_content_cache_requests_total", "Movie lookups in the content_service cache", lambda: content_client.stats, "result"
+))
+
+_background_stop = asyncio.Event()
+_background_tasks: list[asyncio.Task] = []
+_scheduler = None
+
+
+@app.on_event("startup")
+async def start_background_workers():
+    global _scheduler
+    _background_tasks.append(asyncio.create_task(listen_movie_events(_background_stop)))
+    _background_tasks.append(asyncio.create_task(query_stats.report_periodically(_background_stop)))
+    if WEBHOOK_WORKER_ENABLED:
+        _background_tasks.append(asyncio.create_task(run_webhook_worker(_background_stop)))
+    if ENABLE_BILLING_SCHEDULER:
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+        _scheduler = AsyncIOScheduler()
+        _scheduler.add_job(run_billing, "interval", minutes=BILLING_INTERVAL_MINUTES, max_instances=1, coalesce=True)
+        _scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+    _background_stop.set()
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await close_clients()
@@ -8,6 +8,7 @@
     Boolean,
     Text,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 import enum
 from app.db.session import Base
@@ -34,6 +35,9 @@ class PaymentAttempt(Base):
     currency = Column(String, nullable=True)
     duration_days = Column(Integer, nullable=False)             # subscription prolongation
     capture_required = Column(Boolean, default=False, nullable=False)
+    next_charge_at = Column(DateTime(timezone=True), nullable=True)  # recurring: due for the billing engine
+    charge_attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -86,3 +90,60 @@ class FilmPurchaseRequest(Base):
         ),
     )
 
+
+class IdempotencyKey(Base):
+    """Stored response for a client-supplied Idempotency-Key header."""
+
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    scope = Column(String(64), nullable=False)                  # e.g. "purchase:create"
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)           # sha256 of the request payload
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(JSONB, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "scope", "key", name="uq_idempotency_user_scope_key"),
+    )
+
+
+class WebhookEventStatus(str, enum.Enum):
+    received = "received"
+    processed = "processed"
+    failed = "failed"
+
+
+class ActivationStatus(str, enum.Enum):
+    pending = "pending"
+    done = "done"
+    failed = "failed"
+
+
+class InboundWebhook(Base):
+    """Raw provider webhook, persisted before acknowledging and processed by the webhook worker."""
+
+    __tablename__ = "webhook_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String(32), nullable=False)
+    event_id = Column(String(255), nullable=False)              # provider event id or body hash
+    event_type = Column(String(64), nullable=True)
+    payload = Column(JSONB, nullable=False)
+    status = Column(ENUM(WebhookEventStatus, name="webhookeventstatus", create_type=False), nullable=False, default=WebhookEventStatus.received)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    # downstream subscription activation is retried separately from event processing
+    activation_status = Column(ENUM(ActivationStatus, name="activationstatus", create_type=False), nullable=True)
+    activation_user_id = Column(Integer, nullable=True)
+    activation_days = Column(Integer, nullable=True)
+    activation_attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("provider", "event_id", name="uq_webhook_provider_event"),
+    )
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -17,10 +18,12 @@ class CheckoutResponse(BaseModel):
 
 class WebhookEvent(BaseModel):
     event: str
+    event_id: str | None = None
     attempt_id: int | None = None
     user_id: int | None = None
     provider_payment_id: str | None = None
     provider_session_id: str | None = None
+    payment_method_id: str | None = None  # saved card, makes the subscription recurring
     status: str | None = None  # succeeded/failed/canceled
 
 class ChargeRequest(BaseModel):
@@ -28,6 +31,18 @@ class ChargeRequest(BaseModel):
     plan_id: str
     duration_days: int
 
+class BillingRunStatus(BaseModel):
+    running: bool
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    chunks: int
+    claimed: int
+    succeeded: int
+    retried: int
+    failed: int
+    elapsed_seconds: float
+    per_second: float
+
 class OK(BaseModel):
     ok: bool = True
 
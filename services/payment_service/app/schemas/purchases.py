@@ -73,3 +73,33 @@ class PurchaseList(BaseModel):
     items: list[PurchaseOut]
     total: int
 
+
+class PurchaseBulkUpdate(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=500)
+    status: PurchaseStatusEnum
+    admin_comment: str | None = Field(default=None, max_length=2000)
+
+    @field_validator("status")
+    @classmethod
+    def _no_pending(cls, value: PurchaseStatusEnum) -> PurchaseStatusEnum:
+        if value == PurchaseStatusEnum.pending:
+            raise ValueError("status must be approved or rejected")
+        return value
+
+
+class PurchaseBulkOutcome(str, Enum):
+    updated = "updated"
+    already_processed = "already_processed"
+    conflict = "conflict"  # the user already has a request for this movie in the target status
+    not_found = "not_found"
+
+
+class PurchaseBulkItem(BaseModel):
+    id: int
+    outcome: PurchaseBulkOutcome
+    purchase: PurchaseOut | None = None
+
+
+class PurchaseBulkResult(BaseModel):
+    updated: int
+    results: list[PurchaseBulkItem]
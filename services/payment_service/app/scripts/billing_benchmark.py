@@ -0,0 +1,99 @@
+"""Seed due recurring attempts and run the billing engine against MockProvider.
+
+    MOCK_CHARGE_LATENCY_MS=50 python -m app.scripts.billing_benchmark --records 100000 --workers 4
+
+`--workers` runs that many engine loops in parallel (as separate replicas would), all
+claiming chunks with SKIP LOCKED. Seeded rows use plan_id="bench" and are removed
+afterwards unless --keep is given. Run it with WEBHOOK_WORKER_ENABLED=false on any
+payment_service instance sharing the database, or the queued activations will be sent.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, func, insert, select
+
+from app.db.session import AsyncSessionLocal
+from app.models import InboundWebhook, PaymentAttempt, PaymentStatus
+from app.services import billing
+
+BENCH_PLAN = "bench"
+SEED_BATCH = 5000
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Billing engine benchmark")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=billing.BILLING_CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=billing.BILLING_CONCURRENCY)
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows")
+    return parser.parse_args()
+
+
+async def _seed(count: int) -> None:
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        for start in range(0, count, SEED_BATCH):
+            rows = [
+                {
+                    "user_id": i + 1,
+                    "plan_id": BENCH_PLAN,
+                    "provider": "mock",
+                    "payment_method_id": f"pm_bench_{i}",
+                    "status": PaymentStatus.pending,
+                    "amount": 299,
+                    "currency": "RUB",
+                    "duration_days": 30,
+                    "capture_required": False,
+                    "charge_attempts": 0,
+                    "next_charge_at": now,
+                }
+                for i in range(start, min(start + SEED_BATCH, count))
+            ]
+            await db.execute(insert(PaymentAttempt), rows)
+        await db.commit()
+
+
+async def _cleanup() -> None:
+    async with AsyncSessionLocal() as db:
+        bench_events = select(func.concat("charge:", PaymentAttempt.id)).where(PaymentAttempt.plan_id == BENCH_PLAN)
+        await db.execute(
+            delete(InboundWebhook).where(InboundWebhook.provider == "billing", InboundWebhook.event_id.in_(bench_events))
+        )
+        await db.execute(delete(PaymentAttempt).where(PaymentAttempt.plan_id == BENCH_PLAN))
+        await db.commit()
+
+
+async def _worker(chunk_size: int, concurrency: int) -> int:
+    provider = billing.get_provider()
+    sem = asyncio.Semaphore(concurrency)
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            claimed = await billing.bill_chunk(db, provider, sem, chunk_size)
+        if not claimed:
+            return total
+        total += claimed
+
+
+async def main() -> None:
+    args = _parse_args()
+    started = time.perf_counter()
+    await _seed(args.records)
+    print(f"seeded {args.records} due attempts in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    per_worker = await asyncio.gather(*(_worker(args.chunk_size, args.concurrency) for _ in range(args.workers)))
+    elapsed = time.perf_counter() - started
+    total = sum(per_worker)
+    print(f"billed {total} in {elapsed:.1f}s ({total / elapsed:.0f}/s) across {args.workers} worker(s): {per_worker}")
+    print(f"succeeded={billing.progress.succeeded} retried={billing.progress.retried} failed={billing.progress.failed}")
+
+    if not args.keep:
+        await _cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
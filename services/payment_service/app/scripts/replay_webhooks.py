@@ -0,0 +1,38 @@
+"""Requeue stored webhook events.
+
+    python -m app.scripts.replay_webhooks --provider mock --since 2026-10-01T00:00:00
+    python -m app.scripts.replay_webhooks --provider mock --event-id evt_1 --event-id evt_2
+    python -m app.scripts.replay_webhooks --provider mock --failed
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from app.db.session import AsyncSessionLocal
+from app.services.webhooks import replay_events
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay stored provider webhooks")
+    parser.add_argument("--provider", default="mock")
+    parser.add_argument("--event-id", action="append", dest="event_ids", default=None)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="ISO timestamp")
+    parser.add_argument("--failed", action="store_true", help="only events whose processing or activation failed")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = _parse_args()
+    async with AsyncSessionLocal() as db:
+        count = await replay_events(
+            db,
+            provider=args.provider,
+            event_ids=args.event_ids,
+            since=args.since,
+            only_failed=args.failed,
+        )
+    print(f"Requeued {count} webhook event(s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
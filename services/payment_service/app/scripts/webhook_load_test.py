@@ -0,0 +1,79 @@
+"""Fire MockProvider webhooks at a running payment_service, including provider-style retries.
+
+    python -m app.scripts.webhook_load_test --url http://localhost:8000/webhooks/mock --events 5000 --retries 3
+
+Each unique event is sent `--retries` times; with intake dedupe the webhook_events table should
+grow by `--events` rows, not `--events * --retries`.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import httpx
+
+from app.services.providers.mock_provider import MockProvider
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Webhook intake load test")
+    parser.add_argument("--url", default="http://localhost:8000/webhooks/mock")
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--retries", type=int, default=3, help="deliveries per unique event")
+    parser.add_argument("--concurrency", type=int, default=50)
+    return parser.parse_args()
+
+
+async def _build_events(count: int) -> list[bytes]:
+    provider = MockProvider()
+    bodies = []
+    for i in range(count):
+        checkout = await provider.create_checkout(
+            user_id=i + 1, plan_id="load", duration_days=30, success_url="", cancel_url=""
+        )
+        bodies.append(json.dumps({
+            "event_id": f"evt_{uuid.uuid4().hex}",
+            "event": random.choice(["payment_succeeded", "payment_failed", "payment_canceled"]),
+            "user_id": i + 1,
+            "provider_payment_id": checkout["provider_payment_id"],
+        }).encode("utf-8"))
+    return bodies
+
+
+async def main() -> None:
+    args = _parse_args()
+    deliveries = [body for body in await _build_events(args.events) for _ in range(args.retries)]
+    random.shuffle(deliveries)
+
+    sem = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(timeout=30.0, limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        async def send(body: bytes) -> None:
+            nonlocal errors
+            async with sem:
+                started = time.perf_counter()
+                try:
+                    resp = await client.post(args.url, content=body, headers={"Content-Type": "application/json"})
+                    if resp.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(body) for body in deliveries))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0
+    print(f"deliveries={len(deliveries)} unique={args.events} errors={errors}")
+    print(f"elapsed={elapsed:.2f}s rps={len(deliveries) / elapsed:.0f} p50={p50:.1f}ms p99={p99:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
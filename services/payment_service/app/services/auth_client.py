@@ -1,26 +1,79 @@
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterable
+
 import httpx
 
-from app.settings import AUTH_SERVICE_URL, INTERNAL_SECRET
+from kino_common.http import get_client
+from app.settings import AUTH_SERVICE_URL, INTERNAL_SECRET, ROLE_CACHE_MAX_ENTRIES, ROLE_CACHE_TTL_SECONDS
+
+USERS_BATCH_SIZE = 1000
+_INTERNAL_HEADERS = {"X-Internal-Secret": INTERNAL_SECRET}
 
 
 async def get_user(user_id: int) -> dict:
-    url = f"{AUTH_SERVICE_URL}/internal/users/{user_id}"
-    headers = {
-        "X-Internal-Secret": INTERNAL_SECRET,
-        "x-internal-secret": INTERNAL_SECRET,
-    }
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(url, headers=headers)
+    client = get_client(AUTH_SERVICE_URL)
+    resp = await client.get(f"/internal/users/{user_id}", headers=_INTERNAL_HEADERS)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def get_users(user_ids: Iterable[int]) -> dict[int, dict]:
+    """Fetch many users with one internal call per USERS_BATCH_SIZE ids."""
+    ids = list(dict.fromkeys(int(uid) for uid in user_ids))
+    client = get_client(AUTH_SERVICE_URL)
+    users: dict[int, dict] = {}
+    for start in range(0, len(ids), USERS_BATCH_SIZE):
+        chunk = ids[start:start + USERS_BATCH_SIZE]
+        resp = await client.get(
+            "/internal/users",
+            params={"ids": ",".join(str(uid) for uid in chunk), "limit": len(chunk)},
+            headers=_INTERNAL_HEADERS,
+        )
         resp.raise_for_status()
-        return resp.json()
+        for user in resp.json().get("users") or []:
+            if isinstance(user, dict) and user.get("id") is not None:
+                users[int(user["id"])] = user
+    return users
+
+
+@dataclass
+class RoleCacheStats:
+    claim: int = 0
+    hits: int = 0
+    misses: int = 0
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["size"] = len(_role_cache)
+        return data
+
+
+role_stats = RoleCacheStats()
+# user_id -> (expires_at, role); failed lookups are not cached
+_role_cache: dict[int, tuple[float, str | None]] = {}
+
+
+async def resolve_role(user_id: int, claimed_role: str | None = None) -> str | None:
+    """Role for an authenticated user: signed token claim first, then a short-lived cache, then auth."""
+    if isinstance(claimed_role, str) and claimed_role:
+        role_stats.claim += 1
+        return claimed_role.lower()
 
+    now = time.monotonic()
+    entry = _role_cache.get(user_id)
+    if entry is not None and entry[0] > now:
+        role_stats.hits += 1
+        return entry[1]
 
-async def get_user_role(user_id: int) -> str | None:
+    role_stats.misses += 1
     try:
         data = await get_user(user_id)
     except httpx.HTTPError:
         return None
     role = data.get("role") if isinstance(data, dict) else None
-    if isinstance(role, str):
-        return role.lower()
-    return None
+    role = role.lower() if isinstance(role, str) else None
+    if len(_role_cache) >= ROLE_CACHE_MAX_ENTRIES:
+        _role_cache.clear()
+    _role_cache[user_id] = (now + ROLE_CACHE_TTL_SECONDS, role)
+    return role
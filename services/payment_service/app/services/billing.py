@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.models import (
+    ActivationStatus,
+    InboundWebhook,
+    PaymentAttempt,
+    PaymentStatus,
+    WebhookEventStatus,
+)
+from app.services.providers.base import BaseProvider
+from app.services.providers.mock_provider import MockProvider
+from app.settings import (
+    BILLING_CHUNK_SIZE,
+    BILLING_CONCURRENCY,
+    BILLING_LEASE_SECONDS,
+    BILLING_MAX_ATTEMPTS,
+    PROVIDER,
+)
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS: dict[str, type[BaseProvider]] = {
+    "mock": MockProvider,
+}
+
+
+def get_provider(name: str = PROVIDER) -> BaseProvider:
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise RuntimeError(f"Unknown payment provider: {name}")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _retry_delay(attempt: int) -> timedelta:
+    return timedelta(hours=min(2 ** (attempt - 1), 24))
+
+
+def next_cycle(attempt: PaymentAttempt, now: datetime) -> dict:
+    """Pending attempt for the next period of a recurring subscription that has just been paid."""
+    return {
+        "user_id": attempt.user_id,
+        "plan_id": attempt.plan_id,
+        "provider": attempt.provider,
+        "payment_method_id": attempt.payment_method_id,
+        "status": PaymentStatus.pending,
+        "amount": attempt.amount,
+        "currency": attempt.currency,
+        "duration_days": attempt.duration_days,
+        "capture_required": False,
+        "charge_attempts": 0,
+        "next_charge_at": now + timedelta(days=attempt.duration_days),
+    }
+
+
+@dataclass
+class BillingProgress:
+    running: bool = False
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    chunks: int = 0
+    claimed: int = 0
+    succeeded: int = 0
+    retried: int = 0
+    failed: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        return self.claimed / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def reset(self) -> None:
+        for field in fields(self):
+            setattr(self, field.name, field.default)
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["per_second"] = round(self.per_second, 1)
+        return data
+
+
+progress = BillingProgress()
+_run_lock = asyncio.Lock()
+_background: set[asyncio.Task] = set()
+
+
+async def _charge(provider: BaseProvider, claim, sem: asyncio.Semaphore) -> dict:
+    async with sem:
+        try:
+            return await provider.charge(
+                user_id=claim.user_id,
+                payment_method_id=claim.payment_method_id,
+                amount=claim.amount,
+                currency=claim.currency,
+                idempotence_key=claim.idempotence_key,
+            )
+        except Exception as exc:
+            return {"status": "error", "error": str(exc)}
+
+
+async def _claim(db: AsyncSession, limit: int, now: datetime) -> list:
+    due = (
+        select(PaymentAttempt.id)
+        .where(
+            PaymentAttempt.status == PaymentStatus.pending,
+            PaymentAttempt.payment_method_id.is_not(None),
+            PaymentAttempt.next_charge_at <= now,
+        )
+        .order_by(PaymentAttempt.next_charge_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(PaymentAttempt)
+        .where(PaymentAttempt.id.in_(due.scalar_subquery()))
+        .values(
+            # the lease hides the row from other runs; if this one dies it is due again afterwards
+            next_charge_at=now + timedelta(seconds=BILLING_LEASE_SECONDS),
+            # stable per try (a re-claim after a crash reuses it), so the provider deduplicates the charge
+            idempotence_key=func.concat("billing-", PaymentAttempt.id, "-", PaymentAttempt.charge_attempts + 1),
+        )
+        .returning(
+            PaymentAttempt.id,
+            PaymentAttempt.user_id,
+            PaymentAttempt.payment_method_id,
+            PaymentAttempt.amount,
+            PaymentAttempt.currency,
+            PaymentAttempt.idempotence_key,
+            PaymentAttempt.charge_attempts,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    claims = result.all()
+    await db.commit()
+    return claims
+
+
+async def bill_chunk(db: AsyncSession, provider: BaseProvider, sem: asyncio.Semaphore, limit: int) -> int:
+    """Claim one chunk of due attempts and commit, charge them concurrently, then record all results at once."""
+    claims = await _claim(db, limit, _utcnow())
+    if not claims:
+        return 0
+
+    outcomes = await asyncio.gather(*(_charge(provider, c, sem) for c in claims))
+    by_id = {claim.id: (claim, outcome) for claim, outcome in zip(claims, outcomes)}
+
+    now = _utcnow()
+    result = await db.execute(
+        select(PaymentAttempt)
+        .where(PaymentAttempt.id.in_(list(by_id)), PaymentAttempt.status == PaymentStatus.pending)
+        .order_by(PaymentAttempt.id)
+        .with_for_update()
+    )
+    activations = []
+    renewals = []
+    for attempt in result.scalars():
+        claim, outcome = by_id[attempt.id]
+        if attempt.charge_attempts != claim.charge_attempts:
+            # the lease ran out and another run has already recorded this try (same key, so the same charge)
+            continue
+        attempt.charge_attempts += 1
+        if outcome.get("status") == "succeeded":
+            attempt.status = PaymentStatus.succeeded
+            attempt.provider_payment_id = outcome.get("provider_payment_id") or attempt.provider_payment_id
+            attempt.next_charge_at = None
+            attempt.last_error = None
+            activations.append({
+                "provider": "billing",
+                "event_id": f"charge:{attempt.id}",
+                "event_type": "billing_charge_succeeded",
+                "payload": {"attempt_id": attempt.id, "user_id": attempt.user_id},
+                "status": WebhookEventStatus.processed,
+                "attempts": 1,
+                "processed_at": now,
+                "activation_status": ActivationStatus.pending,
+                "activation_user_id": attempt.user_id,
+                "activation_days": attempt.duration_days,
+                "activation_attempts": 0,
+                "next_attempt_at": now,
+            })
+            renewals.append(next_cycle(attempt, now))
+            progress.succeeded += 1
+            continue
+
+        attempt.last_error = str(outcome.get("error") or outcome.get("status"))[:1000]
+        if attempt.charge_attempts >= BILLING_MAX_ATTEMPTS:
+            attempt.status = PaymentStatus.failed
+            attempt.next_charge_at = None
+            progress.failed += 1
+        else:
+            attempt.next_charge_at = now + _retry_delay(attempt.charge_attempts)
+            progress.retried += 1
+
+    if activations:
+        # subscription activation rides the webhook worker's retrying activation queue
+        await db.execute(
+            pg_insert(InboundWebhook).values(activations).on_conflict_do_nothing(constraint="uq_webhook_provider_event")
+        )
+    if renewals:
+        await db.execute(insert(PaymentAttempt).values(renewals))
+    await db.commit()
+    return len(claims)
+
+
+async def run_billing(
+    *,
+    max_records: int | None = None,
+    chunk_size: int = BILLING_CHUNK_SIZE,
+    concurrency: int = BILLING_CONCURRENCY,
+) -> BillingProgress:
+    """Bill everything currently due. Safe to run in several processes at once."""
+    if _run_lock.locked():
+        return progress
+    async with _run_lock:
+        progress.reset()
+        progress.running = True
+        progress.started_at = _utcnow()
+        provider = get_provider()
+        sem = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        try:
+            while True:
+                limit = chunk_size if max_records is None else min(chunk_size, max_records - progress.claimed)
+                if limit <= 0:
+                    break
+                async with AsyncSessionLocal() as db:
+                    claimed = await bill_chunk(db, provider, sem, limit)
+                progress.elapsed_seconds = time.perf_counter() - started
+                if not claimed:
+                    break
+                progress.chunks += 1
+                progress.claimed += claimed
+                logger.info(
+                    "Billing chunk %s: claimed=%s succeeded=%s retried=%s failed=%s (%.0f/s)",
+                    progress.chunks, progress.claimed, progress.succeeded, progress.retried,
+                    progress.failed, progress.per_second,
+                )
+        except Exception:
+            logger.exception("Billing run aborted")
+        finally:
+            progress.running = False
+            progress.finished_at = _utcnow()
+            progress.elapsed_seconds = time.perf_counter() - started
+    return progress
+
+
+def start_billing_in_background(max_records: int | None = None) -> None:
+    if _run_lock.locked():
+        return
+    task = asyncio.create_task(run_billing(max_records=max_records))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
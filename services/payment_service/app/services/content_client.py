@@ -1,14 +1,71 @@
-﻿import httpx
+﻿import time
+from typing import Iterable
 
-from app.settings import CONTENT_SERVICE_URL
+from kino_common.http import get_client
+from app.settings import CONTENT_CACHE_MAX_ENTRIES, CONTENT_CACHE_TTL_SECONDS, CONTENT_SERVICE_URL
 
+# Only what payment needs: price validation, titles and delivery links
+MOVIE_FIELDS = ("movie_id", "title_local", "price_rub", "signed_url", "torrent_url")
+BATCH_SIZE = 200
 
-async def get_movie(movie_id: int) -> dict | None:
-    url = f"{CONTENT_SERVICE_URL}/api/v1/movies/{movie_id}"
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(url)
+# movie_id -> (expires_at, movie or None for a known-missing id)
+_cache: dict[int, tuple[float, dict | None]] = {}
+stats = {"hit": 0, "miss": 0}
+
+
+def invalidate(movie_id: int | None = None) -> None:
+    """Drop one movie (or everything) from the cache; called from the movie change feed."""
+    if movie_id is None:
+        _cache.clear()
+    else:
+        _cache.pop(int(movie_id), None)
+
+
+def _slim(movie: dict) -> dict:
+    return {field: movie.get(field) for field in MOVIE_FIELDS}
+
+
+async def get_movies(movie_ids: Iterable[int]) -> dict[int, dict]:
+    """Resolve many movies with one content_service call for all cache misses."""
+    now = time.monotonic()
+    found: dict[int, dict] = {}
+    misses: list[int] = []
+    for movie_id in dict.fromkeys(int(m) for m in movie_ids):
+        entry = _cache.get(movie_id)
+        if entry is not None and entry[0] > now:
+            stats["hit"] += 1
+            if entry[1] is not None:
+                found[movie_id] = entry[1]
+        else:
+            misses.append(movie_id)
+    stats["miss"] += len(misses)
+
+    if not misses:
+        return found
+
+    if len(_cache) + len(misses) > CONTENT_CACHE_MAX_ENTRIES:
+        _cache.clear()
+
+    client = get_client(CONTENT_SERVICE_URL)
+    expires_at = now + CONTENT_CACHE_TTL_SECONDS
+    for start in range(0, len(misses), BATCH_SIZE):
+        chunk = misses[start:start + BATCH_SIZE]
+        response = await client.get("/api/v1/movies", params={"ids": ",".join(str(m) for m in chunk)})
         response.raise_for_status()
         data = response.json()
-        if isinstance(data, dict):
-            return data
-    return None
+        returned = {
+            int(movie["movie_id"]): _slim(movie)
+            for movie in (data.get("movies") or [])
+            if isinstance(movie, dict) and movie.get("movie_id") is not None
+        }
+        for movie_id in chunk:
+            movie = returned.get(movie_id)
+            _cache[movie_id] = (expires_at, movie)
+            if movie is not None:
+                found[movie_id] = movie
+    return found
+
+
+async def get_movie(movie_id: int) -> dict | None:
+    movies = await get_movies([movie_id])
+    return movies.get(int(movie_id))
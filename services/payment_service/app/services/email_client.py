@@ -1,8 +1,7 @@
 ﻿import logging
 from typing import Iterable
 
-import httpx
-
+from kino_common.http import get_client
 from app.settings import EMAIL_SERVICE_URL
 
 logger = logging.getLogger(__name__)
@@ -29,15 +28,15 @@ async def send_template_email(
     }
 
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(f"{EMAIL_SERVICE_URL}/send-email", json=payload)
-            if response.status_code != 200:
-                logger.error(
-                    "Email service responded %s for %s: %s",
-                    response.status_code,
-                    to_email,
-                    response.text,
-                )
+        client = get_client(EMAIL_SERVICE_URL)
+        response = await client.post("/send-email", json=payload, timeout=timeout)
+        if response.status_code != 200:
+            logger.error(
+                "Email service responded %s for %s: %s",
+                response.status_code,
+                to_email,
+                response.text,
+            )
     except Exception:
         logger.exception("Failed to queue email for %s", to_email)
 
@@ -48,6 +47,28 @@ def iter_valid_recipients(recipients: Iterable[str]) -> Iterable[str]:
             yield email.strip()
 
 
+async def send_template_email_batch(messages: list[dict], *, timeout: float = 30.0) -> None:
+    """Queue many e-mails with one call to email-service; log and swallow failures.
+
+    Each message is a dict with to_email, subject, template_name and context.
+    """
+    messages = [m for m in messages if m.get("to_email")]
+    if not messages:
+        return
+    try:
+        client = get_client(EMAIL_SERVICE_URL)
+        response = await client.post("/send-email/batch", json={"messages": messages}, timeout=timeout)
+        if response.status_code != 200:
+            logger.error(
+                "Email service responded %s for a batch of %s: %s",
+                response.status_code,
+                len(messages),
+                response.text,
+            )
+    except Exception:
+        logger.exception("Failed to queue a batch of %s emails", len(messages))
+
+
 async def send_bulk_template_email(
     recipients: Iterable[str],
     subject: str,
@@ -55,5 +76,12 @@ async def send_bulk_template_email(
     base_context: dict | None = None,
 ) -> None:
     base_context = base_context or {}
-    for email in iter_valid_recipients(recipients):
-        await send_template_email(email, subject, template_name, dict(base_context))
+    await send_template_email_batch([
+        {
+            "to_email": email,
+            "subject": subject,
+            "template_name": template_name,
+            "context": dict(base_context),
+        }
+        for email in iter_valid_recipients(recipients)
+    ])
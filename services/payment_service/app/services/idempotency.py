@@ -0,0 +1,90 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import IdempotencyKey
+from app.settings import IDEMPOTENCY_TTL_HOURS
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of the request body, used to reject key reuse with a different payload."""
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def load_replay(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    scope: str,
+    key: str | None,
+    request_hash: str,
+) -> JSONResponse | None:
+    """Return the stored response for (user, scope, key) or None if nothing usable is stored."""
+    if not key:
+        return None
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    result = await db.execute(
+        select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.key == key,
+            IdempotencyKey.created_at >= cutoff,
+        )
+    )
+    record = result.scalar_one_or_none()
+    if record is None:
+        return None
+    if record.request_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    return JSONResponse(
+        content=record.response_body,
+        status_code=record.status_code,
+        headers={REPLAY_HEADER: "true"},
+    )
+
+
+async def store_response(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    scope: str,
+    key: str | None,
+    request_hash: str,
+    status_code: int,
+    body: Any,
+) -> None:
+    """Stage the response in the caller's transaction; committed together with the write it describes."""
+    if not key:
+        return
+    stmt = pg_insert(IdempotencyKey).values(
+        user_id=user_id,
+        scope=scope,
+        key=key,
+        request_hash=request_hash,
+        status_code=status_code,
+        response_body=body,
+    )
+    # An expired record for the same key is simply overwritten
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_idempotency_user_scope_key",
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "status_code": stmt.excluded.status_code,
+            "response_body": stmt.excluded.response_body,
+            "created_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
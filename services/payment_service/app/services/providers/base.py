@@ -1,10 +1,25 @@
+import hashlib
 from abc import ABC, abstractmethod
 
 class BaseProvider(ABC):
+    name: str = "base"
+
     @abstractmethod
     async def create_checkout(self, *, user_id: int, plan_id: str, duration_days: int, success_url: str, cancel_url: str) -> dict:
         raise NotImplementedError
 
+    @abstractmethod
+    async def charge(self, *, user_id: int, payment_method_id: str, amount, currency: str | None, idempotence_key: str) -> dict:
+        """Charge a saved payment method. Returns {"status": "succeeded"|"failed", "provider_payment_id": ..., "error": ...}."""
+        raise NotImplementedError
+
     @abstractmethod
     async def parse_webhook(self, body: bytes, headers: dict) -> dict:
         raise NotImplementedError
+
+    def event_id(self, event: dict, body: bytes) -> str:
+        """Dedupe key for a webhook; providers with their own event ids should return them here."""
+        explicit = event.get("event_id") or event.get("id")
+        if explicit:
+            return str(explicit)
+        return hashlib.sha256(body).hexdigest()
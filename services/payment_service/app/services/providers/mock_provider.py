@@ -1,7 +1,13 @@
 from .base import BaseProvider
-import json, urllib.parse, uuid
+import asyncio, json, os, random, urllib.parse, uuid
+
+# knobs for load tests against the mock provider
+MOCK_CHARGE_LATENCY_MS = float(os.getenv("MOCK_CHARGE_LATENCY_MS", "0"))
+MOCK_CHARGE_FAILURE_RATE = float(os.getenv("MOCK_CHARGE_FAILURE_RATE", "0"))
 
 class MockProvider(BaseProvider):
+    name = "mock"
+
     async def create_checkout(self, *, user_id: int, plan_id: str, duration_days: int, success_url: str, cancel_url: str) -> dict:
         provider_payment_id = str(uuid.uuid4())
         provider_session_id = f"mock_{user_id}_{plan_id}_{provider_payment_id[:8]}"
@@ -12,5 +18,12 @@ class MockProvider(BaseProvider):
             "payment_url": f"/mock-pay?{query}"
         }
 
+    async def charge(self, *, user_id: int, payment_method_id: str, amount, currency: str | None, idempotence_key: str) -> dict:
+        if MOCK_CHARGE_LATENCY_MS:
+            await asyncio.sleep(MOCK_CHARGE_LATENCY_MS / 1000)
+        if MOCK_CHARGE_FAILURE_RATE and random.random() < MOCK_CHARGE_FAILURE_RATE:
+            return {"status": "failed", "provider_payment_id": None, "error": "card_declined"}
+        return {"status": "succeeded", "provider_payment_id": f"mock_{idempotence_key}", "error": None}
+
     async def parse_webhook(self, body: bytes, headers: dict) -> dict:
         return json.loads(body.decode("utf-8"))
@@ -0,0 +1,273 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.models import (
+    ActivationStatus,
+    InboundWebhook,
+    PaymentAttempt,
+    PaymentStatus,
+    WebhookEventStatus,
+)
+from app.schemas.payments import WebhookEvent
+from app.services.billing import next_cycle
+from app.services.providers.base import BaseProvider
+from app.services.subscription_client import activate_subscription_for_user
+from app.settings import (
+    ACTIVATION_LEASE_SECONDS,
+    ACTIVATION_MAX_ATTEMPTS,
+    WEBHOOK_BATCH_SIZE,
+    WEBHOOK_POLL_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = {
+    "payment_failed": PaymentStatus.failed,
+    "payment_canceled": PaymentStatus.canceled,
+}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _activation_backoff(attempt: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempt, 600))
+
+
+async def ingest_webhook(db: AsyncSession, provider: BaseProvider, payload: dict, body: bytes) -> bool:
+    """Persist a raw event once per (provider, event id). Returns False for duplicates."""
+    stmt = (
+        pg_insert(InboundWebhook)
+        .values(
+            provider=provider.name,
+            event_id=provider.event_id(payload, body),
+            event_type=str(payload.get("event") or "")[:64] or None,
+            payload=payload,
+            status=WebhookEventStatus.received,
+            attempts=0,
+            activation_attempts=0,
+        )
+        .on_conflict_do_nothing(constraint="uq_webhook_provider_event")
+        .returning(InboundWebhook.id)
+    )
+    inserted = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    return inserted is not None
+
+
+async def _lock_attempts(
+    db: AsyncSession, events: Iterable[WebhookEvent]
+) -> tuple[dict[int, PaymentAttempt], dict[str, PaymentAttempt]]:
+    attempt_ids = {e.attempt_id for e in events if e.attempt_id}
+    payment_ids = {e.provider_payment_id for e in events if not e.attempt_id and e.provider_payment_id}
+    conditions = []
+    if attempt_ids:
+        conditions.append(PaymentAttempt.id.in_(attempt_ids))
+    if payment_ids:
+        conditions.append(PaymentAttempt.provider_payment_id.in_(payment_ids))
+    if not conditions:
+        return {}, {}
+    result = await db.execute(
+        select(PaymentAttempt).where(or_(*conditions)).order_by(PaymentAttempt.id).with_for_update()
+    )
+    attempts = result.scalars().all()
+    by_id = {a.id: a for a in attempts}
+    by_payment_id = {a.provider_payment_id: a for a in attempts if a.provider_payment_id}
+    return by_id, by_payment_id
+
+
+def _apply_event(
+    record: InboundWebhook, event: WebhookEvent, attempt: PaymentAttempt | None, now: datetime
+) -> dict | None:
+    """Apply one event; returns the next billing cycle to schedule when a recurring payment succeeds."""
+    if attempt is None:
+        return None
+    if event.event == "payment_succeeded" and attempt.status == PaymentStatus.pending and event.user_id:
+        attempt.status = PaymentStatus.succeeded
+        if event.payment_method_id:
+            # the provider saved the card: later periods are charged by the billing engine
+            attempt.payment_method_id = event.payment_method_id
+        record.activation_status = ActivationStatus.pending
+        record.activation_user_id = event.user_id
+        record.activation_days = attempt.duration_days
+        record.next_attempt_at = now
+        if attempt.payment_method_id:
+            return next_cycle(attempt, now)
+    elif event.event in TERMINAL_EVENTS and attempt.status == PaymentStatus.pending:
+        attempt.status = TERMINAL_EVENTS[event.event]
+    return None
+
+
+async def process_event_batch(db: AsyncSession, limit: int = WEBHOOK_BATCH_SIZE) -> int:
+    """Claim up to `limit` received events and apply them to payment attempts in one transaction."""
+    result = await db.execute(
+        select(InboundWebhook)
+        .where(InboundWebhook.status == WebhookEventStatus.received)
+        .order_by(InboundWebhook.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    records = result.scalars().all()
+    if not records:
+        return 0
+
+    now = _utcnow()
+    parsed: dict[int, WebhookEvent] = {}
+    for record in records:
+        record.attempts += 1
+        record.processed_at = now
+        try:
+            parsed[record.id] = WebhookEvent(**record.payload)
+        except Exception as exc:
+            record.status = WebhookEventStatus.failed
+            record.last_error = str(exc)[:1000]
+
+    by_id, by_payment_id = await _lock_attempts(db, parsed.values())
+    renewals = []
+    for record in records:
+        event = parsed.get(record.id)
+        if event is None:
+            continue
+        if event.attempt_id:
+            attempt = by_id.get(event.attempt_id)
+        else:
+            attempt = by_payment_id.get(event.provider_payment_id)
+        renewal = _apply_event(record, event, attempt, now)
+        if renewal:
+            renewals.append(renewal)
+        record.status = WebhookEventStatus.processed
+        record.last_error = None
+
+    if renewals:
+        await db.execute(insert(PaymentAttempt).values(renewals))
+    await db.commit()
+    return len(records)
+
+
+async def process_activation_batch(db: AsyncSession, limit: int = WEBHOOK_BATCH_SIZE) -> int:
+    """Retry subscription activation for processed events, independently of event intake.
+
+    Due rows are claimed (attempt counted, next_attempt_at pushed out by a lease) and
+    committed before auth_service is called, so no row lock is held across the HTTP
+    calls; a worker that dies mid-batch leaves its rows to be retried when the lease ends.
+    """
+    now = _utcnow()
+    due = (
+        select(InboundWebhook.id)
+        .where(
+            InboundWebhook.activation_status == ActivationStatus.pending,
+            InboundWebhook.next_attempt_at <= now,
+        )
+        .order_by(InboundWebhook.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = (await db.execute(
+        update(InboundWebhook)
+        .where(InboundWebhook.id.in_(due.scalar_subquery()))
+        .values(
+            activation_attempts=InboundWebhook.activation_attempts + 1,
+            next_attempt_at=now + timedelta(seconds=ACTIVATION_LEASE_SECONDS),
+        )
+        .returning(
+            InboundWebhook.id,
+            InboundWebhook.activation_user_id,
+            InboundWebhook.activation_days,
+            InboundWebhook.activation_attempts,
+        )
+    )).all()
+    await db.commit()
+    if not claimed:
+        return 0
+
+    outcomes = await asyncio.gather(
+        *(activate_subscription_for_user(row.activation_user_id, row.activation_days) for row in claimed),
+        return_exceptions=True,
+    )
+
+    now = _utcnow()
+    done = [row.id for row, outcome in zip(claimed, outcomes) if not isinstance(outcome, Exception)]
+    if done:
+        await db.execute(
+            update(InboundWebhook)
+            .where(InboundWebhook.id.in_(done))
+            .values(activation_status=ActivationStatus.done, next_attempt_at=None, last_error=None)
+        )
+    for row, outcome in zip(claimed, outcomes):
+        if not isinstance(outcome, Exception):
+            continue
+        values = {"last_error": f"activation: {outcome}"[:1000]}
+        if row.activation_attempts >= ACTIVATION_MAX_ATTEMPTS:
+            values.update(activation_status=ActivationStatus.failed, next_attempt_at=None)
+            logger.error("Giving up activation for webhook %s: %s", row.id, outcome)
+        else:
+            values["next_attempt_at"] = now + _activation_backoff(row.activation_attempts)
+        await db.execute(update(InboundWebhook).where(InboundWebhook.id == row.id).values(**values))
+    await db.commit()
+    return len(claimed)
+
+
+async def replay_events(
+    db: AsyncSession,
+    *,
+    provider: str,
+    event_ids: list[str] | None = None,
+    since: datetime | None = None,
+    only_failed: bool = False,
+) -> int:
+    """Put stored events back into the queue. Transitions are guarded by attempt status, so replays are safe."""
+    filters = [InboundWebhook.provider == provider]
+    if event_ids:
+        filters.append(InboundWebhook.event_id.in_(event_ids))
+    if since is not None:
+        filters.append(InboundWebhook.received_at >= since)
+    if only_failed:
+        filters.append(
+            or_(
+                InboundWebhook.status == WebhookEventStatus.failed,
+                InboundWebhook.activation_status == ActivationStatus.failed,
+            )
+        )
+
+    requeued = await db.execute(
+        update(InboundWebhook)
+        .where(*filters, InboundWebhook.status != WebhookEventStatus.received)
+        .values(status=WebhookEventStatus.received, last_error=None)
+    )
+    # Failed activations get a fresh retry budget
+    await db.execute(
+        update(InboundWebhook)
+        .where(*filters, InboundWebhook.activation_status == ActivationStatus.failed)
+        .values(activation_status=ActivationStatus.pending, activation_attempts=0, next_attempt_at=_utcnow())
+    )
+    await db.commit()
+    return requeued.rowcount or 0
+
+
+async def run_webhook_worker(stop: asyncio.Event) -> None:
+    """Background loop: drain received events, then due activations; sleep only when idle."""
+    logger.info("Webhook worker started (batch=%s)", WEBHOOK_BATCH_SIZE)
+    while not stop.is_set():
+        handled = 0
+        try:
+            async with AsyncSessionLocal() as db:
+                handled += await process_event_batch(db)
+            async with AsyncSessionLocal() as db:
+                handled += await process_activation_batch(db)
+        except Exception:
+            logger.exception("Webhook worker iteration failed")
+        if handled:
+            continue
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=WEBHOOK_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+    logger.info("Webhook worker stopped")
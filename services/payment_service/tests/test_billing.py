@@ -0,0 +1,208 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from conftest import requires_db, run
+
+pytestmark = requires_db
+
+
+async def _add_due(count: int, **overrides) -> None:
+    from app.db.session import AsyncSessionLocal
+    from app.models import PaymentAttempt, PaymentStatus
+
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            PaymentAttempt(**{
+                "user_id": i + 1, "plan_id": "month", "provider": "mock", "payment_method_id": f"pm_{i}",
+                "status": PaymentStatus.pending, "amount": 299, "currency": "RUB", "duration_days": 30,
+                "next_charge_at": now - timedelta(minutes=1), **overrides,
+            })
+            for i in range(count)
+        ])
+        await db.commit()
+
+
+async def _bill(provider, limit: int = 100) -> int:
+    from app.db.session import AsyncSessionLocal
+    from app.services.billing import bill_chunk
+
+    async with AsyncSessionLocal() as db:
+        return await bill_chunk(db, provider, asyncio.Semaphore(10), limit)
+
+
+async def _attempts():
+    from app.db.session import AsyncSessionLocal
+    from app.models import PaymentAttempt
+
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(PaymentAttempt).order_by(PaymentAttempt.id))).scalars().all()
+
+
+class StubProvider:
+    name = "mock"
+
+    def __init__(self, fail_for: set[int] = frozenset()):
+        self.fail_for = fail_for
+        self.calls = []
+
+    async def charge(self, *, user_id, payment_method_id, amount, currency, idempotence_key):
+        self.calls.append(idempotence_key)
+        if user_id in self.fail_for:
+            return {"status": "failed", "provider_payment_id": None, "error": "card_declined"}
+        return {"status": "succeeded", "provider_payment_id": f"pay_{idempotence_key}", "error": None}
+
+
+def test_successful_charge_schedules_the_next_period(clean_db):
+    from app.models import PaymentStatus
+
+    provider = StubProvider(fail_for={2})
+
+    async def scenario():
+        await _add_due(2)
+        handled = await _bill(provider)
+        again = await _bill(provider)
+        return handled, again, await _attempts()
+
+    handled, again, attempts = run(scenario)
+    now = datetime.now(timezone.utc)
+    assert handled == 2
+    # the new period is not due yet and the failed one is backed off
+    assert again == 0
+    paid, declined, renewal = attempts
+    assert paid.status == PaymentStatus.succeeded and paid.next_charge_at is None
+    assert declined.status == PaymentStatus.pending and declined.next_charge_at > now
+    assert renewal.user_id == paid.user_id and renewal.payment_method_id == paid.payment_method_id
+    assert renewal.status == PaymentStatus.pending and renewal.charge_attempts == 0
+    assert timedelta(days=29) < renewal.next_charge_at - now <= timedelta(days=30)
+
+
+def test_checkout_with_a_saved_card_becomes_recurring(clean_db):
+    import json
+
+    from app.db.session import AsyncSessionLocal
+    from app.models import PaymentAttempt, PaymentStatus
+    from app.services.providers.mock_provider import MockProvider
+    from app.services.webhooks import ingest_webhook, process_event_batch
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                PaymentAttempt(user_id=1, plan_id="month", provider="mock", provider_payment_id="pay_card",
+                               status=PaymentStatus.pending, duration_days=30),
+                PaymentAttempt(user_id=2, plan_id="month", provider="mock", provider_payment_id="pay_once",
+                               status=PaymentStatus.pending, duration_days=30),
+            ])
+            await db.commit()
+        events = [
+            {"event": "payment_succeeded", "event_id": "e1", "user_id": 1,
+             "provider_payment_id": "pay_card", "payment_method_id": "pm_card"},
+            {"event": "payment_succeeded", "event_id": "e2", "user_id": 2, "provider_payment_id": "pay_once"},
+        ]
+        async with AsyncSessionLocal() as db:
+            for payload in events:
+                await ingest_webhook(db, MockProvider(), payload, json.dumps(payload).encode())
+            await process_event_batch(db)
+        return await _attempts()
+
+    attempts = run(scenario)
+    assert len(attempts) == 3
+    renewal = attempts[-1]
+    assert (renewal.user_id, renewal.payment_method_id, renewal.status) == (1, "pm_card", PaymentStatus.pending)
+    assert renewal.next_charge_at > datetime.now(timezone.utc) + timedelta(days=29)
+
+
+def test_charges_run_after_the_claim_is_committed(clean_db):
+    from sqlalchemy import text
+
+    from app.db.session import AsyncSessionLocal
+
+    seen = []
+
+    class LockCheckingProvider(StubProvider):
+        async def charge(self, **kwargs):
+            # NOWAIT fails at once if the billing run still holds the row lock
+            async with AsyncSessionLocal() as other:
+                row = (await other.execute(
+                    text("SELECT next_charge_at, idempotence_key FROM payment_attempts "
+                         "WHERE user_id = :u FOR UPDATE NOWAIT"),
+                    {"u": kwargs["user_id"]},
+                )).one()
+                await other.rollback()
+            seen.append(row)
+            return await super().charge(**kwargs)
+
+    async def scenario():
+        await _add_due(3)
+        return await _bill(LockCheckingProvider())
+
+    assert run(scenario) == 3
+    now = datetime.now(timezone.utc)
+    # the lease pushed next_charge_at out before any charge was attempted
+    assert len(seen) == 3 and all(row.next_charge_at > now for row in seen)
+    assert sorted(row.idempotence_key for row in seen) == ["billing-1-1", "billing-2-1", "billing-3-1"]
+
+
+def test_an_abandoned_claim_is_retried_with_the_same_key(clean_db):
+    from sqlalchemy import update
+
+    from app.db.session import AsyncSessionLocal
+    from app.models import PaymentAttempt, PaymentStatus
+
+    class CrashingProvider(StubProvider):
+        async def charge(self, **kwargs):
+            raise asyncio.CancelledError
+
+    provider = StubProvider()
+
+    async def scenario():
+        await _add_due(1)
+        try:
+            await _bill(CrashingProvider())
+        except asyncio.CancelledError:
+            pass
+        # still leased: nobody else picks it up
+        leased = await _bill(provider)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(PaymentAttempt).values(next_charge_at=datetime.now(timezone.utc)))
+            await db.commit()
+        retried = await _bill(provider)
+        return leased, retried, await _attempts()
+
+    leased, retried, attempts = run(scenario)
+    assert (leased, retried) == (0, 1)
+    assert provider.calls == ["billing-1-1"]
+    assert attempts[0].status == PaymentStatus.succeeded and attempts[0].charge_attempts == 1
+
+
+def test_overlapping_runs_record_a_try_once(clean_db):
+    from sqlalchemy import update
+
+    from app.db.session import AsyncSessionLocal
+    from app.models import PaymentAttempt, PaymentStatus
+
+    inner = StubProvider(fail_for={1})
+
+    class SlowProvider(StubProvider):
+        async def charge(self, **kwargs):
+            # the lease runs out mid-charge and another run takes the same try
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(PaymentAttempt).values(next_charge_at=datetime.now(timezone.utc)))
+                await db.commit()
+            self.inner_handled = await _bill(inner)
+            return await super().charge(**kwargs)
+
+    outer = SlowProvider(fail_for={1})
+
+    async def scenario():
+        await _add_due(1)
+        handled = await _bill(outer)
+        return handled, await _attempts()
+
+    handled, [attempt] = run(scenario)
+    assert (handled, outer.inner_handled) == (1, 1)
+    assert outer.calls == inner.calls == ["billing-1-1"]
+    # the failure is counted once, not once per run
+    assert attempt.status == PaymentStatus.pending and attempt.charge_attempts == 1
@@ -0,0 +1,81 @@
+from sqlalchemy import select
+
+from conftest import requires_db, run
+
+pytestmark = requires_db
+
+
+async def _add_requests(rows: list[tuple[int, int, str]]) -> list[int]:
+    from app.db.session import AsyncSessionLocal
+    from app.models import FilmPurchaseRequest, PaymentMethod, PurchaseStatus
+
+    async with AsyncSessionLocal() as db:
+        purchases = [
+            FilmPurchaseRequest(
+                user_id=user_id, movie_id=movie_id, amount=199, currency="RUB",
+                payment_method=PaymentMethod.invoice, status=PurchaseStatus(status),
+            )
+            for user_id, movie_id, status in rows
+        ]
+        db.add_all(purchases)
+        await db.commit()
+        return [p.id for p in purchases]
+
+
+def _stub_clients(monkeypatch, calls: list):
+    from app.api.v1 import purchases
+
+    async def get_movies(movie_ids):
+        calls.append(("movies", sorted(movie_ids)))
+        return {movie_id: {"movie_id": movie_id, "signed_url": f"https://cdn/{movie_id}"} for movie_id in movie_ids}
+
+    async def get_users(user_ids):
+        calls.append(("users", sorted(user_ids)))
+        return {user_id: {"email": f"user{user_id}@example.com"} for user_id in user_ids}
+
+    async def send_batch(messages):
+        calls.append(("emails", len(messages)))
+
+    monkeypatch.setattr(purchases, "get_movies", get_movies)
+    monkeypatch.setattr(purchases, "get_users", get_users)
+    monkeypatch.setattr(purchases, "send_template_email_batch", send_batch)
+
+
+def test_bulk_update_reports_unique_conflicts_per_id(clean_db, monkeypatch):
+    from app.api.v1.purchases import admin_bulk_update_purchases
+    from app.db.session import AsyncSessionLocal
+    from app.models import FilmPurchaseRequest, PurchaseStatus
+    from app.schemas.purchases import PurchaseBulkUpdate
+
+    calls = []
+    _stub_clients(monkeypatch, calls)
+
+    async def scenario():
+        ok, clash, done, _approved_before = await _add_requests([
+            (1, 10, "pending"),
+            (2, 20, "pending"),
+            (3, 30, "rejected"),
+            # user 2 already owns movie 20: approving the new request would break the unique key
+            (2, 20, "approved"),
+        ])
+        payload = PurchaseBulkUpdate(ids=[ok, clash, done, 999], status="approved")
+        async with AsyncSessionLocal() as db:
+            result = await admin_bulk_update_purchases(payload, admin_user_id=7, db=db, idempotency_key=None)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(FilmPurchaseRequest.id, FilmPurchaseRequest.status, FilmPurchaseRequest.delivery_url)
+                .order_by(FilmPurchaseRequest.id)
+            )).all()
+        return (ok, clash, done), result, rows
+
+    (ok, clash, done), result, rows = run(scenario)
+    assert result.updated == 1
+    assert [(item.id, item.outcome.value) for item in result.results] == [
+        (ok, "updated"), (clash, "conflict"), (done, "already_processed"), (999, "not_found"),
+    ]
+    assert result.results[0].purchase.user_email == "user1@example.com"
+    by_id = {row.id: row for row in rows}
+    assert (by_id[ok].status, by_id[ok].delivery_url) == (PurchaseStatus.approved, "https://cdn/10")
+    assert by_id[clash].status == PurchaseStatus.pending
+    # movies and users are looked up once, for the pending rows only
+    assert calls == [("movies", [10, 20]), ("users", [1, 2]), ("emails", 1)]
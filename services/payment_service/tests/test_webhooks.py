@@ -0,0 +1,221 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select, text
+
+from conftest import requires_db, run
+
+pytestmark = requires_db
+
+
+def _event(event_id: str | None, provider_payment_id: str, user_id: int = 1, event: str = "payment_succeeded") -> dict:
+    payload = {"event": event, "user_id": user_id, "provider_payment_id": provider_payment_id}
+    if event_id:
+        payload["event_id"] = event_id
+    return payload
+
+
+async def _ingest(payload: dict) -> bool:
+    from app.db.session import AsyncSessionLocal
+    from app.services.providers.mock_provider import MockProvider
+    from app.services.webhooks import ingest_webhook
+
+    body = json.dumps(payload, sort_keys=True).encode()
+    async with AsyncSessionLocal() as db:
+        return await ingest_webhook(db, MockProvider(), payload, body)
+
+
+async def _scalar(stmt):
+    from app.db.session import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(stmt)
+
+
+async def _add_attempts(count: int) -> list[str]:
+    from app.db.session import AsyncSessionLocal
+    from app.models import PaymentAttempt, PaymentStatus
+
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            PaymentAttempt(
+                user_id=i + 1, plan_id="month", provider="mock", provider_payment_id=f"pay_{i}",
+                status=PaymentStatus.pending, duration_days=30,
+            )
+            for i in range(count)
+        ])
+        await db.commit()
+    return [f"pay_{i}" for i in range(count)]
+
+
+async def _process_events(limit: int) -> int:
+    from app.db.session import AsyncSessionLocal
+    from app.services.webhooks import process_event_batch
+
+    async with AsyncSessionLocal() as db:
+        return await process_event_batch(db, limit=limit)
+
+
+async def _process_activations(limit: int = 100) -> int:
+    from app.db.session import AsyncSessionLocal
+    from app.services.webhooks import process_activation_batch
+
+    async with AsyncSessionLocal() as db:
+        return await process_activation_batch(db, limit=limit)
+
+
+def test_redelivered_events_are_stored_once(clean_db):
+    from app.models import InboundWebhook
+
+    async def scenario():
+        first = [await _ingest(_event("evt_1", "pay_1")) for _ in range(3)]
+        # without a provider event id the body hash is the dedupe key
+        second = [await _ingest(_event(None, "pay_2")) for _ in range(2)]
+        other = await _ingest(_event(None, "pay_3"))
+        rows = await _scalar(select(func.count()).select_from(InboundWebhook))
+        return first, second, other, rows
+
+    first, second, other, rows = run(scenario)
+    assert first == [True, False, False]
+    assert second == [True, False]
+    assert other is True
+    assert rows == 3
+
+
+def test_event_batches_respect_the_limit_and_drain_the_queue(clean_db):
+    from app.models import ActivationStatus, InboundWebhook, PaymentAttempt, PaymentStatus, WebhookEventStatus
+
+    async def scenario():
+        payment_ids = await _add_attempts(5)
+        for i, pid in enumerate(payment_ids):
+            await _ingest(_event(f"evt_{i}", pid, user_id=i + 1))
+        handled = [await _process_events(limit=2) for _ in range(4)]
+        succeeded = await _scalar(
+            select(func.count()).select_from(PaymentAttempt).where(PaymentAttempt.status == PaymentStatus.succeeded)
+        )
+        processed = await _scalar(
+            select(func.count()).select_from(InboundWebhook).where(
+                InboundWebhook.status == WebhookEventStatus.processed,
+                InboundWebhook.activation_status == ActivationStatus.pending,
+                InboundWebhook.activation_days == 30,
+            )
+        )
+        return handled, succeeded, processed
+
+    handled, succeeded, processed = run(scenario)
+    assert handled == [2, 2, 1, 0]
+    assert succeeded == 5
+    assert processed == 5
+
+
+def test_replayed_event_does_not_apply_twice(clean_db):
+    from app.models import InboundWebhook, PaymentAttempt, PaymentStatus
+
+    async def scenario():
+        [pid] = await _add_attempts(1)
+        await _ingest(_event("evt_ok", pid))
+        await _process_events(limit=10)
+        # a late "failed" for the same payment must not undo the success
+        await _ingest(_event("evt_late", pid, event="payment_failed"))
+        await _process_events(limit=10)
+        status = await _scalar(select(PaymentAttempt.status))
+        activations = await _scalar(
+            select(func.count()).select_from(InboundWebhook).where(InboundWebhook.activation_status.is_not(None))
+        )
+        return status, activations
+
+    status, activations = run(scenario)
+    assert status == PaymentStatus.succeeded
+    assert activations == 1
+
+
+def test_activation_calls_happen_after_the_claim_is_committed(clean_db, monkeypatch):
+    from app.models import ActivationStatus, InboundWebhook
+    from app.services import webhooks
+
+    seen = []
+
+    async def activate(user_id, days):
+        from app.db.session import AsyncSessionLocal
+
+        # NOWAIT fails at once if the worker still holds the row lock
+        async with AsyncSessionLocal() as other:
+            row = (await other.execute(
+                text(
+                    "SELECT activation_attempts, next_attempt_at FROM webhook_events "
+                    "WHERE activation_user_id = :u FOR UPDATE NOWAIT"
+                ),
+                {"u": user_id},
+            )).one()
+            await other.rollback()
+        seen.append((user_id, row.activation_attempts, row.next_attempt_at))
+        if user_id == 2:
+            raise RuntimeError("auth_service down")
+
+    monkeypatch.setattr(webhooks, "activate_subscription_for_user", activate)
+
+    async def scenario():
+        payment_ids = await _add_attempts(2)
+        for i, pid in enumerate(payment_ids):
+            await _ingest(_event(f"evt_{i}", pid, user_id=i + 1))
+        await _process_events(limit=10)
+        handled = await _process_activations()
+        again = await _process_activations()
+        rows = (await _scalar_rows(
+            select(InboundWebhook.activation_user_id, InboundWebhook.activation_status,
+                   InboundWebhook.activation_attempts, InboundWebhook.next_attempt_at, InboundWebhook.last_error)
+            .order_by(InboundWebhook.activation_user_id)
+        ))
+        return handled, again, rows
+
+    handled, again, rows = run(scenario)
+    now = datetime.now(timezone.utc)
+    assert handled == 2
+    # the failed one is backed off, not immediately due again
+    assert again == 0
+    assert sorted(user_id for user_id, _, _ in seen) == [1, 2]
+    # the claim (attempt count and lease) was visible to other sessions during the call
+    assert all(attempts == 1 and next_at > now for _, attempts, next_at in seen)
+
+    done, failed = rows
+    assert done.activation_status == ActivationStatus.done and done.next_attempt_at is None
+    assert failed.activation_status == ActivationStatus.pending
+    assert failed.next_attempt_at > now
+    assert "auth_service down" in failed.last_error
+
+
+async def _scalar_rows(stmt):
+    from app.db.session import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(stmt)).all()
+
+
+@pytest.mark.parametrize("attempts_before", [7])
+def test_activation_gives_up_after_the_last_attempt(clean_db, monkeypatch, attempts_before):
+    from sqlalchemy import update
+
+    from app.db.session import AsyncSessionLocal
+    from app.models import ActivationStatus, InboundWebhook
+    from app.services import webhooks
+
+    async def activate(user_id, days):
+        raise RuntimeError("still down")
+
+    monkeypatch.setattr(webhooks, "activate_subscription_for_user", activate)
+    monkeypatch.setattr(webhooks, "ACTIVATION_MAX_ATTEMPTS", attempts_before + 1)
+
+    async def scenario():
+        [pid] = await _add_attempts(1)
+        await _ingest(_event("evt_1", pid))
+        await _process_events(limit=10)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(InboundWebhook).values(activation_attempts=attempts_before))
+            await db.commit()
+        await _process_activations()
+        return (await _scalar_rows(select(InboundWebhook.activation_status, InboundWebhook.next_attempt_at)))[0]
+
+    status, next_at = run(scenario)
+    assert status == ActivationStatus.failed
+    assert next_at is None